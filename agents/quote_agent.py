@@ -19,8 +19,9 @@ def filter_quote_fields(quote):
         filtered['estimate'] = quote['estimate']
     return filtered
 
-from services.lifi_service import LifiService, TOKEN_INFO, convert_quote_to_human_readable
+from services.lifi_service import LifiService, token_registry, convert_quote_to_human_readable
 from services.lifi_service import fetch_and_store_tokens
+from services.admission import UpstreamOverloaded
 
 
 class QuoteAgent:
@@ -32,6 +33,8 @@ class QuoteAgent:
         # Busca e armazena os tokens da rede antes de qualquer coisa
         try:
             await fetch_and_store_tokens(chain)
+        except UpstreamOverloaded:
+            raise
         except Exception as e:
             return {"error": f"Erro ao buscar tokens da rede {chain}. Tente novamente."}
         
@@ -42,21 +45,20 @@ class QuoteAgent:
             return quote
             
         # Descobre os decimais dos tokens para conversão
-        chain_upper = chain.upper()
         from_token = extracted_data.get("fromToken", "").upper()
         to_token = extracted_data.get("toToken", "").upper()
         
-        # Verifica se os tokens foram encontrados
-        from_token_info = TOKEN_INFO.get(chain_upper, {}).get(from_token)
-        to_token_info = TOKEN_INFO.get(chain_upper, {}).get(to_token)
+        # Verifica se os tokens foram encontrados (por símbolo, endereço ou nome)
+        from_token_info = token_registry.resolve(chain, from_token)
+        to_token_info = token_registry.resolve(chain, to_token)
         
         if not from_token_info:
             return {"error": f"Token {from_token} não encontrado na rede {chain}."}
         if not to_token_info:
             return {"error": f"Token {to_token} não encontrado na rede {chain}."}
             
-        from_token_decimals = from_token_info.get("decimals", 6)
-        to_token_decimals = to_token_info.get("decimals", 6)
+        from_token_decimals = 6 if from_token_info.decimals is None else from_token_info.decimals
+        to_token_decimals = 6 if to_token_info.decimals is None else to_token_info.decimals
         
         quote = convert_quote_to_human_readable(quote, from_token_decimals, to_token_decimals)
         quote = filter_quote_fields(quote)
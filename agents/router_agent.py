@@ -1,8 +1,20 @@
+import logging
 from services.gemini_service import GeminiService
+from services.intent_parser import intent_parser
+from services.prefetch import ChainPrefetch
+from services.deadline import DeadlineExceeded, deadline_expired, deadline_message
+from services.admission import UpstreamOverloaded, overload_message, set_request_priority
+from services.metrics import stage, current_timings
+from services.message_renderer import (
+    RENDERER_TEMPLATE, select_renderer,
+    render_quote_message, render_swap_message, render_transfer_message
+)
 from agents.quote_agent import QuoteAgent
 from agents.swap_agent import SwapAgent
 from agents.transfer_agent import TransferAgent
 
+logger = logging.getLogger(__name__)
+
 
 class RouterAgent:
     def __init__(self):
@@ -10,36 +22,96 @@ class RouterAgent:
         self.quote_agent = QuoteAgent()
         self.swap_agent = SwapAgent()
         self.transfer_agent = TransferAgent()
+        self.intent_parser = intent_parser
+
+    async def _render(self, kind, data, language, renderer):
+        """
+        Gera a mensagem final pelo template local (sem chamada ao LLM) ou pelo Gemini
+        """
+        if renderer == RENDERER_TEMPLATE:
+            templates = {
+                "quote": render_quote_message,
+                "swap": render_swap_message,
+                "transfer": render_transfer_message,
+            }
+            with stage("render"):
+                message = templates[kind](data, language)
+            yield message
+            return
+
+        generators = {
+            "quote": self.gemini_service.generate_friendly_message,
+            "swap": self.gemini_service.generate_swap_message,
+            "transfer": self.gemini_service.generate_transfer_message,
+        }
+        async for chunk in generators[kind](data, language):
+            yield chunk
+
+    async def _error_response(self, language, error_context):
+        """
+        Resposta de erro pelo Gemini; com o prazo da requisição esgotado,
+        responde na hora com a mensagem fixa, sem outra chamada ao LLM
+        """
+        if deadline_expired():
+            yield deadline_message(language)
+            return
+        try:
+            async for chunk in self.gemini_service.generate_error_response(language, error_context):
+                yield chunk
+        except DeadlineExceeded:
+            yield deadline_message(language)
+        except UpstreamOverloaded:
+            # Gemini sobrecarregado também para a mensagem de erro: resposta fixa
+            yield overload_message(language)
 
     async def handle(self, user_request):
+        # Rede e carteira já são conhecidas: aquece tokens, gas price e saldo
+        # nativo em paralelo com a classificação da intenção
+        prefetch = ChainPrefetch(user_request.chain, user_request.walletAddress).start()
+        language = "pt"
         try:
-            result = await self.gemini_service.classify_intent_and_extract(user_request.input)
+            # Prompts bem formados são extraídos localmente, sem chamar o Gemini
+            with stage("classify"):
+                result = self.intent_parser.try_parse(user_request.input, user_request.chain)
+                if result is None:
+                    result = await self.gemini_service.classify_intent_and_extract(
+                        user_request.input, on_llm_latency=self.intent_parser.record_llm_latency
+                    )
             intent = result.get("intent")
+            timings = current_timings()
+            if timings is not None:
+                timings.set_labels(intent=intent if intent in ("cotacao", "swap", "transferencia") else "outro")
+            prefetch.keep_for_intent(intent)
+            # Swaps e transferências passam na frente nas filas dos upstreams
+            set_request_priority(intent)
             language = result.get("language", "pt")  # Default para português
+            renderer = select_renderer(getattr(user_request, "renderer", None), language)
 
             if intent == "cotacao":
-                quote = await self.quote_agent.get_quote(user_request, result)
+                with stage("quote"):
+                    quote = await self.quote_agent.get_quote(user_request, result)
                 # Verifica se houve erro na cotação
                 if "error" in quote:
                     # Usa o método existente com contexto específico
-                    async for chunk in self.gemini_service.generate_error_response(language, f"Erro na cotação: {quote['error']}"):
+                    async for chunk in self._error_response(language, f"Erro na cotação: {quote['error']}"):
                         yield chunk
                     return
-                async for chunk in self.gemini_service.generate_friendly_message(quote, language):
+                async for chunk in self._render("quote", quote, language, renderer):
                     yield chunk
             elif intent == "swap":
-                swap_result = await self.swap_agent.get_swap(user_request, result)
+                with stage("swap"):
+                    swap_result = await self.swap_agent.get_swap(user_request, result, prefetch=prefetch)
                 # Verifica se houve erro no swap
                 if "error" in swap_result:
                     # Usa o método existente com contexto específico
-                    async for chunk in self.gemini_service.generate_error_response(language, f"Erro no swap: {swap_result['error']}"):
+                    async for chunk in self._error_response(language, f"Erro no swap: {swap_result['error']}"):
                         yield chunk
                     return
                 
                 # Se for dados estruturados de swap, gera mensagem e retorna dados
                 if swap_result.get("type") == "swap_data":
                     # Gera mensagem amigável
-                    async for chunk in self.gemini_service.generate_swap_message(swap_result["data"], language):
+                    async for chunk in self._render("swap", swap_result["data"], language, renderer):
                         yield chunk
                     # Retorna dados da transação
                     yield {
@@ -48,26 +120,25 @@ class RouterAgent:
                     }
                 else:
                     # Fallback para dados antigos
-                    async for chunk in self.gemini_service.generate_swap_message(
-                        swap_result, language
-                    ):
+                    async for chunk in self._render("swap", swap_result, language, renderer):
                         yield chunk
             elif intent == "transferencia":
-                transfer_result = await self.transfer_agent.get_transfer(
-                    user_request, result
-                )
+                with stage("transfer"):
+                    transfer_result = await self.transfer_agent.get_transfer(
+                        user_request, result, prefetch=prefetch
+                    )
                 # Verifica se houve erro na transferência
                 if "error" in transfer_result:
                     # Usa o método existente com contexto específico
-                    async for chunk in self.gemini_service.generate_error_response(language, f"Erro na transferência: {transfer_result['error']}"):
+                    async for chunk in self._error_response(language, f"Erro na transferência: {transfer_result['error']}"):
                         yield chunk
                     return
 
                 # Se for dados estruturados de transferência, gera mensagem e retorna dados
                 if transfer_result.get("type") == "transfer_data":
                     # Gera mensagem amigável
-                    async for chunk in self.gemini_service.generate_transfer_message(
-                        transfer_result["data"], language
+                    async for chunk in self._render(
+                        "transfer", transfer_result["data"], language, renderer
                     ):
                         yield chunk
                     # Retorna dados da transação
@@ -77,19 +148,31 @@ class RouterAgent:
                     }
                 else:
                     # Fallback para dados antigos
-                    async for chunk in self.gemini_service.generate_transfer_message(
-                        transfer_result, language
-                    ):
+                    async for chunk in self._render("transfer", transfer_result, language, renderer):
                         yield chunk
             else:
                 # Para mensagens que não são das funcionalidades principais, 
                 # gera uma resposta amigável e orientativa
                 async for chunk in self.gemini_service.generate_helpful_response(user_request.input, language):
                     yield chunk
+        except UpstreamOverloaded:
+            # Fila de upstream acima do orçamento: o /process avisa no stream,
+            # sem nova chamada ao Gemini
+            raise
+        except DeadlineExceeded as e:
+            # Prazo da requisição esgotado: falha rápida, sem nova chamada ao Gemini
+            logger.warning("Prazo da requisição esgotado", extra={"detail": str(e)})
+            yield deadline_message(language)
         except Exception as e:
             # Log do erro para debugging (sem exposição ao usuário)
-            print(f"Erro interno no RouterAgent: {str(e)}")
+            logger.exception("Erro interno no RouterAgent")
             
             # Gera resposta amigável de erro para o usuário
-            async for chunk in self.gemini_service.generate_error_response(language, f"Erro durante processamento: {type(e).__name__}"):
+            async for chunk in self._error_response(language, f"Erro durante processamento: {type(e).__name__}"):
                 yield chunk
+        finally:
+            report = await prefetch.close()
+            if report["tasks"]:
+                logger.info("Pré-busca concluída", extra={
+                    "chain": user_request.chain, "overlap_ms": report["overlap_ms"], "tasks": report["tasks"]
+                })
@@ -1,5 +1,7 @@
-from services.lifi_service import LifiService, TOKEN_INFO, convert_quote_to_human_readable
+import asyncio
+from services.lifi_service import LifiService, token_registry, convert_quote_to_human_readable
 from services.lifi_service import fetch_and_store_tokens
+from services.admission import UpstreamOverloaded
 from services.balance_validator import validate_sufficient_balance, is_native_token
 
 
@@ -30,64 +32,101 @@ class SwapAgent:
     def __init__(self):
         self.lifi_service = LifiService()
 
-    async def get_swap(self, user_request, extracted_data):
+    async def _run_preflight(self, user_request, extracted_data, from_token_info, prefetch=None):
+        """
+        Executa a cotação de swap na LI.FI e a validação de saldo concorrentemente.
+        Se a validação de saldo falhar, a requisição pendente à LI.FI é cancelada
+        (e vice-versa).
+
+        Returns:
+            dict: Dados do swap retornados pela LI.FI ou {"error": str}
+        """
+        quote_task = asyncio.create_task(
+            self.lifi_service.get_swap_quote(user_request, extracted_data)
+        )
+        tasks = {quote_task}
+
+        # Valida se tem saldo suficiente do token de origem para o swap
+        balance_task = None
+        from_amount = extracted_data.get("fromAmount", "")
+        if from_amount:
+            balance_task = asyncio.create_task(validate_sufficient_balance(
+                user_request.walletAddress, 
+                from_token_info.symbol, 
+                from_amount, 
+                user_request.chain, 
+                include_gas_fee=False,  # Para swaps, o gas fee não é do mesmo token
+                prefetch=prefetch
+            ))
+            tasks.add(balance_task)
+
+        try:
+            pending = tasks
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                if balance_task in done:
+                    balance_validation = balance_task.result()
+                    if not balance_validation["success"]:
+                        return {"error": balance_validation["error"]}
+
+                if quote_task in done and "error" in quote_task.result():
+                    return quote_task.result()
+
+            return quote_task.result()
+        finally:
+            # Cancela o que ainda estiver pendente (ex.: LI.FI após saldo insuficiente)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_swap(self, user_request, extracted_data, prefetch=None):
         chain = user_request.chain
         # Busca e armazena os tokens da rede antes de qualquer coisa
         try:
             await fetch_and_store_tokens(chain)
+        except UpstreamOverloaded:
+            raise
         except Exception as e:
             return {"error": f"Erro ao buscar tokens da rede {chain}. Tente novamente."}
 
-        swap_data = await self.lifi_service.get_swap_quote(user_request, extracted_data)
-
-        # Verifica se o swap falhou
-        if "error" in swap_data:
-            return swap_data
-
         # Descobre os decimais dos tokens para conversão
-        chain_upper = chain.upper()
         from_token = extracted_data.get("fromToken", "").upper()
         to_token = extracted_data.get("toToken", "").upper()
 
-        # Verifica se os tokens foram encontrados
-        from_token_info = TOKEN_INFO.get(chain_upper, {}).get(from_token)
-        to_token_info = TOKEN_INFO.get(chain_upper, {}).get(to_token)
+        # Verifica se os tokens foram encontrados (por símbolo, endereço ou nome)
+        from_token_info = token_registry.resolve(chain, from_token)
+        to_token_info = token_registry.resolve(chain, to_token)
 
         if not from_token_info:
             return {"error": f"Token {from_token} não encontrado na rede {chain}."}
         if not to_token_info:
             return {"error": f"Token {to_token} não encontrado na rede {chain}."}
 
-        # Valida se tem saldo suficiente do token de origem para o swap
-        from_amount = extracted_data.get("fromAmount", "")
-        if from_amount:
-            balance_validation = await validate_sufficient_balance(
-                user_request.walletAddress, 
-                from_token, 
-                from_amount, 
-                chain, 
-                include_gas_fee=False  # Para swaps, o gas fee não é do mesmo token
-            )
-            
-            if not balance_validation["success"]:
-                return {"error": balance_validation["error"]}
+        # Cotação na LI.FI e validação de saldo são independentes: rodam em paralelo
+        swap_data = await self._run_preflight(user_request, extracted_data, from_token_info, prefetch)
+
+        # Verifica se o swap ou a validação de saldo falharam
+        if "error" in swap_data:
+            return swap_data
 
-        from_token_decimals = from_token_info.get("decimals", 6)
-        to_token_decimals = to_token_info.get("decimals", 6)
+        from_token_decimals = 6 if from_token_info.decimals is None else from_token_info.decimals
+        to_token_decimals = 6 if to_token_info.decimals is None else to_token_info.decimals
 
         swap_data = convert_quote_to_human_readable(swap_data, from_token_decimals, to_token_decimals)
         
         # Adiciona informação sobre tokens nativos se transactionRequest existir
         if 'transactionRequest' in swap_data:
             # Verifica se o token de origem é nativo
-            is_from_native = is_native_token(from_token, chain)
+            is_from_native = is_native_token(from_token_info.symbol, chain)
             swap_data['transactionRequest']['isNativeToken'] = is_from_native
             
             # Adiciona informações do token de origem
             swap_data['transactionRequest']['fromTokenInfo'] = {
-                "contract": from_token_info.get("address", ""),
-                "decimals": from_token_info.get("decimals", 6),
-                "name": from_token_info.get("name", from_token)
+                "contract": from_token_info.address or "",
+                "decimals": 6 if from_token_info.decimals is None else from_token_info.decimals,
+                "name": from_token_info.name or from_token_info.symbol
             }
 
         swap_data = filter_swap_fields(swap_data)
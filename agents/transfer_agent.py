@@ -1,10 +1,11 @@
 from services.lifi_service import (
-    TOKEN_INFO,
+    token_registry,
     fetch_and_store_tokens,
     get_gas_price
 )
 from services.balance_validator import validate_sufficient_balance, is_native_token, get_estimated_gas, get_gas_price_with_validation
-import aiohttp
+from services.price_index import price_index
+from services.admission import UpstreamOverloaded
 
 
 def validate_wallet_address(address):
@@ -39,29 +40,10 @@ def validate_wallet_address(address):
 
 async def get_native_token_price_usd(chain):
     """
-    Busca preço do token nativo da rede em USD usando CoinGecko API
+    Busca preço do token nativo da rede em USD no índice local de preços
+    (lista de tokens da LI.FI, com fallback para a CoinGecko em cache)
     """
-    # Mapeamento de chains para IDs do CoinGecko
-    chain_to_coingecko = {
-        "ETH": "ethereum",      # ETH
-        "BAS": "ethereum",      # Base usa ETH
-        "POL": "matic-network"  # MATIC
-    }
-
-    chain_upper = chain.upper()
-    coingecko_id = chain_to_coingecko.get(chain_upper)
-
-    if not coingecko_id:
-        return 0
-
-    url = (f"https://api.coingecko.com/api/v3/simple/price?"
-            f"ids={coingecko_id}&vs_currencies=usd")
-
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, timeout=10) as response:
-            data = await response.json()
-            price = data.get(coingecko_id, {}).get("usd", 0)
-            return price
+    return await price_index.get_native_price_usd(chain)
 
 
 def calculate_gas_cost_usd(gas_price, estimated_gas, token_price_usd=0):
@@ -88,16 +70,17 @@ async def create_transaction_data(
     Cria dados de transação artificiais para transferência
     Seguindo o formato do LI.FI mas sem bater na API
     """
-    # Busca informações do token
+    # Busca informações do token (por símbolo, endereço ou nome)
     chain_upper = chain.upper()
-    token_info = TOKEN_INFO.get(chain_upper, {}).get(token_symbol.upper())
+    token_info = token_registry.resolve(chain, token_symbol)
 
     if not token_info:
         return {"error": f"Token {token_symbol} não encontrado na rede "
                 f"{chain}."}
 
-    token_address = token_info["address"]
-    token_decimals = token_info["decimals"]
+    token_symbol = token_info.symbol
+    token_address = token_info.address
+    token_decimals = token_info.decimals
 
     # Verifica se é token nativo
     is_native = is_native_token(token_symbol, chain)
@@ -155,7 +138,7 @@ async def create_transaction_data(
             "fromTokenInfo": {
                 "contract": token_address,
                 "decimals": token_decimals,
-                "name": token_info.get("name", token_symbol.upper())
+                "name": token_info.name or token_symbol
             }
         }
     }
@@ -167,11 +150,13 @@ class TransferAgent:
     def __init__(self):
         pass
 
-    async def get_transfer(self, user_request, extracted_data):
+    async def get_transfer(self, user_request, extracted_data, prefetch=None):
         chain = user_request.chain
         # Busca e armazena os tokens da rede antes de qualquer coisa
         try:
             await fetch_and_store_tokens(chain)
+        except UpstreamOverloaded:
+            raise
         except Exception:
             return {"error": f"Erro ao buscar tokens da rede {chain}. "
                     "Tente novamente."}
@@ -194,6 +179,12 @@ class TransferAgent:
         if not is_valid:
             return {"error": f"Endereço de destino inválido: {validation_message}"}
 
+        # Resolve o token informado (símbolo, endereço do contrato ou nome)
+        token_info = token_registry.resolve(chain, token_symbol)
+        if not token_info:
+            return {"error": f"Token {token_symbol} não encontrado na rede {chain}."}
+        token_symbol = token_info.symbol
+
         # Valida se tem saldo suficiente (incluindo gas fee para tokens nativos)
         is_native = is_native_token(token_symbol, chain)
         balance_validation = await validate_sufficient_balance(
@@ -201,7 +192,8 @@ class TransferAgent:
             token_symbol, 
             amount, 
             chain, 
-            include_gas_fee=is_native  # Considera gas fee apenas para tokens nativos
+            include_gas_fee=is_native,  # Considera gas fee apenas para tokens nativos
+            prefetch=prefetch
         )
         
         if not balance_validation["success"]:
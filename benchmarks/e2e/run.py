@@ -0,0 +1,393 @@
+"""
+Benchmark ponta a ponta do /process, sem serviços externos.
+
+Sobe os serviços locais (benchmarks.e2e.stand_ins: LI.FI, JSON-RPC, CoinGecko,
+Moralis e PostgREST com latência configurável) e N workers com a aplicação
+real (benchmarks.e2e.worker, Gemini local em stream), cada um em seu próprio
+processo. Em seguida dispara a carga com a concorrência e o mix de intenções
+pedidos e mede, por requisição, a latência total e o tempo até o primeiro
+byte do stream SSE.
+
+Relatório: p50/p95/p99 da latência e do primeiro byte (geral e por intenção),
+vazão, erros e memória (RSS) de cada worker. O resultado pode ser salvo como
+baseline (benchmarks/e2e/baselines/<nome>.json) e comparado em execuções
+futuras; a comparação termina com código 1 se alguma métrica piorar além da
+tolerância.
+
+Uso:
+    python -m benchmarks.e2e.run --workers 2 --concurrency 32 --requests 600 --save main
+    python -m benchmarks.e2e.run --workers 2 --concurrency 32 --requests 600 --compare main
+    python -m benchmarks.e2e.run --mix cotacao=0.7,swap=0.3 --llm-fraction 0 --renderer template
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from benchmarks.e2e.stand_ins import environment
+from benchmarks.e2e.workload import parse_mix, make_request
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Métricas comparadas com o baseline: (caminho no resultado, rótulo, maior é melhor)
+COMPARED_METRICS = [
+    (("latency_ms", "p50"), "latência p50 (ms)", False),
+    (("latency_ms", "p95"), "latência p95 (ms)", False),
+    (("latency_ms", "p99"), "latência p99 (ms)", False),
+    (("ttfb_ms", "p50"), "primeiro byte p50 (ms)", False),
+    (("ttfb_ms", "p95"), "primeiro byte p95 (ms)", False),
+    (("ttfb_ms", "p99"), "primeiro byte p99 (ms)", False),
+    (("throughput_rps",), "vazão (req/s)", True),
+    (("error_rate",), "taxa de erro", False),
+    (("memory_mb", "max_rss"), "RSS máx. por worker (MB)", False),
+    (("memory_mb", "max_peak"), "pico de RSS por worker (MB)", False),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+def distribution(values):
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 1),
+        "p95": round(percentile(values, 0.95) * 1000, 1),
+        "p99": round(percentile(values, 0.99) * 1000, 1),
+        "mean": round(sum(values) / len(values) * 1000, 1) if values else 0.0,
+    }
+
+
+def process_memory(pid):
+    """RSS atual e pico (MB) do processo, lidos de /proc (somente Linux)"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    name, value = line.split(":", 1)
+                    memory["rss" if name == "VmRSS" else "peak"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return memory
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Cluster:
+    """Processos do benchmark: serviços locais + workers da aplicação"""
+
+    def __init__(self, args):
+        self.args = args
+        self.stand_ins = None
+        self.workers = []
+        self.base_url = None
+
+    async def start(self):
+        args = self.args
+        self.stand_ins = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.e2e.stand_ins", "--latency", args.latency,
+            "--jitter", str(args.jitter), "--tokens", str(args.tokens), "--seed", str(args.seed),
+            cwd=ROOT, stdout=asyncio.subprocess.PIPE,
+        )
+        line = (await asyncio.wait_for(self.stand_ins.stdout.readline(), timeout=30)).decode().strip()
+        if not line.startswith("READY "):
+            raise RuntimeError(f"Serviços locais não iniciaram: {line!r}")
+        self.base_url = line.split(" ", 1)[1]
+
+        env = {
+            **os.environ,
+            **environment(self.base_url),
+            "GEMINI_API_KEY": "benchmark",
+            "MORALIS_API_KEY": "benchmark",
+            "SUPABASE_ANON_KEY": "benchmark",
+            "CORS_ORIGIN": "http://localhost",
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+            "MESSAGE_RENDERER": args.renderer,
+            # Aviso de descontinuação do SDK do Gemini, repetido em cada worker
+            "PYTHONWARNINGS": "ignore::FutureWarning",
+        }
+        for index in range(args.workers):
+            port = free_port()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "benchmarks.e2e.worker", "--port", str(port),
+                "--gemini-classify-ms", str(args.gemini_classify_ms), "--gemini-ttft-ms", str(args.gemini_ttft_ms),
+                "--gemini-chunk-ms", str(args.gemini_chunk_ms), "--gemini-chunks", str(args.gemini_chunks),
+                cwd=ROOT, env={**env, "TELEMETRY_NODE_ID": str(index)}, stdout=asyncio.subprocess.DEVNULL,
+            )
+            self.workers.append((process, f"http://127.0.0.1:{port}"))
+
+        # Pronto quando o lifespan termina (lista de tokens pré-carregada)
+        async with httpx.AsyncClient() as client:
+            for process, url in self.workers:
+                deadline = time.monotonic() + 60
+                while True:
+                    if process.returncode is not None:
+                        raise RuntimeError(f"Worker {url} encerrou com código {process.returncode}")
+                    try:
+                        if (await client.get(f"{url}/metrics")).status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(f"Worker {url} não respondeu em 60s")
+                    await asyncio.sleep(0.2)
+
+    def memory(self):
+        return [process_memory(process.pid) for process, _ in self.workers]
+
+    async def upstream_stats(self):
+        async with httpx.AsyncClient() as client:
+            return (await client.get(f"{self.base_url}/_stats")).json()
+
+    async def stop(self):
+        processes = [process for process, _ in self.workers] + ([self.stand_ins] if self.stand_ins else [])
+        for process in processes:
+            if process.returncode is None:
+                process.terminate()
+        for process in processes:
+            try:
+                await asyncio.wait_for(process.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+
+
+async def send(client, base_url, request):
+    """Executa uma requisição e mede o tempo total e o do primeiro byte do corpo"""
+    method, path, body, params = request
+    start = time.perf_counter()
+    first_byte = None
+    received = bytearray()
+    try:
+        async with client.stream(method, f"{base_url}{path}", json=body, params=params) as response:
+            async for chunk in response.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+                received += chunk
+            status = response.status_code
+    except httpx.HTTPError as e:
+        return {"ok": False, "error": type(e).__name__, "total": time.perf_counter() - start, "ttfb": None}
+    total = time.perf_counter() - start
+    ok = status == 200 and (path != "/process" or b"data: [DONE]" in received)
+    return {"ok": ok, "error": None if ok else f"HTTP {status}", "total": total, "ttfb": first_byte}
+
+
+async def run_load(cluster, args, requests, record):
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    intents, weights = list(mix), list(mix.values())
+    chains = [chain.strip().upper() for chain in args.chains.split(",")]
+    plan = []
+    for index in range(requests):
+        intent = rng.choices(intents, weights)[0]
+        chain = rng.choice(chains)
+        plan.append((intent, make_request(rng, intent, chain, args.llm_fraction, index),
+                     cluster.workers[index % len(cluster.workers)][1]))
+
+    results = []
+    queue = iter(plan)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(120)) as client:
+        async def client_loop():
+            # Carga em malha fechada: cada cliente envia a próxima ao receber a resposta
+            for intent, request, base_url in queue:
+                result = await send(client, base_url, request)
+                if record:
+                    results.append({"intent": intent, "process": request[1] == "/process", **result})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def summarize(results, elapsed, memory_after_warmup, memory_after_run):
+    process_results = [result for result in results if result["process"]]
+    errors = [result for result in results if not result["ok"]]
+    by_intent = {}
+    for intent in sorted({result["intent"] for result in results}):
+        entries = [result for result in results if result["intent"] == intent]
+        by_intent[intent] = {
+            "requests": len(entries),
+            "errors": sum(not result["ok"] for result in entries),
+            "latency_ms": distribution([result["total"] for result in entries]),
+            "ttfb_ms": distribution([result["ttfb"] for result in entries if result["ttfb"] is not None]),
+        }
+
+    workers = [
+        {"rss_after_warmup": warm.get("rss"), "rss": after.get("rss"), "peak": after.get("peak")}
+        for warm, after in zip(memory_after_warmup, memory_after_run)
+    ]
+    error_kinds = {}
+    for result in errors:
+        error_kinds[result["error"]] = error_kinds.get(result["error"], 0) + 1
+    return {
+        "requests": len(results),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 4) if results else 0.0,
+        "error_kinds": error_kinds,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": distribution([result["total"] for result in results]),
+        # Primeiro byte do stream SSE (só /process)
+        "ttfb_ms": distribution([result["ttfb"] for result in process_results if result["ttfb"] is not None]),
+        "by_intent": by_intent,
+        "memory_mb": {
+            "workers": workers,
+            "max_rss": max((worker["rss"] or 0 for worker in workers), default=0),
+            "max_peak": max((worker["peak"] or 0 for worker in workers), default=0),
+        },
+    }
+
+
+def print_report(report):
+    results = report["results"]
+    config = report["config"]
+    print(f"\n{results['requests']} requisições em {results['elapsed_s']:.2f}s | "
+          f"{config['workers']} worker(s), concorrência {config['concurrency']} | "
+          f"vazão {results['throughput_rps']:.1f} req/s | erros {results['errors']} {results['error_kinds'] or ''}")
+    print(f"{'':<16}{'req':>6}{'erros':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'1º byte p50':>13}{'p95':>9}{'p99':>9}")
+    rows = [("total", results)] + list(results["by_intent"].items())
+    for name, entry in rows:
+        latency, ttfb = entry["latency_ms"], entry["ttfb_ms"]
+        print(f"{name:<16}{entry['requests']:>6}{entry['errors']:>7}"
+              f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+              f"{ttfb['p50']:>13.1f}{ttfb['p95']:>9.1f}{ttfb['p99']:>9.1f}")
+    print("(ms; 1º byte = primeiro byte do stream SSE no /process)")
+    for index, worker in enumerate(results["memory_mb"]["workers"]):
+        print(f"worker {index}: RSS após aquecimento {worker['rss_after_warmup']} MB, "
+              f"no fim {worker['rss']} MB, pico {worker['peak']} MB")
+    print(f"chamadas aos serviços locais: {report['upstream_requests']}")
+
+
+def _metric(results, path):
+    value = results
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(report, baseline, tolerance):
+    """Compara com o baseline; retorna as métricas que pioraram além da tolerância"""
+    print(f"\nComparação com o baseline {baseline.get('name')} "
+          f"(commit {baseline.get('commit')}, {baseline.get('created_at')}), tolerância {tolerance:.0%}")
+    differing = {key: (baseline["config"].get(key), value) for key, value in report["config"].items()
+                 if baseline["config"].get(key) != value}
+    if differing:
+        print(f"Atenção: configuração diferente do baseline: {differing}")
+
+    regressions = []
+    for path, label, higher_is_better in COMPARED_METRICS:
+        before, after = _metric(baseline["results"], path), _metric(report["results"], path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before if before else (0.0 if after == before else float("inf"))
+        worse = -change if higher_is_better else change
+        # Taxa de erro: qualquer aumento a partir de zero conta
+        regressed = worse > tolerance or (path == ("error_rate",) and after > before)
+        if regressed:
+            regressions.append(label)
+        print(f"{label:<30}{before:>12.1f}{after:>12.1f}{change:>+10.1%}{'  REGRESSÃO' if regressed else ''}")
+    return regressions
+
+
+def load_baseline(name):
+    with open(os.path.join(BASELINES_DIR, f"{name}.json")) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(name, report):
+    os.makedirs(BASELINES_DIR, exist_ok=True)
+    path = os.path.join(BASELINES_DIR, f"{name}.json")
+    with open(path, "w") as baseline_file:
+        json.dump({"name": name, **report}, baseline_file, indent=2, ensure_ascii=False)
+        baseline_file.write("\n")
+    print(f"\nBaseline salvo em {os.path.relpath(path, ROOT)}")
+
+
+async def run(args):
+    cluster = Cluster(args)
+    try:
+        await cluster.start()
+        if args.warmup:
+            await run_load(cluster, args, args.warmup, record=False)
+        memory_after_warmup = cluster.memory()
+        results, elapsed = await run_load(cluster, args, args.requests, record=True)
+        memory_after_run = cluster.memory()
+        upstream_requests = (await cluster.upstream_stats())["requests"]
+    finally:
+        await cluster.stop()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("save", "compare", "tolerance", "json")}
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": config,
+        "results": summarize(results, elapsed, memory_after_warmup, memory_after_run),
+        "upstream_requests": upstream_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--mix", default="", help="pesos por intenção, ex.: cotacao=0.5,swap=0.3,outro=0.2")
+    parser.add_argument("--llm-fraction", type=float, default=0.3,
+                        help="fração dos prompts em texto livre (classificados pelo Gemini)")
+    parser.add_argument("--chains", default="ETH")
+    parser.add_argument("--renderer", choices=("llm", "template"), default="llm")
+    parser.add_argument("--latency", default="", help="ms por upstream, ex.: lifi_quote=250,rpc=40")
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--tokens", type=int, default=1000, help="tokens por rede na lista da LI.FI")
+    parser.add_argument("--gemini-classify-ms", type=float, default=450)
+    parser.add_argument("--gemini-ttft-ms", type=float, default=350)
+    parser.add_argument("--gemini-chunk-ms", type=float, default=40)
+    parser.add_argument("--gemini-chunks", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save", metavar="NOME", help="salva o resultado como baseline")
+    parser.add_argument("--compare", metavar="NOME", help="compara com um baseline salvo")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado completo em JSON")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.save:
+        save_baseline(args.save, report)
+    if baseline is not None and compare(report, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
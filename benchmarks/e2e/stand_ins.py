@@ -0,0 +1,340 @@
+"""
+Serviços externos locais para o benchmark ponta a ponta, com latência
+configurável por upstream. Um único servidor aiohttp atende, por prefixo:
+
+    /lifi/v1/tokens, /lifi/v1/quote, /lifi/v1/gas/prices/{chain_id}   LI.FI
+    /rpc/{chain}          JSON-RPC (eth_getBalance, eth_call e Multicall3)
+    /coingecko/api/v3/simple/price                                     CoinGecko
+    /moralis/api/v2.2/wallets/{wallet}/{history|tokens}                Moralis
+    /supabase/rest/v1/messages                                         PostgREST
+    /_stats               requisições atendidas por upstream
+
+Roda em um processo próprio (iniciado por benchmarks.e2e.run), para não
+disputar a CPU com os workers medidos nem com o gerador de carga. A primeira
+linha da saída é "READY <url base>".
+
+Uso direto:
+    python -m benchmarks.e2e.stand_ins --latency lifi_quote=250,rpc=40 --jitter 0.25
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.e2e.workload import WALLET
+from benchmarks.portfolio_multicall import FakeRpcNode, NATIVE
+from services.lifi_service import CHAIN_ID_MAPPING
+from services.token_registry import TokenRecord
+
+# Latência média (ms) de cada upstream, medida de fora contra os serviços reais
+DEFAULT_LATENCY_MS = {
+    "lifi_tokens": 300,
+    "lifi_quote": 250,
+    "lifi_gas": 80,
+    "rpc": 40,
+    "coingecko": 80,
+    "moralis": 150,
+    "supabase": 30,
+}
+
+# Tokens usados pela carga em cada rede: (símbolo, decimais, preço em USD, nome)
+CORE_TOKENS = {
+    "ETH": [("ETH", 18, "3000", "Ether"), ("USDC", 6, "1.00", "USD Coin"), ("USDT", 6, "1.00", "Tether USD"),
+            ("DAI", 18, "1.00", "Dai Stablecoin"), ("WBTC", 8, "65000", "Wrapped BTC")],
+    "BAS": [("ETH", 18, "3000", "Ether"), ("USDC", 6, "1.00", "USD Coin"), ("DAI", 18, "1.00", "Dai Stablecoin")],
+    # Sem preço do token nativo na lista: a transferência em POL passa pela CoinGecko
+    "POL": [("POL", 18, None, "Polygon Ecosystem Token"), ("USDC", 6, "1.00", "USD Coin"),
+            ("USDT", 6, "1.00", "Tether USD"), ("WBTC", 8, "65000", "Wrapped BTC")],
+}
+COINGECKO_PRICES = {"ethereum": 3000.0, "matic-network": 0.5}
+ROUTER_ADDRESS = "0x1231deb6f5749ef6ce6943a275a1d3e7486f4eae"
+
+
+def parse_latencies(spec):
+    """Converte "lifi_quote=250,rpc=40" em segundos, partindo dos valores padrão"""
+    latencies = {name: value / 1000 for name, value in DEFAULT_LATENCY_MS.items()}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, value = item.split("=", 1)
+        if name.strip() not in latencies:
+            raise ValueError(f"Upstream desconhecido: {name.strip()}")
+        latencies[name.strip()] = float(value) / 1000
+    return latencies
+
+
+class LatencyModel:
+    """Latência por upstream com cauda log-normal (jitter = desvio do logaritmo)"""
+
+    def __init__(self, latencies, jitter, seed):
+        self.latencies = latencies
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    def sample(self, upstream):
+        base = self.latencies[upstream]
+        if not self.jitter:
+            return base
+        return base * self.rng.lognormvariate(-self.jitter ** 2 / 2, self.jitter)
+
+    async def wait(self, upstream):
+        await asyncio.sleep(self.sample(upstream))
+
+
+def build_token_list(chain, total, seed):
+    """Lista de tokens da rede no formato da LI.FI: tokens da carga + tokens de preenchimento"""
+    rng = random.Random(f"{seed}-{chain}")
+    chain_id = int(CHAIN_ID_MAPPING[chain], 16)
+    tokens = []
+    for symbol, decimals, price, name in CORE_TOKENS[chain]:
+        address = NATIVE if decimals == 18 and symbol in ("ETH", "POL") else "0x" + rng.randbytes(20).hex()
+        tokens.append({"chainId": chain_id, "address": address, "symbol": symbol, "name": name,
+                       "decimals": decimals, "priceUSD": price, "coinKey": symbol,
+                       "logoURI": f"https://static.example/{symbol.lower()}.png"})
+    for index in range(max(0, total - len(tokens))):
+        symbol = f"TK{index}"
+        tokens.append({"chainId": chain_id, "address": "0x" + rng.randbytes(20).hex(), "symbol": symbol,
+                       "name": f"Token {index}", "decimals": rng.choice([6, 8, 18]),
+                       "priceUSD": f"{rng.uniform(0.0001, 50):.6f}", "coinKey": symbol,
+                       "logoURI": f"https://static.example/{symbol.lower()}.png"})
+    return tokens
+
+
+class StandInRpcNode(FakeRpcNode):
+    """Nó JSON-RPC com saldo alto em todos os tokens da carga (as validações de saldo passam)"""
+
+    def __init__(self, wallet, tokens, latency_model):
+        self.wallet = wallet.lower()
+        self.latency_model = latency_model
+        self.balances = {token.address.lower(): 10 ** 30 for token in tokens}
+        self.requests = 0
+
+    @property
+    def latency(self):
+        return self.latency_model.sample("rpc")
+
+
+class StandInServices:
+    def __init__(self, latency_model, tokens_per_chain, seed):
+        self.latency = latency_model
+        self.requests = {}
+        self.rows = 0
+        self.message_ids = set()
+        self.token_lists = {chain: build_token_list(chain, tokens_per_chain, seed) for chain in CORE_TOKENS}
+        self.tokens_by_address = {
+            chain: {token["address"].lower(): token for token in tokens}
+            for chain, tokens in self.token_lists.items()
+        }
+        self.rpc_nodes = {
+            chain: StandInRpcNode(
+                WALLET,
+                [TokenRecord(token["symbol"], token["address"], token["decimals"], token["name"], None)
+                 for token in tokens[:len(CORE_TOKENS[chain])]],
+                latency_model,
+            )
+            for chain, tokens in self.token_lists.items()
+        }
+
+    def _count(self, upstream):
+        self.requests[upstream] = self.requests.get(upstream, 0) + 1
+
+    # LI.FI
+
+    async def lifi_tokens(self, request):
+        self._count("lifi_tokens")
+        await self.latency.wait("lifi_tokens")
+        chains = [chain.strip().upper() for chain in request.query.get("chains", "").split(",") if chain.strip()]
+        return web.json_response({
+            "tokens": {
+                str(int(CHAIN_ID_MAPPING[chain], 16)): self.token_lists[chain]
+                for chain in chains if chain in self.token_lists
+            }
+        })
+
+    async def lifi_gas(self, request):
+        self._count("lifi_gas")
+        await self.latency.wait("lifi_gas")
+        return web.json_response({"standard": 20_000_000_000, "fast": 25_000_000_000,
+                                  "slow": 15_000_000_000, "lastUpdated": 0})
+
+    async def lifi_quote(self, request):
+        self._count("lifi_quote")
+        await self.latency.wait("lifi_quote")
+        query = request.query
+        chain = query.get("fromChain", "").upper()
+        tokens = self.tokens_by_address.get(chain, {})
+        from_token = tokens.get(query.get("fromToken", "").lower())
+        to_token = tokens.get(query.get("toToken", "").lower())
+        if from_token is None or to_token is None:
+            return web.json_response({"message": "No available quotes for the requested transfer", "code": 1002},
+                                     status=404)
+
+        from_amount = int(query.get("fromAmount", "0"))
+        from_price = float(from_token["priceUSD"] or 0.5)
+        to_price = float(to_token["priceUSD"] or 0.5)
+        value_usd = from_amount / 10 ** from_token["decimals"] * from_price
+        to_amount = int(value_usd / to_price * 10 ** to_token["decimals"])
+        chain_id = from_token["chainId"]
+        estimate = {
+            "tool": "uniswap",
+            "fromAmount": str(from_amount),
+            "toAmount": str(to_amount),
+            "toAmountMin": str(int(to_amount * 0.99)),
+            "approvalAddress": ROUTER_ADDRESS,
+            "executionDuration": 30,
+            "fromAmountUSD": f"{value_usd:.2f}",
+            "toAmountUSD": f"{value_usd * 0.997:.2f}",
+            "feeCosts": [],
+            "gasCosts": [{"type": "SEND", "price": "20000000000", "estimate": "180000", "limit": "240000",
+                          "amount": "3600000000000000", "amountUSD": "10.80",
+                          "token": self.token_lists[chain][0]}],
+        }
+        action = {"fromChainId": chain_id, "toChainId": chain_id, "fromToken": from_token, "toToken": to_token,
+                  "fromAmount": str(from_amount), "slippage": float(query.get("slippage", "0.005")),
+                  "fromAddress": query.get("fromAddress"), "toAddress": query.get("fromAddress")}
+        return web.json_response({
+            "type": "lifi",
+            "id": str(uuid.uuid4()),
+            "tool": "uniswap",
+            "toolDetails": {"key": "uniswap", "name": "Uniswap V3", "logoURI": "https://static.example/uniswap.png"},
+            "action": action,
+            "estimate": estimate,
+            "includedSteps": [{"id": str(uuid.uuid4()), "type": "swap", "tool": "uniswap",
+                               "action": action, "estimate": estimate}],
+            "transactionRequest": {
+                "from": query.get("fromAddress"),
+                "to": ROUTER_ADDRESS,
+                "chainId": chain_id,
+                "data": "0x" + "4630a0d8" + "00" * 1200,
+                "value": hex(from_amount if from_token["address"] == NATIVE else 0),
+                "gasPrice": hex(20_000_000_000),
+                "gasLimit": hex(240_000),
+            },
+        })
+
+    # JSON-RPC
+
+    async def rpc(self, request):
+        self._count("rpc")
+        node = self.rpc_nodes.get(request.match_info["chain"].upper())
+        if node is None:
+            raise web.HTTPNotFound()
+        return await node.handle(request)
+
+    # CoinGecko
+
+    async def coingecko_price(self, request):
+        self._count("coingecko")
+        await self.latency.wait("coingecko")
+        ids = [coin_id for coin_id in request.query.get("ids", "").split(",") if coin_id in COINGECKO_PRICES]
+        return web.json_response({coin_id: {"usd": COINGECKO_PRICES[coin_id]} for coin_id in ids})
+
+    # Moralis
+
+    async def moralis_wallet(self, request):
+        self._count("moralis")
+        await self.latency.wait("moralis")
+        wallet = request.match_info["wallet"]
+        if request.match_info["kind"] == "tokens":
+            result = [
+                {"token_address": token["address"], "symbol": token["symbol"], "name": token["name"],
+                 "decimals": token["decimals"], "balance": str(10 ** token["decimals"] * 3),
+                 "usd_price": float(token["priceUSD"] or 0.5), "native_token": token["address"] == NATIVE}
+                for token in self.token_lists["ETH"][:len(CORE_TOKENS["ETH"])]
+            ]
+            return web.json_response({"cursor": None, "page": 0, "page_size": 100, "result": result})
+        if request.match_info["kind"] == "history":
+            limit = int(request.query.get("limit", "5"))
+            result = [
+                {"hash": "0x" + uuid.uuid4().hex * 2, "from_address": wallet, "to_address": ROUTER_ADDRESS,
+                 "value": "0", "block_number": str(21_000_000 - index), "category": "token swap",
+                 "summary": "Swapped tokens", "possible_spam": False}
+                for index in range(limit)
+            ]
+            return web.json_response({"cursor": None, "page": 0, "page_size": limit, "result": result})
+        raise web.HTTPNotFound()
+
+    # PostgREST (tabela messages)
+
+    async def supabase_messages(self, request):
+        self._count("supabase")
+        await self.latency.wait("supabase")
+        body = await request.json() if request.can_read_body else {}
+        if isinstance(body, list):
+            # Lote de criação da fila de telemetria (ignore-duplicates, devolve
+            # as linhas inseridas); as atualizações chegam uma a uma (PATCH)
+            self.rows += len(body)
+            if "ignore-duplicates" in request.headers.get("Prefer", ""):
+                inserted = [row for row in body if row["id"] not in self.message_ids]
+                self.message_ids.update(row["id"] for row in inserted)
+                return web.json_response(inserted, status=201)
+            return web.Response(status=201)
+        self.rows += 1
+        return web.json_response([{"id": 1, **body}], status=201 if request.method == "POST" else 200)
+
+    async def stats(self, request):
+        return web.json_response({"requests": self.requests, "rows": self.rows})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/lifi/v1/tokens", self.lifi_tokens)
+        app.router.add_get("/lifi/v1/quote", self.lifi_quote)
+        app.router.add_get("/lifi/v1/gas/prices/{chain_id}", self.lifi_gas)
+        app.router.add_post("/rpc/{chain}", self.rpc)
+        app.router.add_get("/coingecko/api/v3/simple/price", self.coingecko_price)
+        app.router.add_get("/moralis/api/v2.2/wallets/{wallet}/{kind}", self.moralis_wallet)
+        app.router.add_route("*", "/supabase/rest/v1/messages", self.supabase_messages)
+        app.router.add_get("/_stats", self.stats)
+        return app
+
+
+def environment(base_url):
+    """Variáveis de ambiente que apontam a aplicação para os serviços locais"""
+    return {
+        "LIFI_BASE_URL": f"{base_url}/lifi/v1",
+        "COINGECKO_BASE_URL": f"{base_url}/coingecko/api/v3",
+        "MORALIS_BASE_URL": f"{base_url}/moralis/api/v2.2",
+        "SUPABASE_URL": f"{base_url}/supabase",
+        **{f"RPC_URLS_{chain}": f"{base_url}/rpc/{chain.lower()}" for chain in CORE_TOKENS},
+    }
+
+
+async def serve(args):
+    services = StandInServices(LatencyModel(parse_latencies(args.latency), args.jitter, args.seed),
+                               args.tokens, args.seed)
+    runner = web.AppRunner(services.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, args.host, args.port, backlog=4096)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    print(f"READY http://{args.host}:{port}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", default="", help="ms por upstream, ex.: lifi_quote=250,rpc=40")
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--tokens", type=int, default=1000, help="tokens por rede na lista da LI.FI")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
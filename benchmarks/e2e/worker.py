@@ -0,0 +1,82 @@
+"""
+Worker do benchmark ponta a ponta: a aplicação real (main.app) servida pelo
+uvicorn, com o Gemini substituído por um modelo local que respeita o formato
+do SDK (classificação em JSON e resposta em stream, chunk a chunk).
+
+Os serviços externos são definidos pelas variáveis de ambiente repassadas por
+benchmarks.e2e.run (LIFI_BASE_URL, RPC_URLS_<CHAIN>, SUPABASE_URL, ...).
+
+Uso direto:
+    python -m benchmarks.e2e.worker --port 8100 --gemini-ttft-ms 350 --gemini-chunks 12
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmarks.e2e.workload import classify
+
+# Texto de resposta dividido em chunks (o tamanho aproxima uma resposta real)
+_RESPONSE_WORDS = (
+    "Aqui está o resumo da sua operação: valores estimados, taxa de rede e o "
+    "tempo previsto de execução. Confira os dados antes de confirmar na sua carteira."
+).split()
+
+
+class StandInGemini:
+    """Modelo local com a latência de classificação, do primeiro token e entre chunks"""
+
+    def __init__(self, call_type, system_instruction, classify_ms, ttft_ms, chunk_ms, chunks):
+        self.call_type = call_type
+        self.classify_seconds = classify_ms / 1000
+        self.ttft_seconds = ttft_ms / 1000
+        self.chunk_seconds = chunk_ms / 1000
+        self.chunks = max(1, chunks)
+
+    async def generate_content_async(self, contents, stream=False):
+        if not stream:
+            await asyncio.sleep(self.classify_seconds)
+            return SimpleNamespace(text=json.dumps(classify(contents)), usage_metadata=None)
+
+        await asyncio.sleep(self.ttft_seconds)
+        size = max(1, len(_RESPONSE_WORDS) // self.chunks)
+
+        async def chunks():
+            for index in range(self.chunks):
+                if index:
+                    await asyncio.sleep(self.chunk_seconds)
+                words = _RESPONSE_WORDS[index * size:(index + 1) * size] or _RESPONSE_WORDS[-size:]
+                yield SimpleNamespace(text=" ".join(words) + " ", usage_metadata=None)
+        return chunks()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--gemini-classify-ms", type=float, default=450)
+    parser.add_argument("--gemini-ttft-ms", type=float, default=350)
+    parser.add_argument("--gemini-chunk-ms", type=float, default=40)
+    parser.add_argument("--gemini-chunks", type=int, default=8)
+    args = parser.parse_args()
+
+    import main
+    from services.gemini_service import GeminiService
+
+    def model_factory(call_type, system_instruction):
+        return StandInGemini(call_type, system_instruction, args.gemini_classify_ms,
+                             args.gemini_ttft_ms, args.gemini_chunk_ms, args.gemini_chunks)
+
+    main.router_agent.gemini_service = GeminiService(model_factory=model_factory)
+    uvicorn.run(main.app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main_cli()
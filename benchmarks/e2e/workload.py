@@ -0,0 +1,123 @@
+"""
+Carga do benchmark ponta a ponta: prompts de cada intenção e a classificação
+que o Gemini local devolve para os prompts em texto livre.
+
+Parte dos prompts usa frases reconhecidas pelo extrator local (sem chamada
+de classificação) e parte é texto livre, classificado pelo Gemini local.
+As quantidades variam a cada requisição para não transformar o teste em um
+teste dos caches de cotação e de intenção.
+"""
+
+import re
+
+WALLET = "0x" + "ab" * 20
+RECIPIENT = "0x" + "cd" * 20
+
+# Intenções do benchmark e o peso padrão de cada uma ("carteira" = rotas /wallets da Moralis)
+DEFAULT_MIX = {"cotacao": 0.4, "swap": 0.25, "transferencia": 0.15, "outro": 0.1, "carteira": 0.1}
+
+# Pares negociados em cada rede (todos presentes na lista de tokens da LI.FI local)
+PAIRS = {
+    "ETH": [("ETH", "USDC"), ("USDC", "ETH"), ("WBTC", "USDT"), ("DAI", "USDC")],
+    "BAS": [("ETH", "USDC"), ("USDC", "ETH"), ("DAI", "USDC")],
+    "POL": [("POL", "USDC"), ("USDC", "POL"), ("WBTC", "USDT")],
+}
+TRANSFER_TOKENS = {"ETH": ["ETH", "USDC"], "BAS": ["ETH", "USDC"], "POL": ["POL", "USDC"]}
+
+# Frases reconhecidas pelo extrator local (services/intent_parser.py)
+PARSED_PROMPTS = {
+    "cotacao": "quanto vale {amount} {from_token} em {to_token}",
+    "swap": "quero trocar {amount} {from_token} por {to_token}",
+    "transferencia": "quero enviar {amount} {token} para {address}",
+}
+
+# Texto livre: exige a classificação do Gemini
+FREEFORM_PROMPTS = {
+    "cotacao": "me diz aí quanto daria hoje {amount} de {from_token} se eu passasse tudo para {to_token}",
+    "swap": "bora fazer aquele swap, {amount} dos meus {from_token} indo para {to_token}",
+    "transferencia": "manda aí {amount} {token} lá na carteira {address}, valeu",
+    "outro": "oi! o que você consegue fazer por mim? ({nonce})",
+}
+
+_FIELDS = {
+    "amount": r"(?P<amount>[\d.]+)",
+    "from_token": r"(?P<from_token>\w+)",
+    "to_token": r"(?P<to_token>\w+)",
+    "token": r"(?P<token>\w+)",
+    "address": r"(?P<address>0x[0-9a-fA-F]{40})",
+    "nonce": r"\d+",
+}
+
+
+def _template_regex(template):
+    pattern = re.escape(template)
+    for field, group in _FIELDS.items():
+        pattern = pattern.replace(re.escape("{" + field + "}"), group)
+    return re.compile(pattern)
+
+
+_FREEFORM_REGEXES = [(intent, _template_regex(template)) for intent, template in FREEFORM_PROMPTS.items()]
+
+
+def parse_mix(spec):
+    """Converte "cotacao=0.5,swap=0.5" em pesos por intenção"""
+    if not spec:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for item in spec.split(","):
+        intent, weight = item.split("=", 1)
+        intent = intent.strip()
+        if intent not in DEFAULT_MIX:
+            raise ValueError(f"Intenção desconhecida no mix: {intent}")
+        mix[intent] = float(weight)
+    return mix
+
+
+def classify(text):
+    """Classificação devolvida pelo Gemini local para um prompt em texto livre"""
+    for intent, regex in _FREEFORM_REGEXES:
+        match = regex.search(text)
+        if match is None:
+            continue
+        groups = match.groupdict()
+        if intent == "transferencia":
+            return {"intent": intent, "token": groups["token"], "amount": groups["amount"],
+                    "toAddress": groups["address"], "language": "pt"}
+        if intent in ("cotacao", "swap"):
+            return {"intent": intent, "fromToken": groups["from_token"], "toToken": groups["to_token"],
+                    "fromAmount": groups["amount"], "language": "pt"}
+        return {"intent": intent, "language": "pt"}
+    return {"intent": "outro", "language": "pt"}
+
+
+def _amount(rng, token):
+    if token in ("ETH", "WBTC"):
+        # Até duas casas decimais ("0.125" é ambíguo em pt e iria para o Gemini)
+        return f"{rng.uniform(0.01, 0.5):.2f}".rstrip("0")
+    return str(rng.randint(5, 500))
+
+
+def make_request(rng, intent, chain, llm_fraction, index):
+    """
+    Monta uma requisição da intenção pedida.
+
+    Returns:
+        tuple: (método, caminho, corpo JSON ou None, parâmetros de query ou None)
+    """
+    if intent == "carteira":
+        kind = rng.choice(("tokens", "history"))
+        return "GET", f"/wallets/{WALLET}/{kind}", None, {"chain": chain.lower()}
+
+    values = {"nonce": index, "address": RECIPIENT}
+    if intent in ("cotacao", "swap"):
+        from_token, to_token = rng.choice(PAIRS[chain])
+        values.update(from_token=from_token, to_token=to_token, amount=_amount(rng, from_token))
+    elif intent == "transferencia":
+        token = rng.choice(TRANSFER_TOKENS[chain])
+        values.update(token=token, amount=_amount(rng, token))
+
+    if intent in PARSED_PROMPTS and rng.random() >= llm_fraction:
+        text = PARSED_PROMPTS[intent].format(**values)
+    else:
+        text = FREEFORM_PROMPTS[intent].format(**values)
+    return "POST", "/process", {"input": text, "walletAddress": WALLET, "chain": chain}, None
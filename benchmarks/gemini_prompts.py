@@ -0,0 +1,202 @@
+"""
+Compara o layout antigo dos prompts do GeminiService (instruções fixas
+reenviadas dentro do prompt, com dados variáveis no início) com as
+instruções fixas em system_instruction, usando um modelo local no lugar do Gemini.
+
+O modelo local estima tokens (~4 caracteres por token), reaproveita o maior
+prefixo já visto (como o cache implícito de prefixo do Gemini) e simula o
+tempo até o primeiro token proporcional aos tokens de entrada não cacheados.
+
+Uso:
+    python -m benchmarks.gemini_prompts --requests 200 --prefill-tokens-per-ms 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+import services.gemini_service as gemini_module
+from services.gemini_service import GeminiService, GeminiUsage
+
+# Nos prompts antigos só a classificação deixava a parte variável no fim;
+# nos demais o idioma/contexto aparecia logo no início do prompt
+LEGACY_VARIABLE_AT_END = {"classify_intent"}
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class PrefixCache:
+    """Cache de prefixo compartilhado entre as requisições de um mesmo modo"""
+
+    def __init__(self, min_tokens, max_entries=64):
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self.prompts = []
+
+    def cached_tokens(self, prompt):
+        best = 0
+        for previous in self.prompts:
+            best = max(best, len(os.path.commonprefix([previous, prompt])))
+        self.prompts.append(prompt)
+        del self.prompts[:-self.max_entries]
+        tokens = best // 4
+        return tokens if tokens >= self.min_tokens else 0
+
+
+class StandInModel:
+    def __init__(self, call_type, system_instruction, legacy, prefix_cache, args):
+        self.call_type = call_type
+        self.system_instruction = system_instruction
+        self.legacy = legacy
+        self.prefix_cache = prefix_cache
+        self.args = args
+
+    def _prompt(self, contents):
+        if not self.legacy:
+            return self.system_instruction + "\n" + contents
+        if self.call_type in LEGACY_VARIABLE_AT_END:
+            return self.system_instruction + "\n" + contents
+        return contents + "\n" + self.system_instruction
+
+    async def generate_content_async(self, contents, stream=False):
+        prompt = self._prompt(contents)
+        input_tokens = estimate_tokens(prompt)
+        cached_tokens = min(self.prefix_cache.cached_tokens(prompt), input_tokens)
+        uncached_tokens = input_tokens - cached_tokens
+
+        prefill_ms = (uncached_tokens + cached_tokens * 0.1) / self.args.prefill_tokens_per_ms
+        await asyncio.sleep((self.args.base_ms + prefill_ms) / 1000)
+
+        output = '{"intent": "nao_identificado", "language": "pt"}' if self.call_type == "classify_intent" else "ok " * 40
+        usage = SimpleNamespace(
+            prompt_token_count=input_tokens,
+            cached_content_token_count=cached_tokens,
+            candidates_token_count=estimate_tokens(output),
+        )
+        if not stream:
+            return SimpleNamespace(text=output, usage_metadata=usage)
+        return self._stream(output, usage)
+
+    async def _stream(self, output, usage):
+        words = output.split(" ")
+        for index in range(0, len(words), 8):
+            await asyncio.sleep(self.args.chunk_ms / 1000)
+            yield SimpleNamespace(text=" ".join(words[index:index + 8]) + " ", usage_metadata=usage)
+
+
+def build_workload(count, seed):
+    rng = random.Random(seed)
+    languages = ["pt", "en", "es"]
+    workload = []
+    for index in range(count):
+        language = rng.choice(languages)
+        kind = rng.choice(["classify", "quote", "swap", "transfer", "error", "helpful"])
+        amount = round(rng.uniform(0.1, 1000), 4)
+        payload = {
+            "fromToken": "USDC", "toToken": "ETH", "fromAmount": amount, "toAmount": amount / 3000,
+            "gasCosts": {"amountUSD": round(rng.uniform(0.01, 5), 2), "symbol": "ETH"},
+            "executionDuration": rng.choice([15, 30, 60]),
+        }
+        workload.append((kind, language, index, payload))
+    return workload
+
+
+async def run_request(service, kind, language, index, payload):
+    if kind == "classify":
+        await service.classify_intent_and_extract(f"swap {payload['fromAmount']} USDC for ETH #{index}")
+        return
+    generators = {
+        "quote": lambda: service.generate_friendly_message(payload, language),
+        "swap": lambda: service.generate_swap_message(payload, language),
+        "transfer": lambda: service.generate_transfer_message(payload, language),
+        "error": lambda: service.generate_error_response(language, f"Erro na cotação: Token X{index} não encontrado"),
+        "helpful": lambda: service.generate_helpful_response(f"oi, tudo bem? #{index}", language),
+    }
+    async for _ in generators[kind]():
+        pass
+
+
+async def run_mode(legacy, workload, args):
+    prefix_cache = PrefixCache(args.min_cached_tokens)
+    usage = GeminiUsage()
+
+    def factory(call_type, system_instruction):
+        return StandInModel(call_type, system_instruction, legacy, prefix_cache, args)
+
+    service = GeminiService(model_factory=factory)
+    service.usage = usage
+    gemini_module.intent_cache.clear()
+
+    # Os logs do serviço não interessam aqui
+    with contextlib.redirect_stdout(io.StringIO()):
+        for kind, language, index, payload in workload:
+            await run_request(service, kind, language, index, payload)
+    return usage
+
+
+def summarize(usage):
+    totals = {"calls": 0, "input": 0, "cached": 0}
+    rows = {}
+    for call_type, entry in usage.calls.items():
+        calls = entry["calls"]
+        uncached = entry["input_tokens"] - entry["cached_input_tokens"]
+        rows[call_type] = (
+            entry["input_tokens"] / calls,
+            uncached / calls,
+            entry["first_token_seconds"] * 1000 / calls,
+        )
+        totals["calls"] += calls
+        totals["input"] += entry["input_tokens"]
+        totals["cached"] += entry["cached_input_tokens"]
+    return rows, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-ms", type=float, default=80, help="latência fixa até o primeiro token")
+    parser.add_argument("--prefill-tokens-per-ms", type=float, default=20)
+    parser.add_argument("--chunk-ms", type=float, default=1)
+    parser.add_argument("--min-cached-tokens", type=int, default=256, help="prefixo mínimo reaproveitado pelo cache")
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    workload = build_workload(args.requests, args.seed)
+    results = {}
+    for label, legacy in (("prompt completo", True), ("system_instruction", False)):
+        rows, totals = summarize(asyncio.run(run_mode(legacy, workload, args)))
+        results[label] = {"rows": rows, "totals": totals}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    call_types = sorted(results["prompt completo"]["rows"])
+    print(f"{'tipo de chamada':<18} {'modo':<20} {'tokens entrada':>15} {'não cacheados':>14} {'1º token (ms)':>14}")
+    for call_type in call_types:
+        for label in results:
+            total, uncached, ttft = results[label]["rows"][call_type]
+            print(f"{call_type:<18} {label:<20} {total:>15.0f} {uncached:>14.0f} {ttft:>14.1f}")
+
+    for label, result in results.items():
+        totals = result["totals"]
+        uncached = (totals["input"] - totals["cached"]) / totals["calls"]
+        print(f"{label}: {uncached:.0f} tokens de entrada não cacheados por chamada "
+              f"({totals['cached'] / totals['input']:.0%} reaproveitados do prefixo)")
+
+
+if __name__ == "__main__":
+    main()
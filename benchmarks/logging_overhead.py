@@ -0,0 +1,58 @@
+"""
+Custo por chunk do registro de depuração no caminho do stream:
+print() síncrono (como antes) contra log_sampled com DEBUG desativado
+(produção) e com DEBUG ativo por amostragem. A saída vai para /dev/null,
+então a medição não inclui a latência do terminal.
+
+Uso:
+    python -m benchmarks.logging_overhead --chunks 200000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.logging_config import log_sampled, setup_logging, shutdown_logging
+
+
+def measure(label, chunks, emit):
+    start = time.perf_counter()
+    for index in range(chunks):
+        emit(f"chunk {index} do stream")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<38} {elapsed * 1e9 / chunks:8.1f} ns/chunk")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--sample-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        setup_logging(level="INFO", levels="", log_format="json", stream=devnull)
+        logger = logging.getLogger("benchmark.stream")
+
+        measure("sem registro (custo do laço)", args.chunks, lambda chunk: None)
+
+        measure("print() por chunk", args.chunks,
+                lambda chunk: print(f"🔍 DEBUG: Chunk recebido: {type(chunk)} - {chunk}", file=devnull))
+
+        measure("log_sampled, DEBUG desativado", args.chunks,
+                lambda chunk: log_sampled(logger, logging.DEBUG, "Chunk recebido: %r", chunk))
+
+        logger.setLevel(logging.DEBUG)
+        measure(f"log_sampled, DEBUG ativo ({args.sample_rate:.0%})", args.chunks,
+                lambda chunk: log_sampled(logger, logging.DEBUG, "Chunk recebido: %r", chunk, rate=args.sample_rate))
+
+        measure("logger.debug em todo chunk (fila)", args.chunks,
+                lambda chunk: logger.debug("Chunk recebido: %r", chunk))
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
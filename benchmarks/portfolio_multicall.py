@@ -0,0 +1,171 @@
+"""
+Compara a consulta de saldos via Multicall3 (um eth_call por bloco de chamadas)
+com uma requisição eth_call/eth_getBalance por token, usando um nó JSON-RPC
+local que implementa balanceOf, getEthBalance, getBlockNumber e aggregate3.
+
+Também confere se os saldos das duas abordagens são idênticos.
+
+Uso:
+    python -m benchmarks.portfolio_multicall --tokens 60 --rpc-ms 40
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.balance_validator import get_token_balance
+from services.http_client import http_clients
+from services.rpc_pool import rpc_pools
+from services.portfolio_service import (
+    PortfolioService, MULTICALL3_ADDRESS, AGGREGATE3_SELECTOR, BALANCE_OF_SELECTOR,
+    GET_ETH_BALANCE_SELECTOR, GET_BLOCK_NUMBER_SELECTOR
+)
+from services.token_registry import TokenRecord
+
+NATIVE = "0x0000000000000000000000000000000000000000"
+BLOCK_NUMBER = 21_000_000
+
+
+def _word(value):
+    return value.to_bytes(32, "big")
+
+
+class FakeRpcNode:
+    """Nó JSON-RPC local com saldos aleatórios (determinísticos pela seed)"""
+
+    def __init__(self, wallet, tokens, latency, seed):
+        rng = random.Random(seed)
+        self.wallet = wallet.lower()
+        self.latency = latency
+        self.balances = {token.address.lower(): rng.choice([0, rng.randrange(10 ** 24)]) for token in tokens}
+        self.requests = 0
+
+    def _execute(self, target, call_data):
+        selector, argument = call_data[:4].hex(), call_data[4:]
+        if target == MULTICALL3_ADDRESS.lower() and selector == GET_BLOCK_NUMBER_SELECTOR:
+            return True, _word(BLOCK_NUMBER)
+        if target == MULTICALL3_ADDRESS.lower() and selector == GET_ETH_BALANCE_SELECTOR:
+            return True, _word(self.balances.get(NATIVE, 0))
+        if selector == BALANCE_OF_SELECTOR and target in self.balances:
+            owner = "0x" + argument[12:32].hex()
+            return True, _word(self.balances[target] if owner == self.wallet else 0)
+        return False, b""
+
+    def _aggregate3(self, data):
+        def word(position):
+            return int.from_bytes(data[position:position + 32], "big")
+
+        array_start = word(0)
+        count = word(array_start)
+        base = array_start + 32
+        results = []
+        for index in range(count):
+            tuple_start = base + word(base + 32 * index)
+            target = "0x" + data[tuple_start + 12:tuple_start + 32].hex()
+            bytes_start = tuple_start + word(tuple_start + 64)
+            length = word(bytes_start)
+            results.append(self._execute(target, data[bytes_start + 32:bytes_start + 32 + length]))
+
+        encoded = []
+        for success, return_data in results:
+            padding = b"\x00" * (-len(return_data) % 32)
+            encoded.append(_word(int(success)) + _word(0x40) + _word(len(return_data)) + return_data + padding)
+        offsets = []
+        position = 32 * len(encoded)
+        for item in encoded:
+            offsets.append(_word(position))
+            position += len(item)
+        return _word(0x20) + _word(len(encoded)) + b"".join(offsets) + b"".join(encoded)
+
+    async def handle(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        payload = await request.json()
+        method, params = payload["method"], payload["params"]
+
+        if method == "eth_getBalance":
+            result = hex(self.balances.get(NATIVE, 0))
+        elif method == "eth_call":
+            target = params[0]["to"].lower()
+            data = bytes.fromhex(params[0]["data"][2:])
+            if target == MULTICALL3_ADDRESS.lower() and data[:4].hex() == AGGREGATE3_SELECTOR:
+                result = "0x" + self._aggregate3(data[4:]).hex()
+            else:
+                success, return_data = self._execute(target, data)
+                if not success:
+                    return web.json_response({"jsonrpc": "2.0", "id": payload["id"], "error": {"message": "execution reverted"}})
+                result = "0x" + return_data.hex()
+        else:
+            return web.json_response({"jsonrpc": "2.0", "id": payload["id"], "error": {"message": "method not found"}})
+
+        return web.json_response({"jsonrpc": "2.0", "id": payload["id"], "result": result})
+
+
+async def run(args):
+    wallet = "0x" + "ab" * 20
+    rng = random.Random(args.seed)
+    tokens = [TokenRecord("ETH", NATIVE, 18, "Ether", None)]
+    tokens += [
+        TokenRecord(f"TK{index}", "0x" + rng.randbytes(20).hex(), rng.choice([6, 8, 18]), f"Token {index}", None)
+        for index in range(args.tokens - 1)
+    ]
+
+    node = FakeRpcNode(wallet, tokens, args.rpc_ms / 1000, args.seed)
+    app = web.Application()
+    app.router.add_post("/", node.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    rpc_pools.configure("ETH", [f"http://127.0.0.1:{port}/"])
+
+    try:
+        node.requests = 0
+        start = time.perf_counter()
+        single = await asyncio.gather(*(
+            get_token_balance(wallet, token.address, token.decimals, "ETH", is_native=token.address == NATIVE)
+            for token in tokens
+        ))
+        single_elapsed, single_requests = time.perf_counter() - start, node.requests
+
+        node.requests = 0
+        start = time.perf_counter()
+        portfolio = await PortfolioService(chunk_size=args.chunk_size).get_balances(wallet, "ETH", tokens)
+        multicall_elapsed, multicall_requests = time.perf_counter() - start, node.requests
+    finally:
+        await http_clients.close()
+        await runner.cleanup()
+
+    assert "error" not in portfolio, portfolio
+    mismatches = [
+        token.symbol for token, expected, entry in zip(tokens, single, portfolio["balances"])
+        if expected.get("balance_wei") != entry.get("balance_wei")
+    ]
+    print(f"{args.tokens} tokens, RPC com {args.rpc_ms:.0f} ms de latência")
+    print(f"uma requisição por token: {single_requests} requisições, {single_elapsed * 1000:.1f} ms")
+    print(f"Multicall3 (blocos de {args.chunk_size}): {multicall_requests} requisições, "
+          f"{multicall_elapsed * 1000:.1f} ms, bloco {portfolio['blockNumber']}")
+    print("saldos idênticos" if not mismatches else f"saldos divergentes: {mismatches}")
+    return 0 if not mismatches else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--rpc-ms", type=float, default=40)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
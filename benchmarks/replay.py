@@ -0,0 +1,265 @@
+"""
+Reprodução do tráfego real do /process a partir da tabela messages.
+
+export: lê os prompts do Supabase com paginação por chave (id crescente),
+    troca os endereços de carteira por pseudônimos e grava um JSONL com
+    prompt, origem, created_at e o response_time registrado.
+
+run: reproduz o JSONL contra uma instância em execução, em malha aberta:
+    cada prompt sai no mesmo intervalo em relação ao anterior que teve em
+    produção (dividido por --speed), sem esperar as respostas anteriores.
+    Compara, por intenção, a latência nova com o response_time registrado
+    do mesmo prompt. A intenção vem do evento SSE final de tempos.
+
+As requisições levam o header X-Replay, então a telemetria as grava com
+origin "replay" e elas não voltam em exportações de produção.
+
+Uso:
+    python -m benchmarks.replay export --out prompts.jsonl --origin production --since 2026-09-01
+    python -m benchmarks.replay run --input prompts.jsonl --target http://localhost:8000 --speed 4 --max-gap 30
+"""
+
+import argparse
+import asyncio
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EXPORT_COLUMNS = "id,prompt,origin,response_time,created_at"
+# Endereços EVM (carteiras e contratos) citados nos prompts
+_ADDRESS = re.compile(r"0x[0-9a-fA-F]{40}")
+REPLAY_WALLET = "0x" + "ab" * 20
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+class Anonymizer:
+    """
+    Troca cada endereço por um pseudônimo derivado por HMAC: o mesmo endereço
+    vira sempre o mesmo pseudônimo dentro da exportação, sem ser reversível
+    """
+
+    def __init__(self, salt):
+        self.salt = salt.encode()
+        self.replaced = 0
+
+    def address(self, address):
+        digest = hmac.new(self.salt, address.lower().encode(), hashlib.sha256).hexdigest()
+        return "0x" + digest[:40]
+
+    def text(self, text):
+        def replace(match):
+            self.replaced += 1
+            return self.address(match.group(0))
+        return _ADDRESS.sub(replace, text)
+
+
+async def export(args):
+    from services.supabase_service import supabase_service
+
+    # Sem sal informado, um sal aleatório descartado no fim: pseudônimos irreversíveis
+    anonymizer = Anonymizer(args.salt or os.getenv("REPLAY_ANONYMIZATION_SALT") or secrets.token_hex(16))
+    exported = 0
+    last_id = None
+    try:
+        with open(args.out, "w", encoding="utf-8") as output:
+            while args.limit is None or exported < args.limit:
+                page_size = args.page_size if args.limit is None else min(args.page_size, args.limit - exported)
+                rows = await supabase_service.get_messages_page(
+                    after_id=last_id, limit=page_size, columns=EXPORT_COLUMNS,
+                    origin=args.origin, since=args.since, until=args.until,
+                )
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                for row in rows:
+                    if not (row.get("prompt") or "").strip() or not row.get("created_at"):
+                        continue
+                    output.write(json.dumps({
+                        "id": row["id"],
+                        "created_at": row["created_at"],
+                        "origin": row.get("origin"),
+                        "response_time": row.get("response_time"),
+                        "prompt": anonymizer.text(row["prompt"]),
+                    }, ensure_ascii=False) + "\n")
+                    exported += 1
+                print(f"{exported} prompts exportados (último id {last_id})", file=sys.stderr)
+    finally:
+        supabase_service.close()
+    print(f"{exported} prompts gravados em {args.out} ({anonymizer.replaced} endereços anonimizados)")
+
+
+def load_prompts(path, limit=None):
+    with open(path, encoding="utf-8") as source:
+        rows = [json.loads(line) for line in source if line.strip()]
+    for row in rows:
+        row["_at"] = datetime.datetime.fromisoformat(row["created_at"].replace("Z", "+00:00")).timestamp()
+    rows.sort(key=lambda row: row["_at"])
+    return rows[:limit] if limit else rows
+
+
+def schedule(rows, speed, max_gap):
+    """Instante de envio (s desde o início) de cada prompt, mantendo os intervalos originais"""
+    offsets = []
+    offset = 0.0
+    previous = None
+    for row in rows:
+        if previous is not None:
+            gap = row["_at"] - previous
+            if max_gap is not None:
+                # Períodos ociosos longos (madrugada, deploys) são encurtados
+                gap = min(gap, max_gap)
+            offset += gap / speed
+        offsets.append(offset)
+        previous = row["_at"]
+    return offsets
+
+
+async def replay_one(client, args, row):
+    """Envia um prompt e lê o stream SSE até o fim"""
+    body = {"input": row["prompt"], "walletAddress": args.wallet, "chain": args.chain}
+    headers = {"X-Replay": "1", "X-Request-ID": f"replay-{row['id']}"}
+    start = time.perf_counter()
+    result = {"id": row["id"], "recorded_s": row.get("response_time"), "ttfb_s": None,
+              "total_s": None, "server_s": None, "intent": "desconhecida", "status": None, "error": None}
+    try:
+        async with client.stream("POST", f"{args.target}/process", json=body, headers=headers) as response:
+            result["status"] = response.status_code
+            async for line in response.aiter_lines():
+                if result["ttfb_s"] is None:
+                    result["ttfb_s"] = round(time.perf_counter() - start, 4)
+                if not line.startswith("data: {"):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if event.get("type") == "timing":
+                    result["intent"] = event.get("intent") or "desconhecida"
+                    result["server_s"] = round(event.get("total_ms", 0) / 1000, 4)
+    except httpx.HTTPError as e:
+        result["error"] = type(e).__name__
+    result["total_s"] = round(time.perf_counter() - start, 4)
+    if result["error"] is None and result["status"] != 200:
+        result["error"] = f"HTTP {result['status']}"
+    return result
+
+
+def report(results, elapsed, max_in_flight, offered_rps):
+    ok = [result for result in results if result["error"] is None]
+    errors = {}
+    for result in results:
+        if result["error"] is not None:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    print(f"\n{len(results)} prompts em {elapsed:.1f}s | carga oferecida {offered_rps:.2f} req/s | "
+          f"concluídas {len(ok) / elapsed if elapsed else 0:.2f} req/s | "
+          f"máx. simultâneas {max_in_flight} | erros {len(results) - len(ok)} {errors or ''}")
+    print(f"{'intenção':<16}{'n':>6}{'registrado p50':>16}{'p95':>8}{'novo p50':>10}{'p95':>8}"
+          f"{'servidor p50':>14}{'1º byte p50':>13}{'novo/registrado':>17}")
+
+    groups = {"total": ok}
+    for result in ok:
+        groups.setdefault(result["intent"], []).append(result)
+    for intent, entries in groups.items():
+        recorded = [entry["recorded_s"] for entry in entries if entry["recorded_s"] is not None]
+        new = [entry["total_s"] for entry in entries]
+        server = [entry["server_s"] for entry in entries if entry["server_s"] is not None]
+        ttfb = [entry["ttfb_s"] for entry in entries if entry["ttfb_s"] is not None]
+        # Razão pareada (mesmo prompt): >1 significa mais lento que em produção
+        ratios = [entry["total_s"] / entry["recorded_s"] for entry in entries if entry["recorded_s"]]
+        print(f"{intent:<16}{len(entries):>6}"
+              f"{percentile(recorded, 0.5):>16.2f}{percentile(recorded, 0.95):>8.2f}"
+              f"{percentile(new, 0.5):>10.2f}{percentile(new, 0.95):>8.2f}"
+              f"{percentile(server, 0.5):>14.2f}{percentile(ttfb, 0.5):>13.2f}"
+              f"{percentile(ratios, 0.5):>16.2f}x")
+    print("(segundos; registrado = response_time gravado em produção para o mesmo prompt)")
+
+
+async def run(args):
+    rows = load_prompts(args.input, args.limit)
+    if not rows:
+        print("Nenhum prompt para reproduzir")
+        return
+    offsets = schedule(rows, args.speed, args.max_gap)
+    span = offsets[-1] or 1.0
+    print(f"Reproduzindo {len(rows)} prompts em ~{offsets[-1]:.1f}s contra {args.target} (velocidade {args.speed}x)")
+
+    in_flight = 0
+    max_in_flight = 0
+    results = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=args.keepalive)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(args.timeout)) as client:
+        async def tracked(row):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            try:
+                results.append(await replay_one(client, args, row))
+            finally:
+                in_flight -= 1
+
+        start = time.perf_counter()
+        tasks = []
+        # Malha aberta: os envios seguem o relógio, não as respostas
+        for row, offset in zip(rows, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(tracked(row)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    report(results, elapsed, max_in_flight, len(rows) / span)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as output:
+            for result in results:
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"Resultados por prompt gravados em {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="exporta os prompts da tabela messages")
+    export_parser.add_argument("--out", required=True)
+    export_parser.add_argument("--origin", default="production", help="origem (vazio para todas)")
+    export_parser.add_argument("--since", help="created_at inicial (ISO 8601)")
+    export_parser.add_argument("--until", help="created_at final, exclusivo (ISO 8601)")
+    export_parser.add_argument("--limit", type=int)
+    export_parser.add_argument("--page-size", type=int, default=1000)
+    export_parser.add_argument("--salt", help="sal dos pseudônimos (padrão: REPLAY_ANONYMIZATION_SALT ou aleatório)")
+
+    run_parser = commands.add_parser("run", help="reproduz os prompts contra uma instância")
+    run_parser.add_argument("--input", required=True)
+    run_parser.add_argument("--target", default="http://localhost:8000")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="fator de aceleração dos intervalos")
+    run_parser.add_argument("--max-gap", type=float, help="intervalo máximo entre prompts (s, antes do fator)")
+    run_parser.add_argument("--limit", type=int)
+    run_parser.add_argument("--chain", default="ETH")
+    run_parser.add_argument("--wallet", default=REPLAY_WALLET)
+    run_parser.add_argument("--timeout", type=float, default=120)
+    run_parser.add_argument("--keepalive", type=int, default=100)
+    run_parser.add_argument("--out", help="grava o resultado de cada prompt em JSONL")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        args.origin = args.origin or None
+        asyncio.run(export(args))
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
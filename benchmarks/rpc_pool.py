@@ -0,0 +1,113 @@
+"""
+Mede o efeito do pool de RPC (roteamento por latência, failover e hedge)
+com três nós JSON-RPC locais:
+    - rápido, mas com cauda de latência (uma parte das respostas é lenta)
+    - estável, um pouco mais lento
+    - quebrado (sempre responde 503)
+
+Uso:
+    python -m benchmarks.rpc_pool --requests 300 --slow-ratio 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.http_client import http_clients
+from services.rpc_pool import RpcPool
+
+
+def make_node(rng, base_ms, slow_ms=0, slow_ratio=0.0, status=200):
+    async def handle(request):
+        payload = await request.json()
+        if status != 200:
+            return web.Response(status=status)
+        delay = slow_ms if rng.random() < slow_ratio else base_ms
+        await asyncio.sleep(delay / 1000)
+        return web.json_response({"jsonrpc": "2.0", "id": payload["id"], "result": "0x1"})
+    return handle
+
+
+async def start_node(handle):
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+async def measure(pool, requests, concurrency):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            result = await pool.request("eth_blockNumber", [], timeout=5)
+            latencies.append(time.perf_counter() - start)
+            if "error" in result:
+                errors += 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies, errors
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    nodes = [
+        await start_node(make_node(rng, 20, slow_ms=args.slow_ms, slow_ratio=args.slow_ratio)),
+        await start_node(make_node(rng, 45)),
+        await start_node(make_node(rng, 0, status=503)),
+    ]
+    fast, steady, broken = (url for _, url in nodes)
+
+    scenarios = [
+        ("um endpoint (rápido com cauda)", RpcPool("ETH", [fast], hedge=False)),
+        ("um endpoint quebrado + pool", RpcPool("ETH", [broken, fast, steady], hedge=False)),
+        ("pool com hedge no p95", RpcPool("ETH", [broken, fast, steady], hedge=True)),
+    ]
+    try:
+        for label, pool in scenarios:
+            # Aquecimento: o pool precisa de amostras para EWMA e p95
+            await measure(pool, 30, args.concurrency)
+            latencies, errors = await measure(pool, args.requests, args.concurrency)
+            print(f"{label:<34} p50 {statistics.median(latencies) * 1000:6.1f} ms | "
+                  f"p95 {percentile(latencies, 0.95) * 1000:6.1f} ms | "
+                  f"p99 {percentile(latencies, 0.99) * 1000:6.1f} ms | erros {errors} | "
+                  f"failovers {pool.failovers} | hedges {pool.hedges} (venceram {pool.hedge_wins})")
+    finally:
+        await http_clients.close()
+        for runner, _ in nodes:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--slow-ms", type=float, default=600)
+    parser.add_argument("--slow-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
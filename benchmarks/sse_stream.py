@@ -0,0 +1,143 @@
+"""
+Custo da escrita do stream SSE do /process com muitos streams simultâneos:
+um evento json.dumps por chunk do Gemini com a resposta concatenada em
+string (como antes) contra o SSEWriter (chunks agrupados por janela,
+orjson quando disponível, texto acumulado em lista).
+
+Cada stream passa pelo StreamingResponse do Starlette até um "send" ASGI
+que escreve cada mensagem em um socket TCP (com o enquadramento chunked do
+HTTP/1.1, como o uvicorn), lido e descartado por outro processo: cada evento
+custa uma escrita no socket, como em produção. O Gemini é simulado por
+chunks pequenos com intervalo fixo. A CPU medida é só a deste processo.
+
+Uso:
+    python -m benchmarks.sse_stream --streams 200 --chunks 300 --chunk-chars 8 --chunk-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from starlette.responses import StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.sse import SSEWriter, ORJSON_AVAILABLE
+
+# Servidor que lê e descarta tudo o que recebe (processo separado)
+DRAIN_SERVER = """
+import asyncio
+
+async def drain(reader, writer):
+    while await reader.read(65536):
+        pass
+    writer.close()
+
+async def main():
+    server = await asyncio.start_server(drain, "127.0.0.1", 0)
+    print(server.sockets[0].getsockname()[1], flush=True)
+    await server.serve_forever()
+
+asyncio.run(main())
+"""
+
+
+async def gemini_chunks(args):
+    text = "Swap de 1,5 ETH para USDC: você recebe cerca de 4.500 USDC. "
+    for index in range(args.chunks):
+        if args.chunk_ms:
+            await asyncio.sleep(args.chunk_ms / 1000)
+        start = (index * args.chunk_chars) % len(text)
+        yield (text * 2)[start:start + args.chunk_chars]
+    yield {"type": "transaction", "data": {"to": "0x" + "ab" * 20, "value": "0x0", "data": "0x" + "00" * 200}}
+
+
+def previous_stream(args):
+    """Como era o generate do /process"""
+    async def generate():
+        response_content = ""
+        async for chunk in gemini_chunks(args):
+            if isinstance(chunk, dict):
+                yield f"data: {json.dumps(chunk)}\n\n"
+            else:
+                response_content += chunk
+                yield f"data: {json.dumps({'content': chunk})}\n\n"
+        yield "data: [DONE]\n\n"
+    return generate()
+
+
+def writer_stream(args):
+    async def generate():
+        writer = SSEWriter(gemini_chunks(args), coalesce_ms=args.coalesce_ms)
+        async for event in writer.events():
+            yield event
+        writer.text()
+        yield "data: [DONE]\n\n"
+    return generate()
+
+
+async def serve_stream(stream, port):
+    """Executa um StreamingResponse escrevendo as mensagens em um socket TCP"""
+    counters = {"frames": 0, "bytes": 0}
+    never = asyncio.Event()
+    _, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def receive():
+        await never.wait()
+
+    async def send(message):
+        body = message.get("body")
+        if message["type"] == "http.response.body" and body:
+            counters["frames"] += 1
+            counters["bytes"] += len(body)
+            writer.write(b"%x\r\n%b\r\n" % (len(body), body))
+            await writer.drain()
+
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "method": "POST",
+             "path": "/process", "headers": []}
+    try:
+        await StreamingResponse(stream, media_type="text/event-stream")(scope, receive, send)
+    finally:
+        writer.close()
+    return counters
+
+
+async def measure(label, factory, args):
+    drain = await asyncio.create_subprocess_exec(sys.executable, "-c", DRAIN_SERVER, stdout=asyncio.subprocess.PIPE)
+    port = int(await drain.stdout.readline())
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(serve_stream(factory(args), port) for _ in range(args.streams)))
+    finally:
+        drain.kill()
+        await drain.wait()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    frames = sum(result["frames"] for result in results)
+    size = sum(result["bytes"] for result in results)
+    print(f"{label:<34} {frames / args.streams:7.1f} eventos/stream | {frames / wall:9.0f} eventos/s | "
+          f"CPU {cpu * 1000 / args.streams:6.2f} ms/stream | {size / args.streams / 1024:6.1f} KiB/stream | "
+          f"total {wall:5.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--chunk-chars", type=int, default=8)
+    parser.add_argument("--chunk-ms", type=float, default=2)
+    parser.add_argument("--coalesce-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    print(f"{args.streams} streams simultâneos, {args.chunks} chunks de {args.chunk_chars} caracteres "
+          f"a cada {args.chunk_ms:g} ms (orjson: {'sim' if ORJSON_AVAILABLE else 'não'})")
+    asyncio.run(measure("json.dumps por chunk (anterior)", previous_stream, args))
+    asyncio.run(measure(f"SSEWriter (janela {args.coalesce_ms:g} ms)", writer_stream, args))
+
+
+if __name__ == "__main__":
+    main()
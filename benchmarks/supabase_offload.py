@@ -0,0 +1,217 @@
+"""
+Mede quanto o event loop fica travado durante requisições /process concorrentes
+com o cliente síncrono do Supabase executado no próprio loop e no pool de
+threads limitado do SupabaseService. As mensagens passam pela fila de
+telemetria (gravação em lote), como em produção.
+
+O Supabase é substituído por um PostgREST local com latência configurável
+(rodando em outra thread) e o Gemini por um modelo local rápido. Uma tarefa
+de monitoramento dorme em intervalos curtos e registra o atraso com que acorda:
+esse atraso é o tempo em que o loop ficou impedido de atender outros streams.
+
+Uso:
+    python -m benchmarks.supabase_offload --requests 40 --concurrency 20 --db-ms 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("MORALIS_API_KEY", "benchmark")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark")
+# Só avisos e erros durante a medição
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main
+from services.gemini_service import GeminiService
+from services.supabase_service import SupabaseService
+
+
+class FakePostgrest:
+    """PostgREST local (tabela messages) rodando em um event loop próprio"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.ids = itertools.count(1)
+        self.rows = 0
+        self.url = None
+        self._ready = threading.Event()
+        self._loop = None
+        self._runner = None
+
+    async def handle(self, request):
+        await asyncio.sleep(self.latency)
+        body = await request.json() if request.can_read_body else {}
+        if isinstance(body, list):
+            # Upsert em lote da fila de telemetria (return=minimal)
+            self.rows += len(body)
+            return web.Response(status=201)
+        self.rows += 1
+        if request.method == "POST":
+            return web.json_response([{"id": next(self.ids), **body}], status=201)
+        return web.json_response([{"id": 1, **body}])
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_route("*", "/rest/v1/messages", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+
+    def start(self):
+        threading.Thread(target=self._serve, daemon=True).start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+class InlineSupabaseService(SupabaseService):
+    """Comportamento anterior: execute() síncrono direto no event loop"""
+
+    async def _run(self, query):
+        self.calls += 1
+        return query.execute()
+
+
+class StandInModel:
+    """Gemini local: classifica tudo como conversa e responde em alguns chunks"""
+
+    def __init__(self, call_type, system_instruction):
+        self.call_type = call_type
+
+    async def generate_content_async(self, contents, stream=False):
+        await asyncio.sleep(0.005)
+        if not stream:
+            return SimpleNamespace(text=json.dumps({"intent": "outro", "language": "pt"}), usage_metadata=None)
+
+        async def chunks():
+            for word in ("Olá! ", "Posso ajudar ", "com cotações, swaps e transferências."):
+                await asyncio.sleep(0.005)
+                yield SimpleNamespace(text=word, usage_metadata=None)
+        return chunks()
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+async def run_scenario(service, args):
+    main.supabase_service = service
+    main.telemetry.service = service
+    main.telemetry.start()
+    transport = httpx.ASGITransport(app=main.app)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def one(index):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/process", json={
+                    "input": f"olá, tudo bem? ({index})",
+                    "walletAddress": "0x" + "ab" * 20,
+                    "chain": "ETH",
+                })
+                assert response.status_code == 200 and "[DONE]" in response.text
+                latencies.append(time.perf_counter() - start)
+
+        monitor = LoopLagMonitor()
+        monitor.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        # Inclui a gravação do que ficou na fila de telemetria
+        await main.telemetry.close()
+        await monitor.stop()
+
+    return {
+        "elapsed": elapsed,
+        "p95_request": percentile(latencies, 0.95),
+        "max_lag": max(monitor.lags, default=0.0),
+        "p99_lag": percentile(monitor.lags, 0.99),
+        "stalled": sum(monitor.lags),
+        "db_calls": service.calls,
+    }
+
+
+async def run(args):
+    database = FakePostgrest(args.db_ms / 1000).start()
+    main.router_agent.gemini_service = GeminiService(model_factory=StandInModel)
+    scenarios = [
+        ("Supabase no event loop", InlineSupabaseService(database.url, "benchmark")),
+        (f"pool de {args.workers} threads", SupabaseService(database.url, "benchmark", max_workers=args.workers)),
+    ]
+    print(f"{args.requests} requisições /process, {args.concurrency} simultâneas, Supabase com {args.db_ms:.0f} ms")
+    try:
+        for label, service in scenarios:
+            database.rows = 0
+            result = await run_scenario(service, args)
+            print(f"{label:<24} total {result['elapsed'] * 1000:7.1f} ms | "
+                  f"p95 requisição {result['p95_request'] * 1000:6.1f} ms | "
+                  f"loop travado {result['stalled'] * 1000:7.1f} ms "
+                  f"(máx {result['max_lag'] * 1000:5.1f} ms, p99 {result['p99_lag'] * 1000:5.1f} ms) | "
+                  f"{result['db_calls']} chamadas ao banco, {database.rows} linhas gravadas")
+            service.close()
+    finally:
+        database.stop()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--db-ms", type=float, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,99 @@
+"""
+Mede o ganho de tempo do preflight do swap (cotação LI.FI + validação de saldo)
+executado em paralelo pelo SwapAgent, comparado à versão sequencial anterior.
+
+As chamadas externas são substituídas por esperas com a latência informada.
+
+Uso:
+    python -m benchmarks.swap_preflight --quote-ms 600 --balance-ms 250 --runs 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import agents.swap_agent as swap_agent_module
+from agents.swap_agent import SwapAgent
+
+
+class FakeLifiService:
+    def __init__(self, latency):
+        self.latency = latency
+        self.cancelled = 0
+
+    async def get_swap_quote(self, user_request, extracted_data):
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {"fromToken": "USDC", "toToken": "ETH", "transactionRequest": {}}
+
+
+def fake_balance_validation(latency, sufficient):
+    async def validate_sufficient_balance(*args, **kwargs):
+        await asyncio.sleep(latency)
+        if sufficient:
+            return {"success": True, "balance_info": {}}
+        return {"success": False, "error": "Saldo insuficiente."}
+    return validate_sufficient_balance
+
+
+async def sequential_preflight(lifi_service, user_request, extracted_data, from_token_info):
+    """Ordem anterior: espera a cotação completa antes de validar o saldo"""
+    swap_data = await lifi_service.get_swap_quote(user_request, extracted_data)
+    if "error" in swap_data:
+        return swap_data
+    validation = await swap_agent_module.validate_sufficient_balance(
+        user_request.walletAddress, from_token_info.symbol, extracted_data["fromAmount"], user_request.chain
+    )
+    if not validation["success"]:
+        return {"error": validation["error"]}
+    return swap_data
+
+
+async def run(args, sufficient):
+    user_request = SimpleNamespace(walletAddress="0x" + "1" * 40, chain="ETH", input="swap 10 USDC for ETH")
+    extracted_data = {"intent": "swap", "fromToken": "USDC", "toToken": "ETH", "fromAmount": "10"}
+    from_token_info = SimpleNamespace(symbol="USDC")
+
+    swap_agent_module.validate_sufficient_balance = fake_balance_validation(args.balance_ms / 1000, sufficient)
+    agent = SwapAgent()
+    agent.lifi_service = FakeLifiService(args.quote_ms / 1000)
+
+    timings = {"sequencial": [], "paralelo": []}
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        await sequential_preflight(agent.lifi_service, user_request, extracted_data, from_token_info)
+        timings["sequencial"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await agent._run_preflight(user_request, extracted_data, from_token_info)
+        timings["paralelo"].append(time.perf_counter() - start)
+
+    return timings, agent.lifi_service.cancelled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quote-ms", type=float, default=600)
+    parser.add_argument("--balance-ms", type=float, default=250)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    for label, sufficient in (("saldo suficiente", True), ("saldo insuficiente", False)):
+        timings, cancelled = asyncio.run(run(args, sufficient))
+        sequential = statistics.median(timings["sequencial"]) * 1000
+        parallel = statistics.median(timings["paralelo"]) * 1000
+        print(f"{label}: sequencial {sequential:.1f} ms | paralelo {parallel:.1f} ms | "
+              f"ganho {sequential - parallel:.1f} ms | cotações LI.FI canceladas: {cancelled}/{args.runs}")
+
+
+if __name__ == "__main__":
+    main()
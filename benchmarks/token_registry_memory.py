@@ -0,0 +1,107 @@
+"""
+Compara o uso de memória (tracemalloc) e o tempo de construção do registro de
+tokens compacto (ChainTokens) com a estrutura antiga de dicts aninhados.
+
+Uso:
+    python -m benchmarks.token_registry_memory
+    python -m benchmarks.token_registry_memory --from-dir ./token_lists
+
+Com --from-dir, lê <dir>/<CHAIN>.json (resposta de /v1/tokens?chains=<CHAIN>)
+em vez de baixar as listas da LI.FI.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from services.token_registry import ChainTokens
+
+CHAINS = ("ETH", "BAS", "POL")
+
+
+def build_legacy_token_info(tokens_by_chain):
+    """Reproduz a estrutura antiga de TOKEN_INFO[chain] (agrupa por símbolo e ordena)"""
+    tokens_dict = {}
+    for chain_id, tokens in tokens_by_chain.items():
+        tokens_by_symbol = {}
+        for token in tokens:
+            symbol = token.get("symbol", "").upper()
+            if symbol:
+                if symbol not in tokens_by_symbol:
+                    tokens_by_symbol[symbol] = []
+                tokens_by_symbol[symbol].append(token)
+
+        for symbol, token_list in tokens_by_symbol.items():
+            sorted_tokens = sorted(token_list, key=lambda t: float(t.get("priceUSD", 0) or 0), reverse=True)
+            best_token = sorted_tokens[0]
+            tokens_dict[symbol] = {
+                "address": best_token.get("address"),
+                "decimals": best_token.get("decimals"),
+                "name": best_token.get("name"),
+                "priceUSD": best_token.get("priceUSD"),
+                "logoURI": best_token.get("logoURI"),
+                "chainId": best_token.get("chainId"),
+            }
+    return tokens_dict
+
+
+def build_chain_tokens(tokens_by_chain):
+    return ChainTokens.from_lifi(token for tokens in tokens_by_chain.values() for token in tokens)
+
+
+def measure(builder, tokens_by_chain):
+    """Retorna (bytes retidos, pico de bytes, segundos) para construir a estrutura"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    structure = builder(tokens_by_chain)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return retained, peak, elapsed
+
+
+async def load_token_lists(from_dir):
+    token_lists = {}
+    if from_dir:
+        for chain in CHAINS:
+            with open(os.path.join(from_dir, f"{chain}.json")) as f:
+                token_lists[chain] = json.load(f).get("tokens", {})
+        return token_lists
+
+    async with httpx.AsyncClient(verify=False, timeout=30) as client:
+        for chain in CHAINS:
+            response = await client.get(f"https://li.quest/v1/tokens?chains={chain}")
+            response.raise_for_status()
+            token_lists[chain] = response.json().get("tokens", {})
+    return token_lists
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from-dir", help="Diretório com <CHAIN>.json salvos da LI.FI")
+    args = parser.parse_args()
+
+    token_lists = asyncio.run(load_token_lists(args.from_dir))
+
+    header = f"{'chain':<6}{'tokens':>8}{'estrutura':>14}{'retido (KiB)':>15}{'pico (KiB)':>13}{'tempo (ms)':>12}"
+    print(header)
+    print("-" * len(header))
+    for chain, tokens_by_chain in token_lists.items():
+        total = sum(len(tokens) for tokens in tokens_by_chain.values())
+        for label, builder in (("legado", build_legacy_token_info), ("compacto", build_chain_tokens)):
+            retained, peak, elapsed = measure(builder, tokens_by_chain)
+            print(f"{chain:<6}{total:>8}{label:>14}{retained / 1024:>15.1f}{peak / 1024:>13.1f}{elapsed * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
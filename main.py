@@ -1,18 +1,63 @@
 from fastapi import FastAPI, Request, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from models.request_model import UserRequest
 from agents.router_agent import RouterAgent
+from agents.transfer_agent import validate_wallet_address
 from services.supabase_service import supabase_service
+from services.telemetry import telemetry
+from services.logging_config import setup_logging, shutdown_logging, new_request_id, log_sampled
+from services.metrics import start_timings, render_metrics
+from services.sse import SSEWriter, encode_event, wait_disconnect, DONE_EVENT
 from services.moralis_service import moralis_service
+from services.http_client import http_clients
+from services.lifi_service import token_registry, gas_price_cache, quote_cache, swap_quote_cache, SUPPORTED_CHAINS
+from services.price_index import price_index
+from services.intent_parser import intent_parser
+from services.gemini_service import intent_cache
+from services.prefetch import prefetch_stats
+from services.portfolio_service import portfolio_service
+from services.balance_cache import balance_cache
+from services.rpc_pool import rpc_pools
+from services.deadline import start_deadline, upstream_latency
+from services.admission import (
+    upstream_admission, start_request_priority, UpstreamOverloaded, overload_message, PRIORITY_TRANSACTION
+)
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+import asyncio
 import json
+import logging
 import os
 import time
 
 load_dotenv()
 
-app = FastAPI()
+# Logs estruturados em fila (configurados antes de qualquer registro)
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Abre os pools de conexão compartilhados com os serviços externos
+    await http_clients.start()
+    # Pré-carrega a lista de tokens de todas as redes suportadas
+    await token_registry.preload(SUPPORTED_CHAINS)
+    # Gravação em lote das mensagens no Supabase
+    telemetry.start()
+    yield
+    # Grava as mensagens que ainda estão na fila antes de encerrar
+    await telemetry.close()
+    # Fecha as conexões de forma limpa no shutdown
+    await http_clients.close()
+    # Aguarda as escritas pendentes no Supabase e encerra o pool de threads
+    supabase_service.close()
+    # Escreve os logs que ainda estão na fila
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,8 +74,24 @@ async def process_request(request: Request):
     data = await request.json()
     user_request = UserRequest(**data)
     
+    # Fila do Gemini acima do orçamento até para swaps/transferências: recusa
+    # antes de qualquer trabalho. Abaixo disso, quem decide é a fila, já com a
+    # prioridade da intenção
+    try:
+        upstream_admission.check("gemini", PRIORITY_TRANSACTION)
+    except UpstreamOverloaded as e:
+        raise HTTPException(status_code=503, detail=overload_message(), headers={"Retry-After": e.retry_after_header()})
+    
     # Marca o início do processamento
     start_time = time.time()
+    # Prazo da requisição: limita o timeout de todas as chamadas externas feitas a partir daqui
+    start_deadline()
+    # Prioridade nas filas dos upstreams (definida pela intenção)
+    start_request_priority()
+    # ID de correlação presente em todos os logs da requisição
+    request_id = new_request_id(request.headers.get("x-request-id"))
+    # Tempos por etapa e por upstream (métricas e evento SSE final)
+    timings = start_timings(user_request.chain)
     
     # Detecta o origin baseado no CORS origin
     origin = "production"  # Default
@@ -38,58 +99,95 @@ async def process_request(request: Request):
         origin_header = request.headers.get('origin', '')
         if 'localhost' in origin_header or '127.0.0.1' in origin_header:
             origin = "local"
+    # Tráfego reproduzido por benchmarks.replay não se mistura ao de produção
+    if request.headers.get('x-replay'):
+        origin = "replay"
     
-    # Tracking do prompt (não bloqueia a resposta)
-    message_id = await supabase_service.safe_insert_prompt(user_request.input, origin)
+    # Tracking do prompt: o ID é gerado localmente e a gravação fica na fila
+    message_id = telemetry.record_prompt(user_request.input, origin)
     
-    response_content = ""
+    async def chunks():
+        async for chunk in router_agent.handle(user_request):
+            # Um registro por chunk só em DEBUG e por amostragem (LOG_SAMPLE_RATE)
+            log_sampled(logger, logging.DEBUG, "Chunk recebido: %r", chunk)
+            yield chunk
+    
+    # Agrupa os chunks de texto em eventos SSE e acumula a resposta completa
+    writer = SSEWriter(chunks())
     
     async def generate():
-        nonlocal response_content
+        logger.info("Processando prompt", extra={"chain": user_request.chain, "message_id": message_id})
+        logger.debug("Prompt: %r, wallet: %s", user_request.input, user_request.walletAddress)
         
-        print(f"🔍 DEBUG: Processando prompt: '{user_request.input}'")
-        print(f"🔍 DEBUG: Wallet: {user_request.walletAddress}, Chain: {user_request.chain}")
+        # Cliente que fecha a conexão (inclusive antes do primeiro evento) cancela
+        # o agente em andamento: chamadas à LI.FI/RPC e o stream do Gemini
+        disconnect_watch = asyncio.ensure_future(wait_disconnect(request.receive))
+        disconnect_watch.add_done_callback(lambda task: task.cancelled() or writer.abort())
         
+        completed = False
+        shed = None
         # Processa a resposta principal (não depende do Supabase)
         try:
-            async for chunk in router_agent.handle(user_request):
-                print(f"🔍 DEBUG: Chunk recebido: {type(chunk)} - {chunk}")
-                if isinstance(chunk, dict):
-                    if chunk.get("type") == "transaction":
-                        yield f"data: {json.dumps(chunk)}\n\n"
-                    else:
-                        yield f"data: {json.dumps(chunk)}\n\n"
-                else:
-                    response_content += chunk
-                    yield f"data: {json.dumps({'content': chunk})}\n\n"
-        except Exception as e:
-            print(f"❌ DEBUG: Erro no processamento: {e}")
-            error_msg = f"Erro interno: {str(e)}"
-            response_content += error_msg
-            yield f"data: {json.dumps({'content': error_msg})}\n\n"
-        
-        # Retorna o ID da mensagem para o frontend
-        if message_id:
-            yield f"data: {json.dumps({'message_id': message_id, 'type': 'tracking'})}\n\n"
-        
-        yield "data: [DONE]\n\n"
-        
-        # Calcula o tempo de resposta
-        end_time = time.time()
-        response_time = round(end_time - start_time, 2)
-        
-        # Atualiza a mensagem existente com a resposta completa
-        if message_id:
             try:
-                await supabase_service.update_message(
-                    message_id, 
-                    response=response_content, 
-                    response_time=response_time
-                )
+                async for event in writer.events():
+                    yield event
+            except UpstreamOverloaded as e:
+                # Fila de upstream acima do orçamento depois da entrada: os headers
+                # já foram enviados, então o aviso vai no stream
+                shed = e
+                logger.warning("Upstream sobrecarregado durante o stream: %s", e)
+                writer.append_text(overload_message())
+                yield encode_event({'content': overload_message()})
             except Exception as e:
-                print(f"⚠️ Erro ao atualizar resposta no banco (não crítico): {e}")
+                logger.exception("Erro no processamento")
+                error_msg = f"Erro interno: {str(e)}"
+                writer.append_text(error_msg)
+                yield encode_event({'content': error_msg})
+            
+            if writer.aborted:
+                return
+            
+            # Retorna o ID da mensagem para o frontend
+            if message_id:
+                yield encode_event({'message_id': message_id, 'type': 'tracking'})
+            
+            # Resumo dos tempos da requisição
+            yield encode_event({'type': 'timing', **timings.summary()})
+            
+            yield DONE_EVENT
+            completed = True
+        finally:
+            disconnect_watch.cancel()
+            # Stream que não chegou ao fim: o cliente desconectou (o envio falhou
+            # ou o processamento foi cancelado)
+            aborted = not completed
+            if aborted:
+                logger.info("Cliente desconectou; processamento interrompido",
+                            extra={"message_id": message_id, "chunks": writer.chunks})
+            timings.finish(aborted=aborted)
+            # Calcula o tempo de resposta
+            end_time = time.time()
+            response_time = round(end_time - start_time, 2)
+            
+            # Enfileira a resposta (parcial, marcada como client_aborted, quando o cliente desconecta)
+            if message_id:
+                try:
+                    fields = {"response": writer.text(), "response_time": response_time}
+                    if aborted:
+                        fields["error_message"] = "client_aborted"
+                    elif shed is not None:
+                        fields["error_message"] = "overloaded"
+                    telemetry.update_message(message_id, **fields)
+                except Exception as e:
+                    logger.warning("Erro ao enfileirar resposta para o banco (não crítico): %s", e)
     
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    # Headers enviados na hora (o heartbeat e o limite de primeiro byte dos
+    # proxies contam daqui); os tempos por etapa vão no evento SSE final
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"X-Request-ID": request_id}
+    )
 
 @app.post("/track/{message_id}")
 async def update_message_tracking(message_id: int, request: Request):
@@ -98,13 +196,13 @@ async def update_message_tracking(message_id: int, request: Request):
         # Obtém os dados do body
         body = await request.json()
         
-        # Atualiza a mensagem com os campos fornecidos
-        result = await supabase_service.update_message(message_id, **body)
+        # Mensagem ainda na fila: a atualização entra na fila; senão, UPDATE direto
+        result = await telemetry.track(message_id, **body)
         
         return {
             "success": True,
-            "message": "Mensagem atualizada com sucesso",
-            "data": result
+            "message": "Atualização da mensagem registrada",
+            "data": {"id": message_id, **result}
         }
         
     except HTTPException:
@@ -154,6 +252,16 @@ async def humanize_success(request: Request):
         if not transaction_hash:
             raise HTTPException(status_code=400, detail="Campo 'transaction_hash' é obrigatório")
         
+        # Nova transação da carteira: os saldos em cache dela deixam de valer
+        wallet_address = data.get("wallet_address") or data.get("walletAddress")
+        chain = data.get("chain")
+        if wallet_address is not None and not isinstance(wallet_address, str):
+            raise HTTPException(status_code=400, detail="Campo 'wallet_address' deve ser um texto")
+        if chain is not None and not isinstance(chain, str):
+            raise HTTPException(status_code=400, detail="Campo 'chain' deve ser um texto")
+        if wallet_address:
+            balance_cache.invalidate_wallet(wallet_address, chain)
+        
         async def generate_success_message():
             async for chunk in router_agent.gemini_service.generate_success_message(
                 transaction_hash=transaction_hash,
@@ -174,6 +282,74 @@ async def humanize_success(request: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar mensagem de sucesso: {str(e)}")
 
+@app.get("/admin/cache/stats")
+async def get_cache_stats():
+    """Retorna as estatísticas (hits, misses, entradas) dos caches em memória"""
+    return {
+        "tokens": token_registry.stats(),
+        "gas_price": gas_price_cache.stats(),
+        "prices": price_index.stats(),
+        "quotes": quote_cache.stats(),
+        "swap_quotes": swap_quote_cache.stats(),
+        "balances": balance_cache.stats(),
+        "intent": intent_cache.stats(),
+    }
+
+@app.post("/admin/cache/intent/flush")
+async def flush_intent_cache():
+    """Esvazia o cache de classificação de intenção"""
+    removed = intent_cache.clear()
+    return {
+        "success": True,
+        "message": f"{removed} entradas removidas do cache de intenção",
+        "removed": removed
+    }
+
+@app.get("/admin/intent-parser/stats")
+async def get_intent_parser_stats():
+    """Retorna a taxa de acerto do extrator local de intenção e o tempo de LLM economizado"""
+    return intent_parser.stats()
+
+@app.get("/admin/prefetch/stats")
+async def get_prefetch_stats():
+    """Retorna quantas leituras especulativas foram usadas/canceladas e a sobreposição média com a classificação"""
+    return prefetch_stats.stats()
+
+@app.get("/admin/gemini/stats")
+async def get_gemini_stats():
+    """Retorna tokens de entrada/saída e tempo até o primeiro token por tipo de chamada ao Gemini"""
+    return router_agent.gemini_service.stats()
+
+@app.get("/admin/rpc/stats")
+async def get_rpc_stats():
+    """Retorna latência (EWMA/p95), taxa de erro, failovers e hedges de cada endpoint RPC"""
+    return rpc_pools.stats()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Histogramas de latência por etapa e por upstream no formato do Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/upstreams/stats")
+async def get_upstream_stats():
+    """Retorna latência (p50/p99), timeout adaptativo e timeouts de cada upstream, além dos prazos esgotados"""
+    return upstream_latency.stats()
+
+@app.get("/admin/admission/stats")
+async def get_admission_stats():
+    """Retorna limite, ocupação, fila, espera (p50/p95) e recusas da admissão de cada upstream"""
+    return upstream_admission.stats()
+
+@app.get("/admin/supabase/stats")
+async def get_supabase_stats():
+    """Retorna chamadas, ocupação e tempo médio de fila/execução do pool de threads do Supabase"""
+    return supabase_service.stats()
+
+@app.get("/admin/telemetry/stats")
+async def get_telemetry_stats():
+    """Retorna mensagens pendentes, gravadas em lote, descartadas e com falha na fila de telemetria"""
+    return telemetry.stats()
+
 @app.get("/test/messages")
 async def test_get_messages():
     """Rota para verificar as mensagens salvas"""
@@ -212,6 +388,8 @@ async def get_wallet_history(
     try:
         result = await moralis_service.get_wallet_history(wallet, chain, limit)
         return result
+    except UpstreamOverloaded as e:
+        raise HTTPException(status_code=503, detail=overload_message(), headers={"Retry-After": e.retry_after_header()})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar histórico: {str(e)}")
 
@@ -233,5 +411,57 @@ async def get_wallet_tokens(
     try:
         result = await moralis_service.get_wallet_tokens(wallet, chain)
         return result
+    except UpstreamOverloaded as e:
+        raise HTTPException(status_code=503, detail=overload_message(), headers={"Retry-After": e.retry_after_header()})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar tokens: {str(e)}")
+
+@app.get("/wallets/{wallet}/balances")
+async def get_wallet_balances(
+    wallet: str,
+    chain: str = Query(..., description="Rede blockchain (ETH, BAS, POL)"),
+    tokens: str = Query(None, description="Símbolos ou endereços separados por vírgula (padrão: todos os tokens da rede)"),
+    include_zero: bool = Query(False, description="Se deve incluir tokens com saldo zero")
+):
+    """
+    Consulta os saldos da carteira (token nativo + ERC-20) via Multicall3,
+    com um único eth_call por bloco de chamadas
+    
+    Args:
+        wallet: Endereço da carteira (path parameter)
+        chain: Rede blockchain (ETH, BAS, POL) - query parameter obrigatório
+        tokens: Tokens a consultar - query parameter opcional
+        include_zero: Incluir saldos zerados - query parameter opcional
+    
+    Returns:
+        dict: Saldos da carteira e o número do bloco da leitura
+    """
+    # O endereço vai direto para o calldata do balanceOf: só 0x + 40 hex
+    is_valid, validation_message = validate_wallet_address(wallet)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=f"Carteira inválida: {validation_message}")
+    wallet = wallet.strip()
+
+    chain = chain.upper()
+    if chain not in SUPPORTED_CHAINS:
+        raise HTTPException(status_code=400, detail=f"Chain {chain} não suportada")
+
+    token_records = None
+    if tokens:
+        try:
+            ensured = await token_registry.ensure(chain)
+        except UpstreamOverloaded as e:
+            raise HTTPException(status_code=503, detail=overload_message(), headers={"Retry-After": e.retry_after_header()})
+        if "error" in ensured:
+            raise HTTPException(status_code=502, detail=ensured["error"])
+        token_records = []
+        for token in tokens.split(","):
+            record = token_registry.resolve(chain, token.strip())
+            if record is None:
+                raise HTTPException(status_code=404, detail=f"Token {token.strip()} não encontrado na rede {chain}")
+            token_records.append(record)
+
+    result = await portfolio_service.get_balances(wallet, chain, token_records, include_zero=include_zero)
+    if "error" in result:
+        raise HTTPException(status_code=502, detail=f"Erro ao consultar saldos: {result['error']}")
+    return result
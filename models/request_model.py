@@ -1,6 +1,10 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class UserRequest(BaseModel):
     walletAddress: str
     chain: str
     input: str
+    # Renderizador das mensagens de cotação/swap/transferência: "llm" ou "template"
+    # (quando omitido, usa a variável MESSAGE_RENDERER)
+    renderer: Optional[str] = None
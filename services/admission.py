@@ -0,0 +1,273 @@
+"""
+Controle de admissão por upstream (Gemini, LI.FI, RPC, Moralis, CoinGecko).
+
+Cada upstream tem um número máximo de chamadas simultâneas por processo
+(ADMISSION_LIMIT_<UPSTREAM>); acima disso as chamadas esperam em uma fila
+ordenada pela prioridade da requisição: swaps e transferências passam na
+frente das cotações, que passam na frente da conversa livre
+(generate_helpful_response).
+
+Quando a espera prevista na fila (posição x tempo médio de uso da vaga /
+limite) passa de ADMISSION_QUEUE_BUDGET, ou do que resta do prazo da
+requisição, a chamada é recusada na hora com UpstreamOverloaded, em vez de
+esperar até o timeout. Na entrada do /process a recusa vira 503 com
+Retry-After; depois do início do stream, vira um aviso no próprio stream.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from services.metrics import admission_queue_seconds, admission_shed_total, record_stage
+
+load_dotenv()
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Espera máxima na fila de um upstream, em segundos
+ADMISSION_QUEUE_BUDGET = float(os.getenv("ADMISSION_QUEUE_BUDGET", "2"))
+ADMISSION_HOLD_EWMA_ALPHA = float(os.getenv("ADMISSION_HOLD_EWMA_ALPHA", "0.2"))
+
+# Chamadas simultâneas por upstream (0 desativa o limite). Os upstreams HTTP
+# usam o tamanho do pool de conexões: a fila fica aqui, visível e com
+# prioridade, e não dentro do pool do httpx/aiohttp
+_HTTP_LIMIT = os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20")
+DEFAULT_LIMITS = {
+    "gemini": int(os.getenv("ADMISSION_LIMIT_GEMINI", "32")),
+    "lifi": int(os.getenv("ADMISSION_LIMIT_LIFI", _HTTP_LIMIT)),
+    "rpc": int(os.getenv("ADMISSION_LIMIT_RPC", "40")),
+    "moralis": int(os.getenv("ADMISSION_LIMIT_MORALIS", _HTTP_LIMIT)),
+    "coingecko": int(os.getenv("ADMISSION_LIMIT_COINGECKO", _HTTP_LIMIT)),
+}
+
+# Prioridades (menor passa na frente)
+PRIORITY_TRANSACTION = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = {PRIORITY_TRANSACTION: "transacao", PRIORITY_DEFAULT: "normal", PRIORITY_LOW: "baixa"}
+INTENT_PRIORITIES = {
+    "swap": PRIORITY_TRANSACTION,
+    "transferencia": PRIORITY_TRANSACTION,
+    "cotacao": PRIORITY_DEFAULT,
+}
+
+OVERLOAD_MESSAGES = {
+    "pt": "Estamos com muita demanda no momento. Tente novamente em alguns segundos.",
+    "en": "We are experiencing high demand right now. Please try again in a few seconds.",
+    "es": "Tenemos mucha demanda en este momento. Inténtalo de nuevo en unos segundos.",
+}
+
+
+class UpstreamOverloaded(Exception):
+    """
+    A fila do upstream passaria do orçamento de espera. Não é um TimeoutError:
+    os serviços deixam a exceção subir até o RouterAgent/main.py, que respondem
+    com a mensagem de sobrecarga (ou 503) sem outra chamada ao Gemini.
+    """
+
+    def __init__(self, upstream, retry_after):
+        self.upstream = upstream
+        self.retry_after = retry_after
+        super().__init__(f"Upstream {upstream} sobrecarregado (espera prevista de {retry_after:.1f}s)")
+
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def overload_message(language="pt"):
+    return OVERLOAD_MESSAGES.get(language, OVERLOAD_MESSAGES["pt"])
+
+
+class RequestPriority:
+    """Prioridade da requisição; definida depois da classificação da intenção"""
+
+    def __init__(self, level=PRIORITY_DEFAULT):
+        self.level = level
+
+
+# Objeto mutável na ContextVar: tarefas criadas antes da classificação
+# (pré-busca) também enxergam a prioridade definida depois
+_current_priority = ContextVar("request_priority", default=None)
+
+
+def start_request_priority():
+    priority = RequestPriority()
+    _current_priority.set(priority)
+    return priority
+
+
+def set_request_priority(intent):
+    priority = _current_priority.get()
+    if priority is not None:
+        priority.level = INTENT_PRIORITIES.get(intent, PRIORITY_LOW)
+
+
+def current_priority():
+    priority = _current_priority.get()
+    return PRIORITY_DEFAULT if priority is None else priority.level
+
+
+class UpstreamLimiter:
+    """Semáforo com fila por prioridade (FIFO dentro da mesma prioridade)"""
+
+    def __init__(self, name, limit, alpha=ADMISSION_HOLD_EWMA_ALPHA):
+        self.name = name
+        self.limit = limit
+        self.alpha = alpha
+        self.in_use = 0
+        # Heap de (prioridade, ordem de chegada, future); futures cancelados saem na vez deles
+        self._waiters = []
+        self._order = itertools.count()
+        # Tempo médio (EWMA) de uso de uma vaga, em segundos
+        self.hold_seconds = None
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.max_queue = 0
+        self._waits = deque(maxlen=500)
+
+    def queue_length(self, priority=None):
+        """Chamadas na fila (com prioridade igual ou maior que a informada, se houver)"""
+        return sum(
+            1 for level, _, future in self._waiters
+            if not future.done() and (priority is None or level <= priority)
+        )
+
+    def expected_wait(self, priority):
+        """Espera prevista, em segundos, para uma nova chamada com essa prioridade"""
+        ahead = self.queue_length(priority)
+        if self.in_use < self.limit and not ahead:
+            return 0.0
+        if self.hold_seconds is None:
+            return 0.0
+        return (ahead + 1) * self.hold_seconds / self.limit
+
+    def reject(self, priority, retry_after):
+        """Recusa a chamada (conta na métrica de descarte)"""
+        self.shed += 1
+        admission_shed_total.inc(upstream=self.name, priority=PRIORITY_NAMES[priority])
+        raise UpstreamOverloaded(self.name, retry_after)
+
+    async def acquire(self, priority, max_wait):
+        if self.in_use < self.limit and not self.queue_length():
+            self.in_use += 1
+            self._admit(priority, 0.0)
+            return
+
+        expected = self.expected_wait(priority)
+        if expected > max_wait:
+            self.reject(priority, expected)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        self.queued += 1
+        self.max_queue = max(self.max_queue, self.queue_length())
+        start_time = time.perf_counter()
+        try:
+            async with asyncio.timeout(max_wait):
+                await future
+        except TimeoutError:
+            # A vaga pode ter sido entregue junto com o timeout: nesse caso, fica com ela
+            if not future.done() or future.cancelled():
+                future.cancel()
+                self.reject(priority, max(expected, time.perf_counter() - start_time))
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._handoff()
+            else:
+                future.cancel()
+            raise
+        self._admit(priority, time.perf_counter() - start_time)
+
+    def _admit(self, priority, waited):
+        self.admitted += 1
+        self._waits.append(waited)
+        admission_queue_seconds.observe(waited, upstream=self.name, priority=PRIORITY_NAMES[priority])
+        if waited > 0:
+            record_stage(f"queue_{self.name}", waited)
+
+    def _handoff(self):
+        """Passa a vaga para a próxima chamada da fila (ou a devolve)"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_use -= 1
+
+    def release(self, held_seconds):
+        if self.hold_seconds is None:
+            self.hold_seconds = held_seconds
+        else:
+            self.hold_seconds = self.alpha * held_seconds + (1 - self.alpha) * self.hold_seconds
+        self._handoff()
+
+    def stats(self):
+        waits = sorted(self._waits)
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "queue": self.queue_length(),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+            "hold_ms": round(self.hold_seconds * 1000, 1) if self.hold_seconds is not None else None,
+            "queue_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else None,
+            "queue_p95_ms": round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else None,
+        }
+
+
+class UpstreamAdmission:
+    def __init__(self, limits=None, queue_budget=None, enabled=None):
+        self.enabled = ADMISSION_ENABLED if enabled is None else enabled
+        self.queue_budget = ADMISSION_QUEUE_BUDGET if queue_budget is None else queue_budget
+        limits = DEFAULT_LIMITS if limits is None else limits
+        self.limiters = {name: UpstreamLimiter(name, limit) for name, limit in limits.items() if limit > 0}
+
+    @asynccontextmanager
+    async def slot(self, upstream, max_wait=None):
+        """
+        Ocupa uma vaga do upstream durante o bloco. A espera na fila é limitada
+        por ADMISSION_QUEUE_BUDGET e por max_wait (o que resta do prazo).
+        """
+        limiter = self.limiters.get(upstream) if self.enabled else None
+        if limiter is None:
+            yield
+            return
+
+        budget = self.queue_budget if max_wait is None else min(self.queue_budget, max_wait)
+        await limiter.acquire(current_priority(), budget)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            limiter.release(time.perf_counter() - start_time)
+
+    def check(self, upstream, priority=PRIORITY_DEFAULT):
+        """
+        Recusa na entrada: lança UpstreamOverloaded se uma nova requisição já
+        nasceria com espera prevista acima do orçamento nesse upstream
+        """
+        limiter = self.limiters.get(upstream) if self.enabled else None
+        if limiter is None:
+            return
+        expected = limiter.expected_wait(priority)
+        if expected > self.queue_budget:
+            limiter.reject(priority, expected)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "queue_budget_ms": round(self.queue_budget * 1000, 1),
+            "upstreams": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+
+# Limites de todos os upstreams (por processo)
+upstream_admission = UpstreamAdmission()
@@ -0,0 +1,159 @@
+"""
+Cache curto de saldos por (chain, carteira, token).
+Cada saldo guarda o número do bloco em que foi lido. Quando o frontend informa
+uma nova transação da carteira (/humanize-success), os saldos dela são
+descartados e leituras iniciadas antes disso não voltam a ser armazenadas.
+Sem esse aviso o cache não tem como saber da transação, por isso ele só é
+ligado (BALANCE_CACHE_TTL > 0) quando o frontend envia a carteira.
+O cache é limitado: saldos vencidos saem a cada nova gravação e, acima de
+max_size, os mais antigos são descartados.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _is_cacheable(value):
+    return isinstance(value, dict) and "error" not in value
+
+
+class BalanceCache:
+    def __init__(self, ttl, max_size=10000):
+        """
+        Args:
+            ttl: Segundos em que um saldo lido é reaproveitado
+            max_size: Quantidade máxima de saldos armazenados
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        # (chain, carteira, token) -> (saldo, instante da leitura), em ordem de gravação
+        self._entries = OrderedDict()
+        self._inflight = {}
+        # Incrementada a cada transação da carteira: leituras de gerações
+        # anteriores não são armazenadas. Só existe enquanto a carteira tem
+        # leituras em andamento (inclusive as desligadas de _inflight)
+        self._generations = {}
+        # carteira -> leituras em andamento
+        self._loading = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(chain, wallet_address, token_address):
+        return (chain.upper(), wallet_address.lower(), (token_address or "").lower())
+
+    async def get(self, chain, wallet_address, token_address, loader):
+        """
+        Retorna o saldo em cache ou carrega com `loader`. Leituras concorrentes
+        do mesmo saldo compartilham a mesma requisição RPC.
+        """
+        if self.ttl <= 0:
+            return await loader()
+
+        key = self._key(chain, wallet_address, token_address)
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            if time.monotonic() - stored_at < self.ttl:
+                self.hits += 1
+                return dict(value)
+            del self._entries[key]
+
+        self.misses += 1
+        task = self._inflight.get(key)
+        if task is None:
+            generation = self._generations.get(key[1], 0)
+            self._loading[key[1]] = self._loading.get(key[1], 0) + 1
+            task = asyncio.create_task(self._load(key, generation, loader))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+
+        value = await asyncio.shield(task)
+        return dict(value) if isinstance(value, dict) else value
+
+    async def _load(self, key, generation, loader):
+        try:
+            value = await loader()
+            if _is_cacheable(value) and self._generations.get(key[1], 0) == generation:
+                self._store(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+            wallet = key[1]
+            self._loading[wallet] -= 1
+            if not self._loading[wallet]:
+                # Sem leituras antigas em andamento, a geração não protege mais nada
+                del self._loading[wallet]
+                self._generations.pop(wallet, None)
+
+    def _store(self, key, value):
+        # Nunca substitui um saldo por outro lido em um bloco anterior
+        existing = self._entries.get(key)
+        if existing is not None:
+            new_block = value.get("block_number")
+            old_block = existing[0].get("block_number")
+            if new_block is not None and old_block is not None and new_block < old_block:
+                return
+        now = time.monotonic()
+        self._entries[key] = (value, now)
+        self._entries.move_to_end(key)
+        # TTL fixo: os vencidos ficam sempre no início da ordem de gravação
+        while self._entries:
+            oldest_key, (_, stored_at) = next(iter(self._entries.items()))
+            if now - stored_at < self.ttl and len(self._entries) <= self.max_size:
+                break
+            del self._entries[oldest_key]
+
+    def invalidate_wallet(self, wallet_address, chain=None):
+        """
+        Descarta os saldos da carteira (opcionalmente só de uma rede).
+
+        Returns:
+            int: Quantidade de saldos removidos
+        """
+        wallet = wallet_address.lower()
+        chain = chain.upper() if chain else None
+        if wallet in self._loading:
+            self._generations[wallet] = self._generations.get(wallet, 0) + 1
+        self.invalidations += 1
+
+        keys = [key for key in self._entries if key[1] == wallet and (chain is None or key[0] == chain)]
+        for key in keys:
+            del self._entries[key]
+        # Novas leituras não devem se juntar às que começaram antes da transação
+        for key in [key for key in self._inflight if key[1] == wallet and (chain is None or key[0] == chain)]:
+            del self._inflight[key]
+        return len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "inflight": len(self._inflight),
+            "tracked_wallets": len(self._generations),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "wallet_invalidations": self.invalidations,
+        }
+
+
+# Instância global do cache de saldos. Desligado por padrão (TTL 0): só é
+# seguro ligar quando o frontend envia wallet_address no /humanize-success,
+# senão um saldo de antes da última transação seria reaproveitado
+balance_cache = BalanceCache(
+    ttl=float(os.getenv("BALANCE_CACHE_TTL", "0")),
+    max_size=int(os.getenv("BALANCE_CACHE_MAX_SIZE", "10000")),
+)
@@ -3,101 +3,79 @@ Serviço para validação de saldos de tokens em diferentes redes blockchain.
 Centraliza a lógica de consulta de saldo e validação para uso por múltiplos agentes.
 """
 
-import aiohttp
-import json
-from services.lifi_service import TOKEN_INFO, get_gas_price
+import logging
+from services.rpc_client import supports_chain, rpc_request
+from services.lifi_service import token_registry, get_gas_price
+from services.portfolio_service import portfolio_service, format_balance
+from services.balance_cache import balance_cache
+from services.price_index import NATIVE_TOKEN_ADDRESS
+
+logger = logging.getLogger(__name__)
 
 
 async def get_token_balance(wallet_address, token_address, token_decimals, chain, is_native=False):
     """
-    Consulta o saldo de um token específico na carteira usando APIs públicas
+    Consulta o saldo de um token específico na carteira usando APIs públicas.
+    Leituras recentes da mesma carteira/token são reaproveitadas do balance_cache.
+    """
+    cache_token = NATIVE_TOKEN_ADDRESS if is_native else token_address
+    return await balance_cache.get(
+        chain, wallet_address, cache_token,
+        lambda: fetch_token_balance(wallet_address, token_address, token_decimals, chain, is_native)
+    )
+
+
+async def fetch_token_balance(wallet_address, token_address, token_decimals, chain, is_native=False):
+    """
+    Consulta o saldo diretamente no RPC da rede, sem cache
     """
     try:
-        # URLs das APIs RPC públicas por chain
-        rpc_urls = {
-            "ETH": "https://eth.llamarpc.com",
-            "BAS": "https://mainnet.base.org", 
-            "POL": "https://polygon-mainnet.g.alchemy.com/v2/YfUJiJEWCYnPD4__uGKAq68bUEB9-D4O"
-        }
-        
-        chain_upper = chain.upper()
-        rpc_url = rpc_urls.get(chain_upper)
-        
-        if not rpc_url:
+        if not supports_chain(chain):
             return {"error": f"Chain {chain} não suportada para consulta de saldo"}
         
         if is_native:
             # Para tokens nativos, usa eth_getBalance
-            payload = {
-                "jsonrpc": "2.0",
-                "method": "eth_getBalance",
-                "params": [wallet_address, "latest"],
-                "id": 1
-            }
+            rpc_result = await rpc_request(chain, "eth_getBalance", [wallet_address, "latest"])
         else:
             # Para tokens ERC-20, usa eth_call para balanceOf
             # balanceOf(address) = 0x70a08231 + endereço (32 bytes padded)
             address_param = wallet_address[2:].zfill(64)  # Remove 0x e pad com zeros
             data = f"0x70a08231{address_param}"
             
-            payload = {
-                "jsonrpc": "2.0",
-                "method": "eth_call",
-                "params": [{
-                    "to": token_address,
-                    "data": data
-                }, "latest"],
-                "id": 1
-            }
+            rpc_result = await rpc_request(chain, "eth_call", [{
+                "to": token_address,
+                "data": data
+            }, "latest"])
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                rpc_url, 
-                json=payload,
-                timeout=10,
-                headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status != 200:
-                    return {"error": f"Erro na API: {response.status}"}
-                
-                data = await response.json()
-                
-                if "error" in data:
-                    return {"error": f"Erro RPC: {data['error'].get('message', 'Desconhecido')}"}
-                
-                # Converte resultado hex para decimal
-                balance_hex = data.get("result")
-                
-                # Debug: log da resposta para facilitar troubleshooting
-                if not balance_hex or balance_hex == "0x":
-                    print(f"⚠️ DEBUG: Resposta RPC inesperada para {chain} - result: {balance_hex}, data completo: {data}")
-                
-                # Valida se o resultado existe e não está vazio
-                if not balance_hex:
-                    return {"error": "Resposta RPC vazia ou inválida"}
-                
-                # Remove espaços e valida formato
-                balance_hex = balance_hex.strip()
-                
-                # Se for apenas "0x" sem valor, trata como zero
-                if balance_hex == "0x" or len(balance_hex) <= 2:
-                    balance_hex = "0x0"
-                
-                # Valida se é um hex válido antes de converter
-                try:
-                    balance_wei = int(balance_hex, 16)
-                except ValueError as e:
-                    return {"error": f"Erro ao converter saldo hexadecimal '{balance_hex}': {str(e)}"}
-                
-                # Converte para unidade legível
-                balance_decimal = balance_wei / (10 ** token_decimals)
-                
-                return {
-                    "balance_wei": str(balance_wei),
-                    "balance_decimal": balance_decimal,
-                    "balance_formatted": f"{balance_decimal:.6f}".rstrip('0').rstrip('.')
-                }
-                
+        if "error" in rpc_result:
+            return rpc_result
+        
+        # Converte resultado hex para decimal
+        balance_hex = rpc_result["result"]
+        
+        # Debug: log da resposta para facilitar troubleshooting
+        if not balance_hex or balance_hex == "0x":
+            logger.warning("Resposta RPC inesperada", extra={"chain": chain, "result": balance_hex})
+        
+        # Valida se o resultado existe e não está vazio
+        if not balance_hex:
+            return {"error": "Resposta RPC vazia ou inválida"}
+        
+        # Remove espaços e valida formato
+        balance_hex = balance_hex.strip()
+        
+        # Se for apenas "0x" sem valor, trata como zero
+        if balance_hex == "0x" or len(balance_hex) <= 2:
+            balance_hex = "0x0"
+        
+        # Valida se é um hex válido antes de converter
+        try:
+            balance_wei = int(balance_hex, 16)
+        except ValueError as e:
+            return {"error": f"Erro ao converter saldo hexadecimal '{balance_hex}': {str(e)}"}
+        
+        return format_balance(balance_wei, token_decimals)
+            
     except Exception as e:
         return {"error": f"Erro ao consultar saldo: {str(e)}"}
 
@@ -157,7 +135,7 @@ async def get_gas_price_with_validation(chain):
     return {"gasPrice": gas_price}
 
 
-async def validate_sufficient_balance(wallet_address, token_symbol, amount, chain, include_gas_fee=False):
+async def validate_sufficient_balance(wallet_address, token_symbol, amount, chain, include_gas_fee=False, prefetch=None):
     """
     Valida se a carteira tem saldo suficiente para a operação solicitada.
     
@@ -167,14 +145,14 @@ async def validate_sufficient_balance(wallet_address, token_symbol, amount, chai
         amount: Quantidade a ser transferida/swapada
         chain: Rede blockchain (ETH, BAS, POL)
         include_gas_fee: Se deve considerar gas fee no cálculo (True para transfers de tokens nativos)
+        prefetch: ChainPrefetch da requisição (reaproveita o saldo nativo já consultado)
     
     Returns:
         dict: {"success": bool, "error": str, "balance_info": dict}
     """
     try:
-        # Busca informações do token
-        chain_upper = chain.upper()
-        token_info = TOKEN_INFO.get(chain_upper, {}).get(token_symbol.upper())
+        # Busca informações do token (por símbolo, endereço ou nome)
+        token_info = token_registry.resolve(chain, token_symbol)
         
         if not token_info:
             return {
@@ -183,16 +161,25 @@ async def validate_sufficient_balance(wallet_address, token_symbol, amount, chai
             }
         
         # Verifica se é token nativo
+        token_symbol = token_info.symbol
         is_native = is_native_token(token_symbol, chain)
         
-        # Consulta saldo atual da carteira
-        balance_result = await get_token_balance(
-            wallet_address,
-            token_info["address"], 
-            token_info["decimals"],
-            chain,
-            is_native
-        )
+        # Consulta saldo atual da carteira (o saldo nativo pode já ter sido pré-buscado)
+        balance_result = None
+        if is_native and prefetch is not None:
+            balance_result = await prefetch.native_balance(token_info.decimals)
+        if balance_result is None:
+            # Saldo via Multicall3 (mesmo eth_call traz o número do bloco)
+            balance_result = await portfolio_service.get_token_balance(wallet_address, token_info, chain)
+        if "error" in balance_result:
+            logger.warning("Consulta via Multicall3 falhou (%s). Usando consulta direta.", balance_result["error"])
+            balance_result = await get_token_balance(
+                wallet_address,
+                token_info.address, 
+                token_info.decimals,
+                chain,
+                is_native
+            )
         
         if "error" in balance_result:
             return {
@@ -233,7 +220,7 @@ async def validate_sufficient_balance(wallet_address, token_symbol, amount, chai
                     total_gas_cost = gas_price_decimal * gas_limit_decimal
                 except (ValueError, AttributeError) as e:
                     # Se houver erro na conversão, continua sem considerar gas fee
-                    print(f"⚠️ Aviso: Erro ao calcular gas fee: {e}. Continuando sem considerar gas fee.")
+                    logger.warning("Erro ao calcular gas fee: %s. Continuando sem considerar gas fee.", e)
                     total_gas_cost = 0
                 
                 # Verifica se tem saldo para operação + gas
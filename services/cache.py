@@ -0,0 +1,186 @@
+"""
+Caches em memória usados pelos serviços para evitar chamadas repetidas aos
+provedores externos: AsyncTTLCache (TTL, single-flight e stale-while-revalidate)
+e LRUCache (limitado por tamanho, com TTL).
+"""
+
+import asyncio
+import copy
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _is_cacheable(value):
+    # Respostas de erro seguem o padrão {"error": ...} e nunca são armazenadas
+    return not (isinstance(value, dict) and "error" in value)
+
+
+class AsyncTTLCache:
+    def __init__(self, name, ttl, stale_ttl=0, copy_values=False, cacheable=_is_cacheable):
+        """
+        Args:
+            name: Nome do cache (usado nas estatísticas)
+            ttl: Tempo em segundos em que um valor é considerado fresco
+            stale_ttl: Janela extra em que o valor vencido ainda é servido
+                enquanto uma atualização roda em segundo plano
+            copy_values: Se deve devolver cópias profundas (para valores mutados pelos chamadores)
+            cacheable: Função que decide se um valor carregado pode ser armazenado
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.copy_values = copy_values
+        self.cacheable = cacheable
+        self._entries = {}
+        self._inflight = {}
+        self._background = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _output(self, value):
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def peek(self, key):
+        """Retorna o valor armazenado (mesmo vencido) sem disparar carregamento"""
+        entry = self._entries.get(key)
+        return self._output(entry[0]) if entry else None
+
+    def age(self, key):
+        entry = self._entries.get(key)
+        return time.monotonic() - entry[1] if entry else None
+
+    def set(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def _load(self, key, loader):
+        try:
+            value = await loader()
+            if self.cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _start_load(self, key, loader):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, loader))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        return task
+
+    def refresh_in_background(self, key, loader):
+        """Agenda uma atualização sem aguardar (reaproveita carga em andamento)"""
+        if key in self._inflight:
+            return
+        task = self._start_load(key, loader)
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Erro na atualização em segundo plano do cache %s: %s", self.name, task.exception())
+
+    async def get(self, key, loader):
+        """
+        Retorna o valor da chave, carregando com `loader` quando necessário.
+        Chamadas concorrentes para a mesma chave compartilham o mesmo carregamento.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return self._output(value)
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self.refresh_in_background(key, loader)
+                return self._output(value)
+
+        self.misses += 1
+        task = self._start_load(key, loader)
+        # shield: o cancelamento de um chamador não interrompe a carga compartilhada
+        value = await asyncio.shield(task)
+        return self._output(value)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+class LRUCache:
+    """Cache síncrono limitado por tamanho (LRU) com expiração por TTL"""
+
+    def __init__(self, name, max_size, ttl):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, stored_at = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (copy.deepcopy(value), time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Esvazia o cache e retorna quantas entradas foram removidas"""
+        removed = len(self._entries)
+        self._entries.clear()
+        return removed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
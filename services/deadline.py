@@ -0,0 +1,222 @@
+"""
+Prazo (deadline) de cada requisição e timeouts adaptativos por upstream.
+
+O prazo é criado em main.process_request e fica em uma ContextVar, então
+acompanha a requisição por RouterAgent, agentes, serviços e tarefas criadas
+a partir dela (pré-busca, cargas de cache). Cada chamada externa usa como
+timeout o menor valor entre o tempo que resta do prazo e um limite derivado
+da latência observada daquele upstream (p99 x multiplicador). Com o prazo
+esgotado, a chamada nem é feita: DeadlineExceeded é lançada na hora.
+"""
+
+import asyncio
+import inspect
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from services.metrics import record_upstream
+from services.admission import upstream_admission
+
+load_dotenv()
+
+# Orçamento total de uma requisição /process, em segundos
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "30"))
+
+# Timeout padrão por upstream enquanto não há amostras suficientes (e teto do adaptativo)
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+DEFAULT_UPSTREAM_TIMEOUTS = {
+    "gemini": float(os.getenv("GEMINI_TIMEOUT", "20")),
+    "gemini_stream": float(os.getenv("GEMINI_STREAM_TIMEOUT", "10")),
+}
+
+# Timeout adaptativo: p99 da latência observada x multiplicador, com piso
+UPSTREAM_TIMEOUT_MULTIPLIER = float(os.getenv("UPSTREAM_TIMEOUT_MULTIPLIER", "3"))
+UPSTREAM_TIMEOUT_MIN = float(os.getenv("UPSTREAM_TIMEOUT_MIN", "1"))
+UPSTREAM_TIMEOUT_MIN_SAMPLES = int(os.getenv("UPSTREAM_TIMEOUT_MIN_SAMPLES", "20"))
+
+# Resposta enviada ao usuário quando o prazo acaba (sem nova chamada ao LLM)
+DEADLINE_MESSAGES = {
+    "pt": "A consulta demorou mais do que o esperado e foi interrompida. Tente novamente em instantes.",
+    "en": "The request took longer than expected and was stopped. Please try again in a moment.",
+    "es": "La consulta tardó más de lo esperado y fue interrumpida. Inténtalo de nuevo en unos instantes.",
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    def __init__(self, upstream=None):
+        self.upstream = upstream
+        detail = f" ({upstream})" if upstream else ""
+        super().__init__(f"Prazo da requisição esgotado{detail}")
+
+
+class Deadline:
+    def __init__(self, budget=None):
+        self.budget = REQUEST_DEADLINE if budget is None else budget
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + self.budget
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+
+def adaptive_timeout(samples, default):
+    """
+    Timeout a partir das latências observadas (em segundos): p99 x multiplicador,
+    entre UPSTREAM_TIMEOUT_MIN e o padrão. Sem amostras suficientes, usa o padrão.
+    """
+    if len(samples) < UPSTREAM_TIMEOUT_MIN_SAMPLES:
+        return default
+    ordered = sorted(samples)
+    p99 = ordered[int(0.99 * (len(ordered) - 1))]
+    return min(default, max(UPSTREAM_TIMEOUT_MIN, p99 * UPSTREAM_TIMEOUT_MULTIPLIER))
+
+
+class UpstreamLatency:
+    """Histograma de latência (janela deslizante) e contagem de timeouts por upstream"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self.samples = {}
+        self.timeouts = {}
+        self.deadline_exceeded = 0
+
+    def default_timeout(self, upstream):
+        return DEFAULT_UPSTREAM_TIMEOUTS.get(upstream, UPSTREAM_TIMEOUT)
+
+    def observe(self, upstream, seconds):
+        self.samples.setdefault(upstream, deque(maxlen=self.window)).append(seconds)
+
+    def record_timeout(self, upstream):
+        self.timeouts[upstream] = self.timeouts.get(upstream, 0) + 1
+
+    def timeout(self, upstream, default=None):
+        default = default or self.default_timeout(upstream)
+        return adaptive_timeout(self.samples.get(upstream, ()), default)
+
+    def stats(self):
+        result = {}
+        for upstream in sorted(set(self.samples) | set(self.timeouts)):
+            ordered = sorted(self.samples.get(upstream, ()))
+            result[upstream] = {
+                "samples": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                "p99_ms": round(ordered[int(0.99 * (len(ordered) - 1))] * 1000, 1) if ordered else None,
+                "timeout_ms": round(self.timeout(upstream) * 1000, 1),
+                "timeouts": self.timeouts.get(upstream, 0),
+            }
+        return {"deadline_exceeded": self.deadline_exceeded, "upstreams": result}
+
+
+# Latências observadas de todos os upstreams
+upstream_latency = UpstreamLatency()
+
+_current_deadline = ContextVar("request_deadline", default=None)
+
+
+def start_deadline(budget=None):
+    """Cria o prazo da requisição atual (vale para tudo que for chamado a partir daqui)"""
+    deadline = Deadline(budget)
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def deadline_expired():
+    deadline = _current_deadline.get()
+    return deadline is not None and deadline.expired()
+
+
+def deadline_message(language="pt"):
+    return DEADLINE_MESSAGES.get(language, DEADLINE_MESSAGES["pt"])
+
+
+def budget_timeout(timeout, upstream=None):
+    """
+    Limita o timeout ao que resta do prazo da requisição (se houver).
+    Lança DeadlineExceeded se o prazo já acabou.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        upstream_latency.deadline_exceeded += 1
+        raise DeadlineExceeded(upstream)
+    return min(timeout, remaining)
+
+
+def upstream_timeout(upstream, default=None):
+    """Timeout da próxima chamada ao upstream: adaptativo e limitado pelo prazo"""
+    return budget_timeout(upstream_latency.timeout(upstream, default), upstream)
+
+
+@asynccontextmanager
+async def upstream_call(upstream, default=None):
+    """
+    Executa o bloco com o timeout do upstream e registra a latência observada.
+
+    Lança DeadlineExceeded se o prazo da requisição acabar (antes ou durante a
+    chamada) e TimeoutError se só o timeout do upstream estourar.
+    """
+    timeout = upstream_timeout(upstream, default)
+    start_time = time.perf_counter()
+    outcome = "error"
+    try:
+        async with asyncio.timeout(timeout):
+            yield timeout
+        outcome = "ok"
+    except TimeoutError as e:
+        outcome = "timeout"
+        if isinstance(e, DeadlineExceeded):
+            raise
+        upstream_latency.record_timeout(upstream)
+        if deadline_expired():
+            upstream_latency.deadline_exceeded += 1
+            raise DeadlineExceeded(upstream) from e
+        raise TimeoutError(f"Timeout de {timeout:.1f}s na chamada a {upstream}") from e
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except StopAsyncIteration:
+        # Fim normal de um stream aguardado com bounded(anext(...))
+        outcome = "ok"
+        raise
+    finally:
+        record_upstream(upstream, time.perf_counter() - start_time, outcome)
+    upstream_latency.observe(upstream, time.perf_counter() - start_time)
+
+
+@asynccontextmanager
+async def admitted(upstream):
+    """
+    Ocupa uma vaga do upstream no controle de admissão (services.admission);
+    a espera na fila não passa do que resta do prazo da requisição
+    """
+    max_wait = None
+    if _current_deadline.get() is not None:
+        max_wait = budget_timeout(float("inf"), upstream)
+    async with upstream_admission.slot(upstream, max_wait):
+        yield
+
+
+async def bounded(awaitable, upstream, default=None):
+    """Aguarda um awaitable com o timeout do upstream (ver upstream_call)"""
+    try:
+        async with upstream_call(upstream, default):
+            return await awaitable
+    finally:
+        # Prazo esgotado antes da chamada: descarta a corrotina que não foi aguardada
+        if inspect.iscoroutine(awaitable):
+            awaitable.close()
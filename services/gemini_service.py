@@ -1,403 +1,358 @@
+import logging
 import os
+import re
 import json
+import time
+import asyncio
+import datetime
 import google.generativeai as genai
+from services.cache import AsyncTTLCache, LRUCache
+from services.deadline import admitted, bounded
+from services.metrics import record_stage
+from services.gemini_prompts import SYSTEM_INSTRUCTIONS
 from services.token_normalizer import TokenNormalizer
 
+logger = logging.getLogger(__name__)
+
+# Cache de classificação de intenção: texto normalizado -> dados extraídos
+intent_cache = LRUCache(
+    "intent",
+    max_size=int(os.getenv("INTENT_CACHE_MAX_SIZE", "1024")),
+    ttl=float(os.getenv("INTENT_CACHE_TTL", "3600")),
+)
+
+# Vírgula decimal entre dígitos ("1,5"), sem confundir com milhar ("1,000")
+_DECIMAL_COMMA = re.compile(r"(?<=\d),(?=\d{1,2}\b|\d{4,}\b)")
+# Decimais com ponto ("1.50", "10.0"); "2.500" pode ser milhar e não é alterado
+_DECIMAL_NUMBER = re.compile(r"\b(\d+)\.(\d+)\b")
+
+
+def _strip_trailing_zeros(match):
+    integer, fraction = match.groups()
+    if len(fraction) == 3:
+        return match.group(0)
+    fraction = fraction.rstrip("0")
+    return f"{integer}.{fraction}" if fraction else integer
+
+
+def normalize_intent_input(user_input):
+    """
+    Normaliza o texto do usuário para a chave do cache de intenção:
+    espaços, maiúsculas/minúsculas, pontuação final e formato dos números
+    """
+    text = " ".join(user_input.split()).lower().rstrip(".!?")
+    text = _DECIMAL_COMMA.sub(".", text)
+    text = _DECIMAL_NUMBER.sub(_strip_trailing_zeros, text)
+    return text
+
+
+# Modelo usado em todas as chamadas
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+# Cache de contexto explícito das instruções fixas. Exige uma versão fixa do
+# modelo e um tamanho mínimo de prompt; se a criação falhar, as chamadas
+# continuam usando a system_instruction do modelo pré-configurado
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_MODEL = os.getenv("GEMINI_CONTEXT_CACHE_MODEL", "models/gemini-2.0-flash-001")
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+
+
+def _usage_counts(usage_metadata):
+    """Extrai (entrada, entrada em cache, saída) do usage_metadata do Gemini"""
+    if usage_metadata is None:
+        return 0, 0, 0
+    return (
+        getattr(usage_metadata, "prompt_token_count", 0) or 0,
+        getattr(usage_metadata, "cached_content_token_count", 0) or 0,
+        getattr(usage_metadata, "candidates_token_count", 0) or 0,
+    )
+
+
+class GeminiUsage:
+    """Contabiliza tokens e tempo até o primeiro token por tipo de chamada"""
 
-class GeminiService:
     def __init__(self):
+        self.calls = {}
+
+    def record(self, call_type, usage_metadata, first_token_seconds, total_seconds):
+        input_tokens, cached_tokens, output_tokens = _usage_counts(usage_metadata)
+        entry = self.calls.setdefault(call_type, {
+            "calls": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "output_tokens": 0,
+            "first_token_seconds": 0.0,
+            "total_seconds": 0.0,
+        })
+        entry["calls"] += 1
+        entry["input_tokens"] += input_tokens
+        entry["cached_input_tokens"] += cached_tokens
+        entry["output_tokens"] += output_tokens
+        entry["first_token_seconds"] += first_token_seconds or 0.0
+        entry["total_seconds"] += total_seconds
+
+    def stats(self):
+        result = {}
+        for call_type, entry in self.calls.items():
+            calls = entry["calls"]
+            result[call_type] = {
+                "calls": calls,
+                "input_tokens": entry["input_tokens"],
+                "cached_input_tokens": entry["cached_input_tokens"],
+                "output_tokens": entry["output_tokens"],
+                "avg_input_tokens": round(entry["input_tokens"] / calls, 1),
+                "avg_output_tokens": round(entry["output_tokens"] / calls, 1),
+                "avg_first_token_ms": round(entry["first_token_seconds"] * 1000 / calls, 1),
+                "avg_total_ms": round(entry["total_seconds"] * 1000 / calls, 1),
+            }
+        return result
+
+
+# Instância global da contabilização de uso
+gemini_usage = GeminiUsage()
+
+
+def _default_model_factory(call_type, system_instruction):
+    return genai.GenerativeModel(GEMINI_MODEL, system_instruction=system_instruction)
+
+
+class GeminiService:
+    def __init__(self, model_factory=None):
+        """
+        Args:
+            model_factory: Função (tipo de chamada, instruções) -> modelo; permite
+                substituir o Gemini por um modelo local nos benchmarks
+        """
         genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        # For text-only input
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
-
-    async def classify_intent_and_extract(self, user_input):
-        prompt = (
-            "Classifique a intenção do usuário a partir do input abaixo. "
-            "Se a intenção for cotação ou swap, extraia também os campos fromToken, toToken e fromAmount do input. "
-            "IMPORTANTE: Detecte também o idioma da mensagem do usuário e inclua no JSON de resposta. "
-            "Responda SOMENTE neste formato JSON:\n"
-            '{\"intent\": \"cotacao\", \"fromToken\": \"BTC\", \"toToken\": \"USDC\", \"fromAmount\": \"10\", \"language\": \"pt\"}\n'
-            '{\"intent\": \"swap\", \"fromToken\": \"BTC\", \"toToken\": \"USDC\", \"fromAmount\": \"10\", \"language\": \"en\"}\n'
-            "IMPORTANTE: \n"
-            "- fromToken: é o token que o usuário QUER TROCAR (o que ele TEM)\n"
-            "- toToken: é o token que o usuário QUER RECEBER\n"
-            "- fromAmount: é a quantidade do fromToken\n"
-            "- intent: 'cotacao' para apenas ver preços, 'swap' para executar a troca\n"
-            "- language: código do idioma detectado ('pt' para português, 'en' para inglês, 'es' para espanhol, etc.)\n"
-            "- Para nomes de tokens, aceite variações como: 'Bitcoin' -> 'BTC', 'Ethereum' -> 'ETH', 'Tether' -> 'USDT', etc.\n"
-            "- Se notar que o usuário errou o nome do token, tente corrigir para o nome correto!\n"
-            "\n"
-            "Exemplos:\n"
-            "- 'quero trocar 1 BTC por USDC' -> intent: 'swap', fromToken: 'BTC', toToken: 'USDC', fromAmount: '1', language: 'pt'\n"
-            "- 'fazer swap de 1 Bitcoin para USD Coin' -> intent: 'swap', fromToken: 'Bitcoin', toToken: 'USD Coin', fromAmount: '1', language: 'pt'\n"
-            "- 'I want to swap 2 Ethereum for Tether' -> intent: 'swap', fromToken: 'Ethereum', toToken: 'Tether', fromAmount: '2', language: 'en'\n"
-            "- 'what is the quote for 1 WBTC in USDC' -> intent: 'cotacao', fromToken: 'WBTC', toToken: 'USDC', fromAmount: '1', language: 'en'\n"
-            "- 'quanto vale 1 ETH em USDT' -> intent: 'cotacao', fromToken: 'ETH', toToken: 'USDT', fromAmount: '1', language: 'pt'\n"
-            "- 'cotação de 5 Polygon em Dai' -> intent: 'cotacao', fromToken: 'Polygon', toToken: 'Dai', fromAmount: '5', language: 'pt'\n"
-            "- 'how many ETH will I get if I swap 1000 USDC?' -> intent: 'cotacao', fromToken: 'USDC', toToken: 'ETH', fromAmount: '1000', language: 'en'\n"
-            "- 'quantos link vou ter se trocar por 1000 dolar?' -> intent: 'cotacao', fromToken: 'dolar', toToken: 'link', fromAmount: '1000', language: 'pt'\n"
-            "- 'quero transferir 4 USDC para o endereço 0x6E5e81075873EA1f3fE04ae663111cB47B1c6bCD' -> intent: 'transferencia', token: 'USDC', amount: '4', toAddress: '0x6E5e81075873EA1f3fE04ae663111cB47B1c6bCD', language: 'pt'\n"
-            "- 'transfer 10 Ethereum to 0x1234567890123456789012345678901234567890' -> intent: 'transferencia', token: 'Ethereum', amount: '10', toAddress: '0x1234567890123456789012345678901234567890', language: 'en'\n"
-            "\n"
-            f"Input: {user_input}"
-        )
+        factory = model_factory or _default_model_factory
+        # Um modelo pré-configurado por tipo de chamada: as instruções fixas vão
+        # como system_instruction e cada requisição envia só a parte variável
+        self.models = {
+            call_type: factory(call_type, instruction)
+            for call_type, instruction in SYSTEM_INSTRUCTIONS.items()
+        }
+        self.usage = gemini_usage
+        self.context_cache_enabled = GEMINI_CONTEXT_CACHE and model_factory is None
+        # Renova o cache local antes de o cache do servidor expirar
+        self._context_caches = AsyncTTLCache("gemini_context", ttl=GEMINI_CONTEXT_CACHE_TTL * 0.9)
+        self._context_cache_failed = set()
+
+    async def _create_context_cache(self, call_type):
+        try:
+            cached_content = await asyncio.to_thread(
+                genai.caching.CachedContent.create,
+                model=GEMINI_CONTEXT_CACHE_MODEL,
+                display_name=f"cripto-tcc-{call_type}",
+                system_instruction=SYSTEM_INSTRUCTIONS[call_type],
+                ttl=datetime.timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL),
+            )
+            logger.info("Cache de contexto do Gemini criado para %s: %s", call_type, cached_content.name)
+            return genai.GenerativeModel.from_cached_content(cached_content)
+        except Exception as e:
+            logger.warning("Não foi possível criar o cache de contexto do Gemini para %s: %s. "
+                           "Usando a system_instruction do modelo.", call_type, e)
+            self._context_cache_failed.add(call_type)
+            return {"error": str(e)}
+
+    async def _model_for(self, call_type):
+        if not self.context_cache_enabled or call_type in self._context_cache_failed:
+            return self.models[call_type]
+
+        model = await self._context_caches.get(call_type, lambda: self._create_context_cache(call_type))
+        return self.models[call_type] if isinstance(model, dict) else model
+
+    async def _start(self, call_type, contents, stream=False):
+        model = await self._model_for(call_type)
+        try:
+            return await bounded(model.generate_content_async(contents, stream=stream), "gemini")
+        except TimeoutError:
+            raise
+        except Exception as e:
+            if model is self.models[call_type]:
+                raise
+            # Cache de contexto expirado/removido: volta para o modelo pré-configurado
+            logger.warning("Falha ao usar o cache de contexto do Gemini para %s: %s", call_type, e)
+            self._context_caches.invalidate(call_type)
+            return await bounded(self.models[call_type].generate_content_async(contents, stream=stream), "gemini")
 
-        # Gemini API uses generate_content instead of chat.completions.create
-        # The response structure is also different.
-        response = await self.model.generate_content_async(prompt)
+    async def _generate(self, call_type, contents):
+        async with admitted("gemini"):
+            start_time = time.perf_counter()
+            response = await self._start(call_type, contents)
+        elapsed = time.perf_counter() - start_time
+        self.usage.record(call_type, getattr(response, "usage_metadata", None), elapsed, elapsed)
+        return response
+
+    async def _stream(self, call_type, contents):
+        # A vaga do Gemini fica ocupada pelo stream inteiro, não só pelo início
+        async with admitted("gemini"):
+            start_time = time.perf_counter()
+            first_token_seconds = None
+            usage_metadata = None
+
+            response_stream = await self._start(call_type, contents, stream=True)
+            chunks = response_stream.__aiter__()
+            completed = False
+            try:
+                while True:
+                    # Cada chunk espera no máximo o timeout do stream (e o que resta do prazo)
+                    try:
+                        chunk = await bounded(anext(chunks), "gemini_stream")
+                    except StopAsyncIteration:
+                        break
+                    # O uso acumulado vem nos chunks; o último traz os totais
+                    chunk_usage = getattr(chunk, "usage_metadata", None)
+                    if _usage_counts(chunk_usage)[0]:
+                        usage_metadata = chunk_usage
+                    if chunk.text:  # Check if text is available in the chunk
+                        if first_token_seconds is None:
+                            first_token_seconds = time.perf_counter() - start_time
+                        yield chunk.text
+                completed = True
+            finally:
+                if not completed:
+                    # Stream interrompido (cliente desconectou, prazo esgotado): fecha
+                    # o iterador do SDK; a chamada gRPC é cancelada ao ser descartada
+                    close = getattr(chunks, "aclose", None)
+                    if close is not None:
+                        await close()
+
+        total_seconds = time.perf_counter() - start_time
+        self.usage.record(call_type, usage_metadata, first_token_seconds, total_seconds)
+        record_stage("gemini_ttft", first_token_seconds)
+        record_stage("gemini_generation", total_seconds)
+
+    def stats(self):
+        return {
+            "model": GEMINI_MODEL,
+            "context_cache": {
+                "enabled": self.context_cache_enabled,
+                "failed": sorted(self._context_cache_failed),
+                **self._context_caches.stats(),
+            },
+            "usage": self.usage.stats(),
+        }
+
+    async def classify_intent_and_extract(self, user_input, on_llm_latency=None):
+        """
+        Args:
+            on_llm_latency: Chamada com a duração (s) da classificação quando ela
+                vai de fato ao Gemini; acertos do intent_cache não contam
+        """
+        # Prompts repetidos reaproveitam a classificação anterior
+        cache_key = normalize_intent_input(user_input)
+        cached = intent_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        start_time = time.perf_counter()
+        response = await self._generate("classify_intent", f"Input: {user_input}")
+        if on_llm_latency is not None:
+            on_llm_latency(time.perf_counter() - start_time)
 
         content = response.text.strip()
-        print("Resposta bruta do Gemini (classify_intent_and_extract):", content)
+        logger.debug("Resposta bruta do Gemini (classify_intent_and_extract): %s", content)
         try:
             # Attempt to remove markdown and parse JSON
             cleaned_content = content.replace('```json', '').replace('```', '').strip()
             data = json.loads(cleaned_content)
-            print("Dados extraídos:", data)
+            logger.debug("Dados extraídos: %s", data)
             
             # Normaliza os tokens usando o TokenNormalizer
             normalized_data = TokenNormalizer.normalize_extracted_data(data)
-            print("Dados após normalização:", normalized_data)
+            logger.debug("Dados após normalização: %s", normalized_data)
+            intent_cache.set(cache_key, normalized_data)
             return normalized_data
         except Exception as e:
-            print(f"Erro ao fazer parse do JSON: {e}. Conteúdo: {content}")
+            logger.warning("Erro ao fazer parse do JSON: %s. Conteúdo: %s", e, content)
             # Fallback if JSON parsing fails
             return {"intent": content.lower()}
 
     async def generate_friendly_message(self, quote_response, language="pt"):
-        print("Quote response recebido:", quote_response)
-        
-        prompt = (
-            f"Receba o seguinte JSON de cotação de troca de tokens e gere uma mensagem amigável, clara e objetiva explicando para o usuário o resultado da cotação. "
+        contents = (
             f"IMPORTANTE: Responda no idioma detectado: {language}.\n"
             "\n"
-            "# Instruções obrigatórias:\n"
-            "- Informe quanto o usuário vai enviar (valor + símbolo do token de origem), usando o campo `fromAmount` ajustado pelas casas decimais do token de origem.\n"
-            "- Informe quanto o usuário vai receber aproximadamente (valor + símbolo do token de destino), usando o campo `toAmount` ajustado pelas casas decimais do token de destino.\n"
-            "- Use os campos `fromToken` e `toToken` da resposta para identificar os símbolos corretos dos tokens.\n"
-            "- Sempre exiba a taxa estimada de rede, usando o valor em **USD** (campo `amountUSD` dentro de `gasCosts`) e o símbolo do token que paga a taxa (campo `symbol`, por ex. ETH).\n"
-            "- Informe o tempo estimado de execução em segundos (campo `executionDuration`).\n"
-            "- Use a formatação numérica apropriada para o idioma (ex: português/espanhol usam vírgula para decimal, inglês usa ponto).\n"
-            "- Finalize com uma observação sobre serem cotações e atenção aos valores reais na troca.\n"
-            "\n"
-            "# Regras:\n"
-            "- Não afirme que a troca foi realizada. É apenas uma cotação.\n"
-            "- Não invente dados. Use apenas o que está presente no JSON.\n"
-            "- Não converta valores para outras moedas que não estejam no JSON.\n"
-            "- Não ofereça conselhos financeiros ou sugestões pessoais.\n"
-            "- Seja direto, claro e sem floreios.\n"
-            "- IMPORTANTE: Use ** para negrito e * para itálico.\n"
-            "\n"
-            "# Exemplo de estrutura (adapte ao idioma solicitado):\n"
-            "Com [fromAmount] [fromToken], você vai receber aproximadamente **[toAmount] [toToken]**.\n"
-            "\n"
-            "⛽ Taxas estimadas da rede: **~$X,XX** em [symbol]\n"
-            "🕝 Tempo de execução: ~X segundos\n"
-            "\n"
-            "*Observação sobre cotações vs valores reais da troca.*\n"
-            "\n"
             f"JSON: {json.dumps(quote_response, ensure_ascii=False)}"
         )
 
-        print("\n\n !!!!!! Prompt enviado ao Gemini (generate_friendly_message):", prompt, "\n\n")
-        
-        # Gemini API uses generate_content for streaming as well
-        # The response structure for streaming chunks is different.
-        response_stream = await self.model.generate_content_async(prompt, stream=True)
-        
-        async for chunk in response_stream:
-            if chunk.text:  # Check if text is available in the chunk
-                yield chunk.text
+        logger.debug("Prompt enviado ao Gemini (generate_friendly_message): %s", contents)
+
+        async for chunk in self._stream("quote_message", contents):
+            yield chunk
 
     async def generate_transfer_message(self, transfer_response, language="pt"):
         """
         Gera mensagem amigável para transferências, incluindo informações
         sobre a transação
         """
-        prompt = (
-            f"Receba o seguinte JSON de dados de transferência de tokens e gere uma mensagem amigável e clara explicando para o usuário o que acontecerá na transação. "
+        contents = (
             f"IMPORTANTE: Responda no idioma detectado: {language}.\n"
             "\n"
-            "# Instruções obrigatórias:\n"
-            "- Informe que esta é uma transação de TRANSFERÊNCIA (envio de tokens)\n"
-            "- Informe quanto o usuário vai enviar (valor + símbolo do token), usando o campo `fromAmount`\n"
-            "- Informe para qual endereço será feita a transferência (campo `toAddress`)\n"
-            "- Use o campo `fromToken` da resposta para identificar o símbolo correto do token\n"
-            "- Sempre exiba a taxa estimada de rede, usando o valor em **USD** (campo `amountUSD` dentro de `gasCosts`) e o símbolo do token que paga a taxa (campo `symbol`, por ex. ETH)\n"
-            "- Informe o tempo estimado de execução em segundos (campo `executionDuration`)\n"
-            "- Use a formatação numérica apropriada para o idioma\n"
-            "- Finalize informando que o usuário poderá revisar e confirmar a transação na próxima etapa\n"
-            "- IMPORTANTE: Mostre apenas os primeiros 6 e últimos 4 caracteres do endereço de destino para segurança\n"
-            "\n"
-            "# Regras:\n"
-            "- Deixe claro que esta é uma transação real de transferência, não apenas uma simulação\n"
-            "- Não invente dados. Use apenas o que está presente no JSON.\n"
-            "- Não converta valores para outras moedas que não estejam no JSON.\n"
-            "- Seja direto, claro e sem floreios.\n"
-            "- IMPORTANTE: Use ** para negrito e * para itálico.\n"
-            "\n"
-            "# Exemplo de estrutura (adapte ao idioma solicitado):\n"
-            "📤 **Processo de transferência de tokens iniciado!**\n"
-            "\n"
-            "Você estará enviando [fromAmount] [fromToken] para o endereço **0x1234...5678**.\n"
-            "\n"
-            "⛽ Taxas estimadas da rede: **~$X,XX** em [symbol]\n"
-            "🕝 Tempo de execução: ~X segundos\n"
-            "\n"
-            "Na próxima etapa você poderá revisar todos os detalhes e confirmar a transação.\n"
-            "\n"
-            "Deseja continuar com a transferência?\n"
-            "\n"
             f"JSON: {json.dumps(transfer_response, ensure_ascii=False)}"
         )
 
-        print("\n\n !!!!!! Prompt enviado ao Gemini "
-              "(generate_transfer_message)", "\n\n")
-
-        # Gemini API uses generate_content for streaming as well
-        response_stream = await self.model.generate_content_async(prompt, stream=True)
+        logger.debug("Prompt enviado ao Gemini (generate_transfer_message): %s", contents)
 
-        async for chunk in response_stream:
-            if chunk.text:  # Check if text is available in the chunk
-                yield chunk.text
+        async for chunk in self._stream("transfer_message", contents):
+            yield chunk
 
     async def generate_swap_message(self, swap_response, language="pt"):
         """
         Gera mensagem amigável para swaps, incluindo informações sobre a transação
         """
-        prompt = (
-            f"Receba o seguinte JSON de dados de swap de tokens e gere uma mensagem amigável e clara explicando para o usuário o que acontecerá na transação. "
+        contents = (
             f"IMPORTANTE: Responda no idioma detectado: {language}.\n"
             "\n"
-            "# Instruções obrigatórias:\n"
-            "- Informe que esta é uma transação de SWAP (troca), não apenas uma cotação\n"
-            "- Informe quanto o usuário vai enviar (valor + símbolo do token de origem), usando o campo `fromAmount` ajustado pelas casas decimais do token de origem\n"
-            "- Informe quanto o usuário vai receber aproximadamente (valor + símbolo do token de destino), usando o campo `toAmount` ajustado pelas casas decimais do token de destino\n"
-            "- Use os campos `fromToken` e `toToken` da resposta para identificar os símbolos corretos dos tokens\n"
-            "- Sempre exiba a taxa estimada de rede, usando o valor em **USD** (campo `amountUSD` dentro de `gasCosts`) e o símbolo do token que paga a taxa (campo `symbol`, por ex. ETH)\n"
-            "- Informe o tempo estimado de execução em segundos (campo `executionDuration`)\n"
-            "- Use a formatação numérica apropriada para o idioma\n"
-            "- Finalize informando que o usuário poderá revisar e confirmar a transação na próxima etapa\n"
-            "\n"
-            "# Regras:\n"
-            "- Deixe claro que esta é uma transação real de swap, não apenas cotação\n"
-            "- Não invente dados. Use apenas o que está presente no JSON.\n"
-            "- Não converta valores para outras moedas que não estejam no JSON.\n"
-            "- Seja direto, claro e sem floreios.\n"
-            "- IMPORTANTE: Use ** para negrito e * para itálico.\n"
-            "\n"
-            "# Exemplo de estrutura (adapte ao idioma solicitado):\n"
-            "🔄 **Processo de troca entre tokens (Swap) iniciado!**\n"
-            "\n"
-            "Você estará trocando [fromAmount] [fromToken] por aproximadamente **[toAmount] [toToken]**.\n"
-            "\n"
-            "⛽ Taxas estimadas da rede: **~$X,XX** em [symbol]\n"
-            "🕝 Tempo de execução: ~X segundos\n"
-            "\n"
-            "Na próxima etapa você poderá revisar todos os detalhes e confirmar a transação.\n"
-            "\n"
-            "Deseja continuar com a transação?\n"
-            "\n"
             f"JSON: {json.dumps(swap_response, ensure_ascii=False)}"
         )
 
-        print("\n\n !!!!!! Prompt enviado ao Gemini (generate_swap_message)", "\n\n")
-        
-        # Gemini API uses generate_content for streaming as well
-        response_stream = await self.model.generate_content_async(prompt, stream=True)
-        
-        async for chunk in response_stream:
-            if chunk.text: # Check if text is available in the chunk
-                yield chunk.text
+        logger.debug("Prompt enviado ao Gemini (generate_swap_message): %s", contents)
+
+        async for chunk in self._stream("swap_message", contents):
+            yield chunk
 
     async def generate_helpful_response(self, user_input, language="pt"):
         """
         Gera uma resposta amigável e orientativa para mensagens que não são das funcionalidades principais
         """
-        prompt = (
-            f"O usuário enviou a seguinte mensagem: '{user_input}'. "
-            f"Esta mensagem não corresponde às funcionalidades principais da plataforma (cotações, swaps ou transferências de tokens). "
+        contents = (
             f"IMPORTANTE: Responda no idioma detectado: {language}.\n"
             "\n"
-            "# Seu papel:\n"
-            "Você é um assistente especializado em operações blockchain que ajuda usuários com:\n"
-            "- 📊 **Cotações de tokens** - Ver preços atuais de troca entre diferentes criptomoedas\n"
-            "- 🔄 **Swaps de tokens** - Trocar uma criptomoeda por outra\n"
-            "- 📤 **Transferências** - Enviar tokens para outros endereços\n"
-            "\n"
-            "# Instruções:\n"
-            "- Responda de forma amigável e acolhedora à mensagem do usuário\n"
-            "- Se for uma saudação (oi, olá, hello, etc.), cumprimente de volta\n"
-            "- Se for uma pergunta geral, responda brevemente de forma educada\n"
-            "- SEMPRE apresente as funcionalidades disponíveis de forma atrativa\n"
-            "- Dê exemplos práticos de como usar cada funcionalidade\n"
-            "- Use emojis para tornar a resposta mais visual e amigável\n"
-            "- Seja conciso mas informativo\n"
-            "- Encoraje o usuário a experimentar as funcionalidades\n"
-            "- Na hora de apresentar exemplos, se limite a usar exemplos de tokens disponiveis nas redes ETH, Base e Polygon\n"
-            "- Não forneça conselhos financeiros em nenhuma situação\n"
-            "\n"
-            "# Exemplos de como apresentar as funcionalidades:\n"
-            "**Para cotações:** \"Quer saber quanto vale 1 BTC em USDC?\"\n"
-            "**Para swaps:** \"Precisa trocar ETH por USDT?\"\n"
-            "**Para transferências:** \"Quer enviar tokens para outro endereço?\"\n"
-            "\n"
-            "# Estrutura sugerida:\n"
-            "1. Responda à mensagem do usuário de forma apropriada\n"
-            "2. Apresente as funcionalidades disponíveis com exemplos\n"
-            "3. Convide o usuário a experimentar\n"
-            "\n"
-            "Responda de forma natural e conversacional!"
+            f"Mensagem do usuário: '{user_input}'"
         )
 
-        print(f"\n\n !!!!!! Prompt enviado ao Gemini (generate_helpful_response) para input: '{user_input}'\n\n")
-        
-        # Gemini API uses generate_content for streaming as well
-        response_stream = await self.model.generate_content_async(prompt, stream=True)
-        
-        async for chunk in response_stream:
-            if chunk.text: # Check if text is available in the chunk
-                yield chunk.text
+        logger.debug("Prompt enviado ao Gemini (generate_helpful_response): %s", contents)
+
+        async for chunk in self._stream("helpful_response", contents):
+            yield chunk
 
     async def generate_error_response(self, language="pt", error_context=None):
         """
         Gera uma resposta inteligente baseada no tipo de erro - seja de validação do usuário ou técnico do sistema
         """
-        prompt = (
-            f"Ocorreu um erro enquanto o usuário tentava usar a plataforma de operações blockchain. "
+        contents = (
             f"IMPORTANTE: Responda no idioma detectado: {language}.\n"
             "\n"
             "# Contexto do erro:\n"
-            f"- {error_context if error_context else 'Erro não especificado'}\n"
-            "\n"
-            "# Seu papel:\n"
-            "Você é um assistente especializado em operações blockchain. Analise o contexto do erro e responda adequadamente.\n"
-            "\n"
-            "# IMPORTANTE - Analise o tipo de erro:\n"
-            "\n"
-            "## Se for ERRO DE VALIDAÇÃO/ENTRADA DO USUÁRIO (endereços inválidos, formatos incorretos, saldos insuficientes, etc.):\n"
-            "- Seja educativo e didático\n"
-            "- Explique claramente qual foi o problema\n"
-            "- Ensine o formato correto esperado\n"
-            "- Dê exemplos práticos\n"
-            "- NÃO trate como erro do sistema\n"
-            "- Deixe claro que é algo que o usuário precisa corrigir\n"
-            "- Use emojis para tornar visual: ❌ para problema, 📋 para instruções, ✅ para exemplo correto\n"
-            "\n"
-            "## Se for ERRO DE CARTEIRA/INTERFACE (User rejected, Transaction failed, etc.):\n"
-            "- Seja empático e compreensivo\n"
-            "- Explique que o usuário cancelou ou rejeitou a operação\n"
-            "- Tranquilize que isso é normal e seguro\n"
-            "- Explique que podem tentar novamente quando quiserem\n"
-            "- NÃO trate como erro técnico\n"
-            "- Use emojis reconfortantes: 🔒 para segurança, 👤 para ação do usuário\n"
-            "\n"
-            "## Se for ERRO TÉCNICO/INTERNO DO SISTEMA:\n"
-            "- Seja empático e compreensivo\n"
-            "- Peça desculpas pelo inconveniente\n"
-            "- Explique que houve um problema técnico temporário\n"
-            "- Sugira tentar novamente em alguns minutos\n"
-            "- Assegure que está sendo resolvido\n"
-            "- Use tom reconfortante e profissional\n"
-            "\n"
-            "# Exemplos de resposta:\n"
-            "\n"
-            "**Para erro de validação de endereço:**\n"
-            "❌ O endereço fornecido não está no formato correto!\n"
-            "📋 Endereços de carteira devem ter exatamente 42 caracteres, começar com '0x' seguido por 40 caracteres hexadecimais.\n"
-            "✅ Exemplo: 0x1234567890123456789012345678901234567890\n"
-            "Por favor, verifique o endereço e tente novamente!\n"
-            "\n"
-            "**Para erro de carteira/usuário:**\n"
-            "🔒 Você cancelou a transação com segurança!\n"
-            "👤 Isso é completamente normal - você está no controle total das suas transações.\n"
-            "Quando estiver pronto, pode tentar novamente a qualquer momento.\n"
-            "\n"
-            "**Para erro técnico:**\n"
-            "🤖 Ops! Tivemos um probleminha técnico temporário...\n"
-            "Nossa equipe já está trabalhando na correção. Tente novamente em alguns minutinhos!\n"
-            "\n"
-            "# Instruções gerais:\n"
-            "- Use emojis moderadamente para tornar mais visual\n"
-            "- Seja claro e direto\n"
-            "- Mantenha tom amigável\n"
-            "- Termine sempre de forma positiva\n"
-            "- Se não conseguir identificar o tipo exato, use uma abordagem genérica educativa\n"
-            "\n"
-            "Analise o contexto do erro acima e responda de forma apropriada, seja educativa para erros de validação ou reconfortante para erros técnicos!"
+            f"- {error_context if error_context else 'Erro não especificado'}"
         )
 
-        print(f"\n\n !!!!!! Prompt enviado ao Gemini (generate_error_response) para idioma: '{language}'\n\n")
-        
-        # Gemini API uses generate_content for streaming as well
-        response_stream = await self.model.generate_content_async(prompt, stream=True)
-        
-        async for chunk in response_stream:
-            if chunk.text: # Check if text is available in the chunk
-                yield chunk.text
+        logger.debug("Prompt enviado ao Gemini (generate_error_response): %s", contents)
+
+        async for chunk in self._stream("error_response", contents):
+            yield chunk
 
     async def generate_success_message(self, transaction_hash, transaction_type="transaction", language="pt"):
         """
         Gera uma mensagem de sucesso amigável e educativa para transações bem-sucedidas
         """
-        prompt = (
-            f"Uma transação blockchain foi executada com SUCESSO! "
+        contents = (
             f"IMPORTANTE: Responda no idioma detectado: {language}.\n"
             "\n"
             "# Dados da transação:\n"
             f"- Hash da transação: {transaction_hash}\n"
-            f"- Tipo de operação: {transaction_type}\n"
-            "\n"
-            "# Seu papel:\n"
-            "Você é um assistente especializado em operações blockchain. Precisa parabenizar o usuário pelo sucesso de forma simples e clara.\n"
-            "\n"
-            "# Instruções OBRIGATÓRIAS:\n"
-            "- Seja entusiasmado e positivo\n"
-            "- Parabenize o sucesso da operação de forma genérica\n"
-            "- SEMPRE mostre o hash COMPLETO da transação (não resumido)\n"
-            "- Explique de forma simples o que é o hash\n"
-            "- Informe que a transação está sendo processada E que tudo ocorreu bem\n"
-            "- SEMPRE mencione que demora alguns minutos (1-5 min) e que é normal\n"
-            "- Tranquilize o usuário que o processo foi bem-sucedido\n"
-            "- Use emojis moderadamente: 🎉 ✅ 🔗 ⏳ 🕐\n"
-            "- Mantenha linguagem simples e acessível\n"
-            "- NÃO mencione protocolos específicos (SushiSwap, Uniswap, etc.)\n"
-            "- NÃO use termos técnicos como DeFi, DEX, etc.\n"
-            "- Foque na ação do usuário (transferência, troca, etc.)\n"
-            "- Seja conciso mas informativo\n"
-            "\n"
-            "# O que NÃO fazer:\n"
-            "- NÃO mencionar SushiSwap, Uniswap ou outros protocolos\n"
-            "- NÃO resumir o hash da transação\n"
-            "- NÃO usar jargões técnicos desnecessários\n"
-            "- NÃO fazer a mensagem muito longa\n"
-            "\n"
-            "# Elementos que DEVE incluir:\n"
-            "- Parabéns simples e diretos\n"
-            "- Hash COMPLETO da transação\n"
-            "- Explicação básica do hash\n"
-            "- Status de processamento com tempo estimado (1-5 minutos)\n"
-            "- Tranquilização que tudo ocorreu bem\n"
-            "- Explicação que a demora é normal\n"
-            "- Mensagem positiva de encerramento\n"
-            "\n"
-            "# Exemplo de estrutura (adapte ao idioma):\n"
-            "🎉 **Parabéns! Sua transação foi enviada com sucesso!** ✅\n"
-            "\n"
-            "🔗 **Hash da transação:**\n"
-            "`{transaction_hash}`\n"
-            "\n"
-            "💡 Este código é o comprovante único da sua operação na blockchain!\n"
-            "\n"
-            "⏳ **Status:** Sua transação foi enviada com sucesso e está sendo processada pela rede blockchain.\n"
-            "🕐 **Tempo estimado:** Aguarde de 1 a 5 minutos para confirmação final - isso é completamente normal!\n"
-            "✅ **Tudo ocorreu perfeitamente** - agora é só aguardar a rede confirmar sua operação.\n"
-            "\n"
-            "Responda de forma celebrativa mas concisa!"
+            f"- Tipo de operação: {transaction_type}"
         )
-        
-        # Gemini API uses generate_content for streaming as well
-        response_stream = await self.model.generate_content_async(prompt, stream=True)
-        
-        async for chunk in response_stream:
-            if chunk.text: # Check if text is available in the chunk
-                yield chunk.text
+
+        async for chunk in self._stream("success_message", contents):
+            yield chunk
@@ -0,0 +1,84 @@
+"""
+Registro de clientes HTTP compartilhados por todos os serviços.
+Mantém conexões keep-alive (HTTP/2 quando disponível) com limites por host,
+evitando um novo handshake TCP+TLS a cada chamada externa.
+"""
+
+import importlib.util
+import os
+import httpx
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# O httpx só precisa do pacote h2 instalado para negociar HTTP/2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Upstreams HTTP conhecidos; cada um recebe um pool de conexões próprio,
+# o que na prática funciona como limite de conexões por host
+UPSTREAMS = ("lifi", "moralis", "coingecko")
+
+
+class HttpClientRegistry:
+    def __init__(self):
+        self.max_connections_per_host = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+        self.max_keepalive_connections = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+        self.dns_cache_ttl = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+        self._clients = {}
+        self._session = None
+
+    def client(self, name) -> httpx.AsyncClient:
+        """Retorna o cliente httpx do upstream, criando-o na primeira chamada"""
+        if name not in UPSTREAMS:
+            raise ValueError(f"Upstream HTTP desconhecido: {name}")
+
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            # verify=False mantém o comportamento anterior (problemas de certificado)
+            # Em produção, considere usar: verify="/path/to/certificate"
+            client = httpx.AsyncClient(
+                verify=False,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+            )
+            self._clients[name] = client
+        return client
+
+    def session(self) -> aiohttp.ClientSession:
+        """Retorna a sessão aiohttp usada nas chamadas JSON-RPC"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_expiry,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_ttl,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def start(self):
+        """Abre os pools antecipadamente (chamado no lifespan da aplicação)"""
+        for name in UPSTREAMS:
+            self.client(name)
+        self.session()
+
+    async def close(self):
+        """Fecha todas as conexões abertas (chamado no shutdown da aplicação)"""
+        for client in self._clients.values():
+            if not client.is_closed:
+                await client.aclose()
+        self._clients = {}
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Instância global do registro
+http_clients = HttpClientRegistry()
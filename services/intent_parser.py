@@ -0,0 +1,208 @@
+"""
+Extrator determinístico de intenção para prompts bem formados.
+Reconhece frases regulares de cotação, swap e transferência em pt/en/es
+(ex.: "swap 10 USDC for ETH") sem precisar de uma chamada ao Gemini.
+Quando a confiança é baixa, o RouterAgent recorre ao Gemini normalmente.
+"""
+
+import os
+import re
+from dotenv import load_dotenv
+from services.token_normalizer import TokenNormalizer
+from services.lifi_service import token_registry
+
+load_dotenv()
+
+# Quantidade: "10", "1.5", "1,5", "1.000,50", "1,000.50", ".5"
+_AMOUNT = r"(?P<amount>\d[\d.,]*|[.,]\d+)"
+# Token: até três palavras (ex.: "USDC", "usd coin", "wrapped bitcoin")
+_FROM = r"(?P<from_token>[\w$.-]+(?:\s+[\w$.-]+){0,2}?)"
+_TO = r"(?P<to_token>[\w$.-]+(?:\s+[\w$.-]+){0,2}?)"
+_TOKEN = r"(?P<token>[\w$.-]+(?:\s+[\w$.-]+){0,2}?)"
+_ADDRESS = r"(?P<address>0x[0-9a-fA-F]{40})"
+_END = r"\s*[.!?]*$"
+
+# (intent, idioma, regex) — a ordem importa: o primeiro padrão que casar vence
+_PATTERNS = [
+    # Swap
+    ("swap", "en", rf"^(?:i want to |i'd like to |i would like to |please |can you )?(?:swap|exchange|convert|trade)\s+{_AMOUNT}\s+{_FROM}\s+(?:for|to|into)\s+{_TO}{_END}"),
+    ("swap", "pt", rf"^(?:eu )?(?:quero |gostaria de |desejo |preciso )?(?:trocar|converter|fazer (?:um )?swap de|swap de|swap)\s+{_AMOUNT}\s+{_FROM}\s+(?:por|para|em)\s+{_TO}{_END}"),
+    ("swap", "es", rf"^(?:yo )?(?:quiero |me gustar[ií]a |deseo |necesito )?(?:cambiar|intercambiar|hacer (?:un )?swap de)\s+{_AMOUNT}\s+{_FROM}\s+(?:por|a|en)\s+{_TO}{_END}"),
+    # Cotação
+    ("cotacao", "en", rf"^(?:what is |what's )?(?:the )?(?:quote|price|value)\s+(?:for|of)\s+{_AMOUNT}\s+{_FROM}\s+(?:in|to|for)\s+{_TO}{_END}"),
+    ("cotacao", "en", rf"^how much (?:is|are)\s+{_AMOUNT}\s+{_FROM}\s+(?:worth )?in\s+{_TO}{_END}"),
+    ("cotacao", "en", rf"^(?:quote|price)\s+{_AMOUNT}\s+{_FROM}\s+(?:in|to|for)\s+{_TO}{_END}"),
+    ("cotacao", "pt", rf"^(?:quanto (?:vale|valem|d[aá]|custa|custam)|(?:qual (?:[eé] )?a )?cota[çc][ãa]o (?:de|para))\s+{_AMOUNT}\s+{_FROM}\s+(?:em|para)\s+{_TO}{_END}"),
+    ("cotacao", "es", rf"^(?:cu[aá]nto (?:vale|valen|cuesta|cuestan)|(?:cu[aá]l es la )?cotizaci[oó]n (?:de|para))\s+{_AMOUNT}\s+{_FROM}\s+(?:en|a)\s+{_TO}{_END}"),
+    # Transferência
+    ("transferencia", "en", rf"^(?:i want to |i'd like to |i would like to |please |can you )?(?:transfer|send)\s+{_AMOUNT}\s+{_TOKEN}\s+to\s+(?:the )?(?:address |wallet )?{_ADDRESS}{_END}"),
+    ("transferencia", "pt", rf"^(?:eu )?(?:quero |gostaria de |desejo |preciso )?(?:transferir|enviar|mandar)\s+{_AMOUNT}\s+{_TOKEN}\s+(?:para|pra)\s+(?:o |a )?(?:endere[çc]o |carteira )?{_ADDRESS}{_END}"),
+    ("transferencia", "es", rf"^(?:yo )?(?:quiero |me gustar[ií]a |deseo |necesito )?(?:transferir|enviar|mandar)\s+{_AMOUNT}\s+{_TOKEN}\s+a\s+(?:la )?(?:direcci[oó]n |billetera |cartera )?{_ADDRESS}{_END}"),
+]
+
+_COMPILED_PATTERNS = [(intent, language, re.compile(pattern, re.IGNORECASE)) for intent, language, pattern in _PATTERNS]
+
+
+def normalize_amount(raw, language):
+    """
+    Converte a quantidade digitada para o formato decimal com ponto.
+
+    Returns:
+        tuple: (quantidade normalizada ou None, se o formato é ambíguo)
+    """
+    raw = raw.strip().rstrip(".,")
+    if not raw:
+        return None, False
+
+    if "," in raw and "." in raw:
+        # O último separador é o decimal
+        if raw.rfind(",") > raw.rfind("."):
+            raw = raw.replace(".", "").replace(",", ".")
+        else:
+            raw = raw.replace(",", "")
+    elif "," in raw:
+        parts = raw.split(",")
+        if len(parts) == 2 and len(parts[1]) != 3:
+            raw = raw.replace(",", ".")
+        elif len(parts) > 2 or language == "en":
+            raw = raw.replace(",", "")
+        else:
+            # "1,000": milhar em inglês, decimal em pt/es — ambíguo
+            return raw.replace(",", "."), True
+    elif raw.count(".") > 1:
+        raw = raw.replace(".", "")
+    elif "." in raw and language != "en" and len(raw.split(".")[1]) == 3:
+        # "1.000": milhar em pt/es, decimal em inglês — ambíguo
+        return raw, True
+
+    try:
+        value = float(raw)
+    except ValueError:
+        return None, False
+    if value <= 0:
+        return None, False
+    return raw, False
+
+
+class IntentParser:
+    def __init__(self, registry=None, min_confidence=None):
+        self.registry = registry or token_registry
+        self.min_confidence = min_confidence if min_confidence is not None else float(
+            os.getenv("INTENT_FAST_PATH_MIN_CONFIDENCE", "0.9")
+        )
+        self.enabled = os.getenv("INTENT_FAST_PATH", "true").lower() == "true"
+        # Métricas
+        self.attempts = 0
+        self.hits = 0
+        self.low_confidence = 0
+        self.no_match = 0
+        self.llm_latency_ewma = None
+        self.saved_seconds = 0.0
+
+    def _resolve_token(self, raw_token, chain):
+        """
+        Normaliza o token (TokenNormalizer) e confere se existe na rede.
+
+        Returns:
+            tuple: (símbolo normalizado, se foi encontrado no token_registry)
+        """
+        symbol = TokenNormalizer.normalize_token(raw_token)
+        record = self.registry.resolve(chain, symbol) or self.registry.resolve(chain, raw_token)
+        if record is None:
+            return symbol, False
+        return record.symbol, True
+
+    def parse(self, user_input, chain):
+        """
+        Tenta extrair a intenção do texto sem usar o LLM.
+
+        Returns:
+            tuple: (dados extraídos no mesmo formato do Gemini ou None, confiança de 0 a 1)
+        """
+        text = " ".join(user_input.split())
+        for intent, language, pattern in _COMPILED_PATTERNS:
+            match = pattern.match(text)
+            if not match:
+                continue
+
+            groups = match.groupdict()
+            amount, ambiguous = normalize_amount(groups["amount"], language)
+            if amount is None:
+                return None, 0.0
+
+            confidence = 1.0
+            if ambiguous:
+                confidence -= 0.5
+
+            if intent == "transferencia":
+                token, found = self._resolve_token(groups["token"], chain)
+                if not found:
+                    confidence -= 0.5
+                return {
+                    "intent": intent,
+                    "token": token,
+                    "amount": amount,
+                    "toAddress": groups["address"],
+                    "language": language,
+                }, confidence
+
+            from_token, from_found = self._resolve_token(groups["from_token"], chain)
+            to_token, to_found = self._resolve_token(groups["to_token"], chain)
+            if not from_found or not to_found:
+                confidence -= 0.5
+            if from_token == to_token:
+                confidence -= 0.5
+            return {
+                "intent": intent,
+                "fromToken": from_token,
+                "toToken": to_token,
+                "fromAmount": amount,
+                "language": language,
+            }, confidence
+
+        return None, 0.0
+
+    def try_parse(self, user_input, chain):
+        """
+        Retorna os dados extraídos quando a confiança atinge o mínimo
+        configurado, ou None para indicar que o Gemini deve ser usado
+        """
+        if not self.enabled or not user_input:
+            return None
+
+        self.attempts += 1
+        result, confidence = self.parse(user_input, chain)
+        if result is None:
+            self.no_match += 1
+            return None
+        if confidence < self.min_confidence:
+            self.low_confidence += 1
+            return None
+
+        self.hits += 1
+        if self.llm_latency_ewma is not None:
+            self.saved_seconds += self.llm_latency_ewma
+        return result
+
+    def record_llm_latency(self, seconds, alpha=0.2):
+        """Registra a latência de uma classificação feita pelo Gemini (média móvel)"""
+        if self.llm_latency_ewma is None:
+            self.llm_latency_ewma = seconds
+        else:
+            self.llm_latency_ewma = alpha * seconds + (1 - alpha) * self.llm_latency_ewma
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "low_confidence": self.low_confidence,
+            "no_match": self.no_match,
+            "hit_rate": round(self.hits / self.attempts, 4) if self.attempts else 0.0,
+            "llm_latency_ewma_ms": round(self.llm_latency_ewma * 1000, 1) if self.llm_latency_ewma is not None else None,
+            "estimated_saved_ms": round(self.saved_seconds * 1000, 1),
+        }
+
+
+# Instância global do parser
+intent_parser = IntentParser()
@@ -1,7 +1,13 @@
+import logging
+import os
 import httpx
+from services.cache import AsyncTTLCache
+from services.http_client import http_clients
+from services.deadline import admitted, upstream_call
+from services.admission import UpstreamOverloaded
+from services.token_registry import TokenRegistry, ChainTokens
 
-# Dicionário global para armazenar os tokens de cada rede após integração com LI.FI
-TOKEN_INFO = {}
+logger = logging.getLogger(__name__)
 
 # Mapeamento de chain names para chain IDs
 CHAIN_ID_MAPPING = {
@@ -10,116 +16,119 @@ CHAIN_ID_MAPPING = {
     "POL": "0x89"      # Polygon
 }
 
-import asyncio
+# Redes suportadas (pré-carregadas no startup)
+SUPPORTED_CHAINS = list(CHAIN_ID_MAPPING.keys())
 
-async def fetch_and_store_tokens(chain_name):
+# URL base da API da LI.FI (configurável para apontar para um ambiente local)
+LIFI_BASE_URL = os.getenv("LIFI_BASE_URL", "https://li.quest/v1").rstrip("/")
+
+
+async def download_tokens(chain_name):
+    """
+    Baixa a lista de tokens da rede na LI.FI e retorna um ChainTokens
+    indexado por símbolo, endereço do contrato e nome
+    """
     try:
-        # Validação do parâmetro de entrada
-        if not chain_name or not isinstance(chain_name, str):
-            print(f"Erro: chain_name inválido: {chain_name}")
-            return {"error": "chain_name deve ser uma string válida"}
+        url = f"{LIFI_BASE_URL}/tokens?chains={chain_name}"
         
-        chain_name_upper = chain_name.upper()
-        url = f"https://li.quest/v1/tokens?chains={chain_name}"
+        logger.info("Baixando lista de tokens da LI.FI", extra={"chain": chain_name})
         
-        print(f"Fazendo requisição para: {url}")
+        client = http_clients.client("lifi")
+        async with admitted("lifi"), upstream_call("lifi_tokens") as timeout:
+            response = await client.get(url, timeout=timeout)
         
-        # verify=False desabilita a verificação SSL para resolver problemas de certificado
-        # Em produção, considere usar: verify="/path/to/certificate" ou configurar o sistema
-        async with httpx.AsyncClient(verify=False) as client:
-            response = await client.get(url)
-            
-            # Verificar status da resposta
-            if response.status_code != 200:
-                print(f"Erro na API: Status {response.status_code}")
-                return {"error": f"Erro na API LI.FI: Status {response.status_code}"}
-            
-            data = response.json()
-            
-            if not data:
-                print("Resposta vazia da API")
-                return {"error": "Resposta vazia da API LI.FI"}
-            
-            tokens_by_chain = data.get("tokens", {})
-            
-            if not tokens_by_chain:
-                print(f"Nenhum token encontrado para a chain: {chain_name}")
-                return {"error": f"Nenhum token encontrado para a chain: {chain_name}"}
-            
-            # tokens_by_chain é um dict: {chainId: [tokens]}
-            # Vamos armazenar por symbol para facilitar o acesso
-            # Agora vamos lidar com tokens duplicados, mantendo o de maior valor
-            tokens_dict = {}
-            for chain_id, tokens in tokens_by_chain.items():
-                # Primeiro, agrupamos todos os tokens pelo símbolo
-                tokens_by_symbol = {}
-                for token in tokens:
-                    symbol = token.get("symbol", "").upper()
-                    if symbol:
-                        if symbol not in tokens_by_symbol:
-                            tokens_by_symbol[symbol] = []
-                        tokens_by_symbol[symbol].append(token)
-                
-                # Agora, para cada símbolo, selecionamos o token com maior valor
-                for symbol, token_list in tokens_by_symbol.items():
-                    # Se houver mais de um token com o mesmo símbolo, mostramos um log
-                    #if len(token_list) > 1:
-                        #print(f"Encontrados {len(token_list)} tokens com o símbolo {symbol}:")
-                        #for t in token_list:
-                            #print(f"  - {t.get('name')}: {t.get('priceUSD') or 0} USD (address: {t.get('address')})")
-                    
-                    # Ordenamos por priceUSD (do maior para o menor)
-                    # Tratamos None como 0 para evitar erros de comparação
-                    sorted_tokens = sorted(token_list, key=lambda t: float(t.get("priceUSD", 0) or 0), reverse=True)
-                    # Pegamos o primeiro (maior valor)
-                    best_token = sorted_tokens[0]
-            
-                    
-                    tokens_dict[symbol] = {
-                        "address": best_token.get("address"),
-                        "decimals": best_token.get("decimals"),
-                        "name": best_token.get("name"),
-                        "priceUSD": best_token.get("priceUSD"),
-                        "logoURI": best_token.get("logoURI"),
-                        "chainId": best_token.get("chainId"),
-                    }
-            
-            TOKEN_INFO[chain_name_upper] = tokens_dict
-            print(f"Tokens armazenados com sucesso para {chain_name_upper}: {len(tokens_dict)} tokens")
-            return {"success": True, "tokens_count": len(tokens_dict)}
-            
+        # Verificar status da resposta
+        if response.status_code != 200:
+            logger.error("Erro na API LI.FI: Status %s", response.status_code)
+            return {"error": f"Erro na API LI.FI: Status {response.status_code}"}
+        
+        data = response.json()
+        
+        if not data:
+            logger.error("Resposta vazia da API LI.FI")
+            return {"error": "Resposta vazia da API LI.FI"}
+        
+        tokens_by_chain = data.get("tokens", {})
+        
+        if not tokens_by_chain:
+            logger.error("Nenhum token encontrado para a chain: %s", chain_name)
+            return {"error": f"Nenhum token encontrado para a chain: {chain_name}"}
+        
+        # tokens_by_chain é um dict: {chainId: [tokens]}
+        # Os índices (símbolo, endereço e nome) são montados em uma única passada,
+        # mantendo o token de maior valor quando há símbolos duplicados
+        chain_tokens = ChainTokens.from_lifi(
+            token for tokens in tokens_by_chain.values() for token in tokens
+        )
+        
+        logger.info("Tokens baixados com sucesso para %s: %d tokens", chain_name.upper(), len(chain_tokens))
+        return chain_tokens
+        
+    except UpstreamOverloaded:
+        raise
     except Exception as e:
-        print(f"Erro ao processar resposta da API LI.FI: {e}")
+        logger.error("Erro ao processar resposta da API LI.FI: %s", e)
         return {"error": f"Erro ao processar resposta da API LI.FI: {str(e)}"}
 
 
+# Registro global de tokens por rede, com TTL e revalidação em segundo plano
+token_registry = TokenRegistry(download_tokens)
+
+
+async def fetch_and_store_tokens(chain_name):
+    """
+    Garante que os tokens da rede estão carregados no token_registry.
+    Só baixa a lista novamente quando o TTL expira.
+    """
+    return await token_registry.ensure(chain_name)
+
+
+# Cache de gas price por rede: o valor só muda a cada bloco, então chamadas
+# próximas (validação de saldo + criação da transação) reaproveitam a mesma leitura
+gas_price_cache = AsyncTTLCache(
+    "gas_price",
+    ttl=float(os.getenv("GAS_PRICE_TTL", "12")),
+    stale_ttl=float(os.getenv("GAS_PRICE_STALE_TTL", "30")),
+)
+
+
 async def get_gas_price(chain_name):
     """
-    Busca o gas price atual da rede usando a API do LI.FI
+    Busca o gas price atual da rede usando a API do LI.FI.
+    O resultado fica em cache por GAS_PRICE_TTL segundos; depois disso o valor
+    anterior ainda é servido (até GAS_PRICE_STALE_TTL) enquanto é atualizado.
     """
     chain_id = CHAIN_ID_MAPPING.get(chain_name.upper())
     if not chain_id:
         return {"error": f"Chain {chain_name} não suportada para gas price"}
     
-    url = f"https://li.quest/v1/gas/prices/{chain_id}"
+    return await gas_price_cache.get(chain_id, lambda: fetch_gas_price(chain_id))
+
+
+async def fetch_gas_price(chain_id):
+    """
+    Consulta o gas price na API do LI.FI, sem cache
+    """
+    url = f"{LIFI_BASE_URL}/gas/prices/{chain_id}"
     
     try:
-        async with httpx.AsyncClient(verify=False) as client:
-            response = await client.get(url)
-            
-            if response.status_code != 200:
-                return {"error": f"Erro ao buscar gas price (Status: {response.status_code})"}
-            
-            gas_data = response.json()
+        client = http_clients.client("lifi")
+        async with admitted("lifi"), upstream_call("lifi_gas") as timeout:
+            response = await client.get(url, timeout=timeout)
+        
+        if response.status_code != 200:
+            return {"error": f"Erro ao buscar gas price (Status: {response.status_code})"}
+        
+        gas_data = response.json()
+        
+        # A API retorna o gas price diretamente como número
+        if "standard" in gas_data:
+            # Converte para hexadecimal
+            gas_price_hex = hex(gas_data["standard"])
+            return {"gasPrice": gas_price_hex}
+        else:
+            return {"error": "Dados de gas price não encontrados na resposta"}
             
-            # A API retorna o gas price diretamente como número
-            if "standard" in gas_data:
-                # Converte para hexadecimal
-                gas_price_hex = hex(gas_data["standard"])
-                return {"gasPrice": gas_price_hex}
-            else:
-                return {"error": "Dados de gas price não encontrados na resposta"}
-                
     except Exception as e:
         return {"error": f"Erro ao buscar gas price: {str(e)}"}
 
@@ -160,25 +169,53 @@ def convert_quote_to_human_readable(quote, from_token_decimals, to_token_decimal
 
     return quote
 
+# Slippage usado nas cotações de swap
+SWAP_SLIPPAGE = "0.01"
+
+# Cache curto de cotações (intent cotacao). Cópias profundas são devolvidas
+# porque os agentes convertem os valores da cotação in-place
+quote_cache = AsyncTTLCache(
+    "lifi_quote",
+    ttl=float(os.getenv("QUOTE_CACHE_TTL", "5")),
+    copy_values=True,
+)
+
+# Cache opcional de cotações de swap. Nunca serve valores vencidos: o
+# transactionRequest só é reaproveitado dentro do TTL (limitado a 15s)
+swap_quote_cache = AsyncTTLCache(
+    "lifi_swap_quote",
+    ttl=min(float(os.getenv("SWAP_QUOTE_CACHE_TTL", "3")), 15.0),
+    stale_ttl=0,
+    copy_values=True,
+)
+
+
 class LifiService:
+    def __init__(self, clients=None):
+        # Registro de clientes HTTP compartilhado (injetável para testes/benchmarks)
+        self.http_clients = clients or http_clients
+        self.quote_cache = quote_cache
+        self.swap_quote_cache = swap_quote_cache
+        self.swap_quote_cache_enabled = os.getenv("SWAP_QUOTE_CACHE", "false").lower() == "true"
+
     async def get_quote(self, user_request, extracted_data):
         chain = user_request.chain.upper()
         # Usa os dados extraídos pelo ChatGPT
         from_token = extracted_data.get("fromToken", "").upper()
         to_token = extracted_data.get("toToken", "").upper()
         amount = extracted_data.get("fromAmount", "")
-        print(f"Extraído: from_token={from_token}, to_token={to_token}, amount={amount}")
+        logger.debug("Extraído: from_token=%s, to_token=%s, amount=%s", from_token, to_token, amount)
 
-        # Obter info dos tokens
-        from_token_info = TOKEN_INFO.get(chain, {}).get(from_token)
-        to_token_info = TOKEN_INFO.get(chain, {}).get(to_token)
+        # Obter info dos tokens (por símbolo, endereço do contrato ou nome)
+        from_token_info = token_registry.resolve(chain, from_token)
+        to_token_info = token_registry.resolve(chain, to_token)
         if not from_token_info or not to_token_info:
             return {"error": "Token ou chain não suportado."}
 
-        from_token_address = from_token_info["address"]
-        to_token_address = to_token_info["address"]
-        from_token_decimals = from_token_info["decimals"]
-        to_token_decimals = to_token_info["decimals"]
+        from_token_address = from_token_info.address
+        to_token_address = to_token_info.address
+        from_token_decimals = from_token_info.decimals
+        to_token_decimals = to_token_info.decimals
 
         try:
             from_amount = str(int(float(amount) * (10 ** from_token_decimals)))
@@ -186,42 +223,55 @@ class LifiService:
             return {"error": "Valor de quantidade inválido."}
 
         url = (
-            f"https://li.quest/v1/quote?fromChain={chain}"
+            f"{LIFI_BASE_URL}/quote?fromChain={chain}"
             f"&toChain={chain}"
             f"&fromToken={from_token_address}"
             f"&toToken={to_token_address}"
             f"&fromAddress={user_request.walletAddress}"
             f"&fromAmount={from_amount}"
         )
-        print(" \n ### URL da LI.FI:", url)
+        logger.debug("URL da LI.FI: %s", url)
         
-        try:
-            async with httpx.AsyncClient(verify=False) as client:
-                response = await client.get(url)
-                
+        async def fetch_quote():
+            try:
+                client = self.http_clients.client("lifi")
+                async with admitted("lifi"), upstream_call("lifi_quote") as timeout:
+                    response = await client.get(url, timeout=timeout)
+            
                 # Verifica se a requisição foi bem-sucedida
                 if response.status_code != 200:
-                    print(f" DEBUG: Erro na API LI.FI - Status: {response.status_code}")
+                    logger.warning("Erro na API LI.FI - Status: %s", response.status_code)
                     return {"error": f"Erro na API LI.FI (Status: {response.status_code})"}
-                
+            
                 quote = response.json()
-                
+            
                 # Verifica se a resposta contém erro
                 if "error" in quote:
-                    print(f"🔍 DEBUG: Erro na resposta LI.FI: {quote['error']}")
+                    logger.warning("Erro na resposta LI.FI: %s", quote["error"])
                     return {"error": f"Erro na cotação: {quote['error']}"}
-                
-                quote['fromToken'] = from_token
-                quote['toToken'] = to_token
-                
+            
+                quote['fromToken'] = from_token_info.symbol
+                quote['toToken'] = to_token_info.symbol
+            
                 return quote
-                
-        except httpx.RequestError as e:
-            print(f"🔍 DEBUG: Erro de conexão com LI.FI: {e}")
-            return {"error": "Erro de conexão com o serviço de cotação. Tente novamente."}
-        except Exception as e:
-            print(f"🔍 DEBUG: Erro inesperado na cotação: {e}")
-            return {"error": "Erro inesperado na cotação. Tente novamente."}
+            
+            except UpstreamOverloaded:
+                # Descarte por sobrecarga não é timeout: o RouterAgent avisa o usuário
+                raise
+            except TimeoutError as e:
+                logger.warning("Tempo esgotado na LI.FI: %s", e)
+                return {"error": "Tempo esgotado ao consultar o serviço de cotação. Tente novamente."}
+            except httpx.RequestError as e:
+                logger.warning("Erro de conexão com LI.FI: %s", e)
+                return {"error": "Erro de conexão com o serviço de cotação. Tente novamente."}
+            except Exception:
+                logger.exception("Erro inesperado na cotação")
+                return {"error": "Erro inesperado na cotação. Tente novamente."}
+
+        # Cotações idênticas (mesmos tokens, valor e slippage) dentro do TTL, ou
+        # já em andamento, compartilham a mesma chamada à LI.FI
+        cache_key = (chain, from_token_address.lower(), to_token_address.lower(), from_amount, None)
+        return await self.quote_cache.get(cache_key, fetch_quote)
         
     async def get_swap_quote(self, user_request, extracted_data):
         """
@@ -233,18 +283,18 @@ class LifiService:
         from_token = extracted_data.get("fromToken", "").upper()
         to_token = extracted_data.get("toToken", "").upper()
         amount = extracted_data.get("fromAmount", "")
-        print(f"Swap - Extraído: from_token={from_token}, to_token={to_token}, amount={amount}")
+        logger.debug("Swap - Extraído: from_token=%s, to_token=%s, amount=%s", from_token, to_token, amount)
 
-        # Obter info dos tokens
-        from_token_info = TOKEN_INFO.get(chain, {}).get(from_token)
-        to_token_info = TOKEN_INFO.get(chain, {}).get(to_token)
+        # Obter info dos tokens (por símbolo, endereço do contrato ou nome)
+        from_token_info = token_registry.resolve(chain, from_token)
+        to_token_info = token_registry.resolve(chain, to_token)
         if not from_token_info or not to_token_info:
             return {"error": "Token ou chain não suportado."}
 
-        from_token_address = from_token_info["address"]
-        to_token_address = to_token_info["address"]
-        from_token_decimals = from_token_info["decimals"]
-        to_token_decimals = to_token_info["decimals"]
+        from_token_address = from_token_info.address
+        to_token_address = to_token_info.address
+        from_token_decimals = from_token_info.decimals
+        to_token_decimals = to_token_info.decimals
 
         try:
             from_amount = str(int(float(amount) * (10 ** from_token_decimals)))
@@ -252,42 +302,60 @@ class LifiService:
             return {"error": "Valor de quantidade inválido."}
 
         url = (
-            f"https://li.quest/v1/quote?fromChain={chain}"
+            f"{LIFI_BASE_URL}/quote?fromChain={chain}"
             f"&toChain={chain}"
             f"&fromToken={from_token_address}"
             f"&toToken={to_token_address}"
             f"&fromAddress={user_request.walletAddress}"
             f"&fromAmount={from_amount}"
-            f"&slippage=0.01"
+            f"&slippage={SWAP_SLIPPAGE}"
         )
-        print(" \n ### URL da LI.FI (Swap):", url)
+        logger.debug("URL da LI.FI (Swap): %s", url)
         
-        try:
-            async with httpx.AsyncClient(verify=False) as client:
-                response = await client.get(url)
-                
+        async def fetch_swap_quote():
+            try:
+                client = self.http_clients.client("lifi")
+                async with admitted("lifi"), upstream_call("lifi_quote") as timeout:
+                    response = await client.get(url, timeout=timeout)
+            
                 # Verifica se a requisição foi bem-sucedida
                 if response.status_code != 200:
-                    print(f"🔍 DEBUG: Erro na API LI.FI (Swap) - Status: {response.status_code}")
+                    logger.warning("Erro na API LI.FI (Swap) - Status: %s", response.status_code)
                     return {"error": f"Erro na API LI.FI (Status: {response.status_code})"}
-                
+            
                 swap_quote = response.json()
-                
+            
                 # Verifica se a resposta contém erro
                 if "error" in swap_quote:
-                    print(f"🔍 DEBUG: Erro na resposta LI.FI (Swap): {swap_quote['error']}")
+                    logger.warning("Erro na resposta LI.FI (Swap): %s", swap_quote["error"])
                     return {"error": f"Erro na cotação de swap: {swap_quote['error']}"}
-                
+            
                 # Adicionar informações de token para o frontend
-                swap_quote['fromToken'] = from_token
-                swap_quote['toToken'] = to_token
-                
+                swap_quote['fromToken'] = from_token_info.symbol
+                swap_quote['toToken'] = to_token_info.symbol
+            
                 # Retornar dados completos para o swap, incluindo transactionRequest
                 return swap_quote
-                
-        except httpx.RequestError as e:
-            print(f"🔍 DEBUG: Erro de conexão com LI.FI (Swap): {e}")
-            return {"error": "Erro de conexão com o serviço de cotação. Tente novamente."}
-        except Exception as e:
-            print(f"🔍 DEBUG: Erro inesperado na cotação de swap: {e}")
-            return {"error": "Erro inesperado na cotação de swap. Tente novamente."}
\ No newline at end of file
+            
+            except UpstreamOverloaded:
+                raise
+            except TimeoutError as e:
+                logger.warning("Tempo esgotado na LI.FI (Swap): %s", e)
+                return {"error": "Tempo esgotado ao consultar o serviço de cotação. Tente novamente."}
+            except httpx.RequestError as e:
+                logger.warning("Erro de conexão com LI.FI (Swap): %s", e)
+                return {"error": "Erro de conexão com o serviço de cotação. Tente novamente."}
+            except Exception:
+                logger.exception("Erro inesperado na cotação de swap")
+                return {"error": "Erro inesperado na cotação de swap. Tente novamente."}
+
+        if not self.swap_quote_cache_enabled:
+            return await fetch_swap_quote()
+
+        # O transactionRequest é específico da carteira: a chave inclui o endereço
+        # e o cache não serve valores vencidos (stale_ttl=0)
+        cache_key = (
+            chain, from_token_address.lower(), to_token_address.lower(), from_amount, SWAP_SLIPPAGE,
+            user_request.walletAddress.lower()
+        )
+        return await self.swap_quote_cache.get(cache_key, fetch_swap_quote)
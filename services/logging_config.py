@@ -0,0 +1,144 @@
+"""
+Configuração de logs da aplicação.
+
+- Saída estruturada (JSON por linha) ou texto, via LOG_FORMAT
+- Nível global (LOG_LEVEL) e por módulo (LOG_LEVELS="services.gemini_service=DEBUG,main=WARNING")
+- ID da requisição em todos os registros feitos durante ela (ContextVar)
+- Eventos muito frequentes (ex.: cada chunk do stream) registrados por amostragem
+- Escrita fora do event loop: os handlers só colocam o registro em uma fila,
+  e uma thread (QueueListener) formata e escreve no stdout
+"""
+
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Fração dos eventos amostrados (por chunk) que é registrada quando DEBUG está ativo
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+# Atributos padrão do LogRecord; o resto veio de extra={...} e vai para o JSON
+_RESERVED_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+_request_id = ContextVar("request_id", default=None)
+_listener = None
+
+
+def new_request_id(value=None):
+    """Define o ID da requisição atual (o recebido no header ou um novo)"""
+    request_id = (value or uuid.uuid4().hex[:16])[:64]
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Anexa o ID da requisição ao registro (na thread/contexto de quem registrou)"""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s%(request_tag)s: %(message)s%(fields)s")
+
+    def format(self, record):
+        request_id = getattr(record, "request_id", None)
+        record.request_tag = f" [{request_id}]" if request_id else ""
+        fields = {
+            key: value for key, value in record.__dict__.items()
+            if key not in _RESERVED_ATTRIBUTES and key not in ("request_tag", "fields") and not key.startswith("_")
+        }
+        record.fields = " " + " ".join(f"{key}={value}" for key, value in fields.items()) if fields else ""
+        return super().format(record)
+
+
+def _parse_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level=None, levels=None, log_format=None, stream=None):
+    """
+    Configura o logger raiz com o handler de fila (idempotente).
+    Chamado na importação de main, antes de qualquer log.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(TextFormatter() if (log_format or LOG_FORMAT) == "text" else JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level or LOG_LEVEL)
+    for name, module_level in _parse_levels(levels if levels is not None else LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Escreve os registros que ainda estão na fila (chamado no shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_sampled(logger, level, msg, *args, rate=None, **kwargs):
+    """
+    Registra um evento frequente só em uma fração das vezes.
+    Com o nível desativado, custa apenas a checagem de isEnabledFor.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if random.random() >= (LOG_SAMPLE_RATE if rate is None else rate):
+        return
+    logger.log(level, msg, *args, **kwargs)
@@ -0,0 +1,223 @@
+"""
+Renderização determinística das mensagens de cotação, swap e transferência.
+Gera o mesmo Markdown que os prompts do Gemini pedem, mas localmente e de forma
+instantânea, com a formatação numérica de cada idioma (pt/en/es).
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RENDERER_TEMPLATE = "template"
+RENDERER_LLM = "llm"
+
+# Renderizador padrão quando a requisição não especifica ("llm" ou "template")
+DEFAULT_RENDERER = os.getenv("MESSAGE_RENDERER", RENDERER_LLM).lower()
+
+# Separadores (decimal, milhar) por idioma
+NUMBER_SEPARATORS = {
+    "pt": (",", "."),
+    "es": (",", "."),
+    "en": (".", ","),
+}
+
+TEMPLATES = {
+    "pt": {
+        "quote": "Com {from_amount} {from_token}, você vai receber aproximadamente **{to_amount} {to_token}**.",
+        "quote_note": "*Esta é apenas uma cotação: os valores reais podem variar no momento da troca.*",
+        "swap_title": "🔄 **Processo de troca entre tokens (Swap) iniciado!**",
+        "swap": "Você estará trocando {from_amount} {from_token} por aproximadamente **{to_amount} {to_token}**.",
+        "transfer_title": "📤 **Processo de transferência de tokens iniciado!**",
+        "transfer": "Você estará enviando {amount} {token} para o endereço **{address}**.",
+        "gas": "⛽ Taxas estimadas da rede: **~{gas_usd}** em {symbol}",
+        "duration": "🕝 Tempo de execução: ~{duration} segundos",
+        "review": "Na próxima etapa você poderá revisar todos os detalhes e confirmar a transação.",
+        "swap_confirm": "Deseja continuar com a transação?",
+        "transfer_confirm": "Deseja continuar com a transferência?",
+    },
+    "en": {
+        "quote": "With {from_amount} {from_token}, you will receive approximately **{to_amount} {to_token}**.",
+        "quote_note": "*This is only a quote: actual values may change when the swap is executed.*",
+        "swap_title": "🔄 **Token swap process started!**",
+        "swap": "You will be swapping {from_amount} {from_token} for approximately **{to_amount} {to_token}**.",
+        "transfer_title": "📤 **Token transfer process started!**",
+        "transfer": "You will be sending {amount} {token} to the address **{address}**.",
+        "gas": "⛽ Estimated network fees: **~{gas_usd}** in {symbol}",
+        "duration": "🕝 Execution time: ~{duration} seconds",
+        "review": "In the next step you will be able to review all the details and confirm the transaction.",
+        "swap_confirm": "Do you want to continue with the transaction?",
+        "transfer_confirm": "Do you want to continue with the transfer?",
+    },
+    "es": {
+        "quote": "Con {from_amount} {from_token}, recibirás aproximadamente **{to_amount} {to_token}**.",
+        "quote_note": "*Esto es solo una cotización: los valores reales pueden variar al momento del intercambio.*",
+        "swap_title": "🔄 **¡Proceso de intercambio de tokens (Swap) iniciado!**",
+        "swap": "Estarás intercambiando {from_amount} {from_token} por aproximadamente **{to_amount} {to_token}**.",
+        "transfer_title": "📤 **¡Proceso de transferencia de tokens iniciado!**",
+        "transfer": "Estarás enviando {amount} {token} a la dirección **{address}**.",
+        "gas": "⛽ Tarifas estimadas de la red: **~{gas_usd}** en {symbol}",
+        "duration": "🕝 Tiempo de ejecución: ~{duration} segundos",
+        "review": "En el siguiente paso podrás revisar todos los detalles y confirmar la transacción.",
+        "swap_confirm": "¿Deseas continuar con la transacción?",
+        "transfer_confirm": "¿Deseas continuar con la transferencia?",
+    },
+}
+
+
+def supports_language(language):
+    return (language or "").lower() in TEMPLATES
+
+
+def _normalize_language(language):
+    """Idioma em minúsculas; cai para "pt" quando não há template"""
+    language = (language or "pt").lower()
+    return language if language in TEMPLATES else "pt"
+
+
+def select_renderer(requested, language):
+    """
+    Decide qual renderizador usar: o da requisição, senão o configurado.
+    Idiomas sem template sempre usam o LLM.
+    """
+    renderer = (requested or DEFAULT_RENDERER).lower()
+    if renderer == RENDERER_TEMPLATE and supports_language(language):
+        return RENDERER_TEMPLATE
+    return RENDERER_LLM
+
+
+def format_number(value, language, max_decimals=6):
+    """Formata um número com os separadores do idioma, sem zeros à direita"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+    decimal_sep, thousands_sep = NUMBER_SEPARATORS.get(language, NUMBER_SEPARATORS["en"])
+    # Valores pequenos precisam de mais casas para não virarem zero
+    decimals = max_decimals
+    if 0 < abs(number) < 10 ** -max_decimals:
+        decimals = max_decimals + 6
+
+    formatted = f"{number:,.{decimals}f}"
+    if "." in formatted:
+        formatted = formatted.rstrip("0").rstrip(".")
+    return formatted.replace(",", "\x00").replace(".", decimal_sep).replace("\x00", thousands_sep)
+
+
+def format_usd(value, language):
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return f"${value}"
+
+    # Taxas menores que um centavo aparecem como ~$0,01 em vez de ~$0,00
+    if 0 < amount < 0.01:
+        amount = 0.01
+
+    decimal_sep, thousands_sep = NUMBER_SEPARATORS.get(language, NUMBER_SEPARATORS["en"])
+    formatted = f"{amount:,.2f}"
+    return "$" + formatted.replace(",", "\x00").replace(".", decimal_sep).replace("\x00", thousands_sep)
+
+
+def mask_address(address):
+    """Mostra apenas os primeiros 6 e os últimos 4 caracteres do endereço"""
+    if not address or len(address) <= 10:
+        return address or ""
+    return f"{address[:6]}...{address[-4:]}"
+
+
+def _gas_info(data):
+    """
+    Extrai (custo em USD, símbolo) das taxas de gas.
+    Transferências trazem `gasCosts` como dict; cotações da LI.FI trazem uma
+    lista em `estimate.gasCosts` (ou na raiz).
+    """
+    gas_costs = data.get("gasCosts")
+    if gas_costs is None:
+        gas_costs = (data.get("estimate") or {}).get("gasCosts")
+
+    if isinstance(gas_costs, dict):
+        return gas_costs.get("amountUSD"), gas_costs.get("symbol")
+
+    if isinstance(gas_costs, list) and gas_costs:
+        total = 0.0
+        for cost in gas_costs:
+            try:
+                total += float(cost.get("amountUSD") or 0)
+            except (TypeError, ValueError):
+                continue
+        symbol = (gas_costs[0].get("token") or {}).get("symbol") or gas_costs[0].get("symbol")
+        return total, symbol
+
+    return None, None
+
+
+def _execution_duration(data):
+    duration = data.get("executionDuration")
+    if duration is None:
+        duration = (data.get("estimate") or {}).get("executionDuration")
+    return duration
+
+
+def _fee_lines(data, texts, language):
+    lines = []
+    gas_usd, symbol = _gas_info(data)
+    if gas_usd is not None:
+        lines.append(texts["gas"].format(gas_usd=format_usd(gas_usd, language), symbol=symbol or ""))
+    duration = _execution_duration(data)
+    if duration is not None:
+        lines.append(texts["duration"].format(duration=format_number(duration, language, max_decimals=0)))
+    return lines
+
+
+def _join(*sections):
+    return "\n\n".join("\n".join(section) if isinstance(section, list) else section for section in sections if section)
+
+
+def render_quote_message(quote, language="pt"):
+    language = _normalize_language(language)
+    texts = TEMPLATES[language]
+    return _join(
+        texts["quote"].format(
+            from_amount=format_number(quote.get("fromAmount"), language),
+            from_token=quote.get("fromToken", ""),
+            to_amount=format_number(quote.get("toAmount"), language),
+            to_token=quote.get("toToken", ""),
+        ),
+        _fee_lines(quote, texts, language),
+        texts["quote_note"],
+    )
+
+
+def render_swap_message(swap_data, language="pt"):
+    language = _normalize_language(language)
+    texts = TEMPLATES[language]
+    return _join(
+        texts["swap_title"],
+        texts["swap"].format(
+            from_amount=format_number(swap_data.get("fromAmount"), language),
+            from_token=swap_data.get("fromToken", ""),
+            to_amount=format_number(swap_data.get("toAmount"), language),
+            to_token=swap_data.get("toToken", ""),
+        ),
+        _fee_lines(swap_data, texts, language),
+        texts["review"],
+        texts["swap_confirm"],
+    )
+
+
+def render_transfer_message(transfer_data, language="pt"):
+    language = _normalize_language(language)
+    texts = TEMPLATES[language]
+    return _join(
+        texts["transfer_title"],
+        texts["transfer"].format(
+            amount=format_number(transfer_data.get("fromAmount"), language),
+            token=transfer_data.get("fromToken", ""),
+            address=mask_address(transfer_data.get("toAddress", "")),
+        ),
+        _fee_lines(transfer_data, texts, language),
+        texts["review"],
+        texts["transfer_confirm"],
+    )
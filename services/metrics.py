@@ -0,0 +1,221 @@
+"""
+Métricas de latência por etapa do /process e por upstream.
+
+Cada requisição acumula seus tempos em um RequestTimings (ContextVar, então
+tarefas de pré-busca e cargas de cache entram na mesma conta). No fim da
+requisição os tempos vão para histogramas rotulados por intenção e rede,
+expostos no formato texto do Prometheus em /metrics, e o resumo é enviado
+ao cliente no evento SSE final.
+"""
+
+import bisect
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # rótulos -> [contagem por bucket, soma, total]
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key))
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return "\n".join(lines)
+
+
+stage_seconds = Histogram(
+    "cripto_stage_seconds", "Duração de cada etapa do /process", ("stage", "intent", "chain")
+)
+upstream_seconds = Histogram(
+    "cripto_upstream_seconds", "Latência das chamadas a serviços externos", ("upstream", "outcome", "intent", "chain")
+)
+requests_total = Counter(
+    "cripto_process_requests_total", "Requisições /process concluídas", ("intent", "chain")
+)
+aborted_total = Counter(
+    "cripto_process_aborted_total", "Requisições /process interrompidas porque o cliente desconectou", ("intent", "chain")
+)
+admission_queue_seconds = Histogram(
+    "cripto_admission_queue_seconds", "Espera na fila de admissão de cada upstream", ("upstream", "priority")
+)
+admission_shed_total = Counter(
+    "cripto_admission_shed_total", "Chamadas recusadas pela admissão (fila acima do orçamento)", ("upstream", "priority")
+)
+
+_REGISTRY = (
+    stage_seconds, upstream_seconds, requests_total, aborted_total, admission_queue_seconds, admission_shed_total,
+)
+
+
+def render_metrics():
+    """Todas as métricas no formato texto do Prometheus"""
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+def chain_label(chain):
+    """
+    Rede como rótulo de métrica: só as redes suportadas, o resto vira "other"
+    (o valor vem do corpo da requisição; cada valor distinto criaria novas séries)
+    """
+    # Import tardio: lifi_service depende (via deadline) deste módulo
+    from services.lifi_service import SUPPORTED_CHAINS
+    chain = (chain or "").upper() if isinstance(chain, str) else ""
+    return chain if chain in SUPPORTED_CHAINS else "other"
+
+
+class RequestTimings:
+    """Tempos de uma requisição /process: etapas e chamadas externas"""
+
+    def __init__(self, chain=None):
+        self.started_at = time.perf_counter()
+        self.labels = {"intent": "desconhecida", "chain": chain_label(chain)}
+        self.stages = {}
+        # upstream -> [chamadas, segundos somados, falhas]
+        self.upstreams = {}
+        self._upstream_samples = []
+        self.finished = False
+
+    def set_labels(self, **labels):
+        self.labels.update({key: value for key, value in labels.items() if value})
+
+    def record_stage(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - start_time)
+
+    def record_upstream(self, upstream, seconds, outcome="ok"):
+        entry = self.upstreams.setdefault(upstream, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        if outcome != "ok":
+            entry[2] += 1
+        self._upstream_samples.append((upstream, seconds, outcome))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def summary(self):
+        return {
+            "intent": self.labels["intent"],
+            "total_ms": round(self.elapsed() * 1000, 1),
+            "stages": {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()},
+            "upstreams": {
+                upstream: {"calls": calls, "ms": round(seconds * 1000, 1), "errors": errors}
+                for upstream, (calls, seconds, errors) in self.upstreams.items()
+            },
+        }
+
+    def finish(self, aborted=False):
+        """Envia os tempos da requisição para os histogramas (uma única vez)"""
+        if self.finished:
+            return
+        self.finished = True
+        self.record_stage("total", self.elapsed())
+        for stage, seconds in self.stages.items():
+            stage_seconds.observe(seconds, stage=stage, **self.labels)
+        for upstream, seconds, outcome in self._upstream_samples:
+            upstream_seconds.observe(seconds, upstream=upstream, outcome=outcome, **self.labels)
+        requests_total.inc(**self.labels)
+        if aborted:
+            aborted_total.inc(**self.labels)
+
+
+_current_timings = ContextVar("request_timings", default=None)
+
+
+def start_timings(chain=None):
+    """Cria os tempos da requisição atual (vale para tudo que for chamado a partir daqui)"""
+    timings = RequestTimings(chain)
+    _current_timings.set(timings)
+    return timings
+
+
+def current_timings():
+    return _current_timings.get()
+
+
+@contextmanager
+def stage(name):
+    """Mede uma etapa da requisição atual (sem efeito fora de uma requisição)"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    with timings.stage(name):
+        yield
+
+
+def record_stage(name, seconds):
+    timings = _current_timings.get()
+    if timings is not None and seconds is not None and not math.isnan(seconds):
+        timings.record_stage(name, seconds)
+
+
+def record_upstream(upstream, seconds, outcome="ok"):
+    """
+    Registra uma chamada externa: na requisição atual (rotulada no fim dela)
+    ou direto no histograma, quando feita fora de uma requisição (ex.: startup)
+    """
+    timings = _current_timings.get()
+    if timings is not None and not timings.finished:
+        timings.record_upstream(upstream, seconds, outcome)
+    else:
+        upstream_seconds.observe(seconds, upstream=upstream, outcome=outcome, intent="", chain="")
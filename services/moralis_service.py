@@ -1,13 +1,17 @@
 import httpx
 import os
+from services.http_client import http_clients
+from services.deadline import admitted, upstream_call
+from services.admission import UpstreamOverloaded
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class MoralisService:
-    def __init__(self):
+    def __init__(self, clients=None):
+        self.http_clients = clients or http_clients
         self.api_key = os.getenv('MORALIS_API_KEY')
-        self.base_url = "https://deep-index.moralis.io/api/v2.2"
+        self.base_url = os.getenv('MORALIS_BASE_URL', "https://deep-index.moralis.io/api/v2.2").rstrip("/")
         
         if not self.api_key:
             raise ValueError("MORALIS_API_KEY deve estar definida no arquivo .env")
@@ -36,14 +40,19 @@ class MoralisService:
         }
         
         try:
-            async with httpx.AsyncClient(verify=False) as client:
-                response = await client.get(url, params=params, headers=self.headers)
-                
-                if response.status_code != 200:
-                    raise Exception(f"Erro na API Moralis - Status: {response.status_code}, Mensagem: {response.text}")
-                
-                return response.json()
-                
+            client = self.http_clients.client("moralis")
+            async with admitted("moralis"), upstream_call("moralis") as timeout:
+                response = await client.get(url, params=params, headers=self.headers, timeout=timeout)
+            
+            if response.status_code != 200:
+                raise Exception(f"Erro na API Moralis - Status: {response.status_code}, Mensagem: {response.text}")
+            
+            return response.json()
+            
+        except UpstreamOverloaded:
+            raise
+        except TimeoutError as e:
+            raise Exception(f"Tempo esgotado na chamada à Moralis: {e}")
         except httpx.RequestError as e:
             raise Exception(f"Erro de conexão com Moralis: {e}")
         except Exception as e:
@@ -66,14 +75,19 @@ class MoralisService:
         }
         
         try:
-            async with httpx.AsyncClient(verify=False) as client:
-                response = await client.get(url, params=params, headers=self.headers)
-                
-                if response.status_code != 200:
-                    raise Exception(f"Erro na API Moralis - Status: {response.status_code}, Mensagem: {response.text}")
-                
-                return response.json()
-                
+            client = self.http_clients.client("moralis")
+            async with admitted("moralis"), upstream_call("moralis") as timeout:
+                response = await client.get(url, params=params, headers=self.headers, timeout=timeout)
+            
+            if response.status_code != 200:
+                raise Exception(f"Erro na API Moralis - Status: {response.status_code}, Mensagem: {response.text}")
+            
+            return response.json()
+            
+        except UpstreamOverloaded:
+            raise
+        except TimeoutError as e:
+            raise Exception(f"Tempo esgotado na chamada à Moralis: {e}")
         except httpx.RequestError as e:
             raise Exception(f"Erro de conexão com Moralis: {e}")
         except Exception as e:
@@ -0,0 +1,240 @@
+"""
+Consulta de saldos de uma carteira em lote via Multicall3.
+Agrega o saldo nativo (getEthBalance) e vários balanceOf de tokens ERC-20 em
+um único eth_call por bloco de chamadas, em vez de uma requisição RPC por token.
+"""
+
+import asyncio
+import os
+import re
+from dotenv import load_dotenv
+from services.lifi_service import token_registry
+from services.price_index import NATIVE_TOKEN_ADDRESS, NATIVE_TOKEN_SYMBOLS
+from services.rpc_client import rpc_request
+from services.balance_cache import balance_cache
+
+load_dotenv()
+
+# Multicall3 tem o mesmo endereço em Ethereum, Base e Polygon
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+# Seletores das funções usadas (4 primeiros bytes do keccak da assinatura)
+AGGREGATE3_SELECTOR = "82ad56cb"       # aggregate3((address,bool,bytes)[])
+BALANCE_OF_SELECTOR = "70a08231"       # balanceOf(address)
+GET_ETH_BALANCE_SELECTOR = "4d2301cc"  # getEthBalance(address)
+GET_BLOCK_NUMBER_SELECTOR = "42cbb15c" # getBlockNumber()
+
+# Chamadas por eth_call: ~30k de gas por balanceOf mantém cada bloco bem
+# abaixo do limite de gas de eth_call dos nós públicos
+MULTICALL_CHUNK_SIZE = int(os.getenv("MULTICALL_CHUNK_SIZE", "200"))
+
+
+_WALLET_ADDRESS = re.compile(r"0x[0-9a-fA-F]{40}")
+
+
+def _word(value):
+    return f"{value:064x}"
+
+
+def _address_word(address):
+    return address.lower().replace("0x", "").rjust(64, "0")
+
+
+def encode_aggregate3(calls):
+    """
+    Codifica (ABI) a chamada aggregate3 do Multicall3.
+
+    Args:
+        calls: Lista de (endereço alvo, allowFailure, calldata em hex sem 0x)
+
+    Returns:
+        str: Calldata em hex com 0x
+    """
+    encoded_calls = []
+    for target, allow_failure, call_data in calls:
+        data = bytes.fromhex(call_data)
+        padding = "00" * (-len(data) % 32)
+        # (address target, bool allowFailure, bytes callData): o campo bytes é
+        # dinâmico, então a tupla guarda o offset (3 palavras) e depois os dados
+        encoded_calls.append(
+            _address_word(target) + _word(int(allow_failure)) + _word(0x60) + _word(len(data)) + data.hex() + padding
+        )
+
+    # Offsets de cada tupla, relativos ao início da lista de offsets
+    offsets = []
+    position = 32 * len(calls)
+    for encoded in encoded_calls:
+        offsets.append(_word(position))
+        position += len(encoded) // 2
+
+    return "0x" + AGGREGATE3_SELECTOR + _word(0x20) + _word(len(calls)) + "".join(offsets) + "".join(encoded_calls)
+
+
+def decode_aggregate3(result_hex):
+    """
+    Decodifica o retorno de aggregate3: (bool success, bytes returnData)[]
+
+    Returns:
+        list: [(success, bytes)] na mesma ordem das chamadas
+    """
+    data = bytes.fromhex(result_hex[2:] if result_hex.startswith("0x") else result_hex)
+
+    def word(position):
+        return int.from_bytes(data[position:position + 32], "big")
+
+    array_start = word(0)
+    count = word(array_start)
+    base = array_start + 32
+
+    results = []
+    for index in range(count):
+        tuple_start = base + word(base + 32 * index)
+        success = word(tuple_start) != 0
+        bytes_start = tuple_start + word(tuple_start + 32)
+        length = word(bytes_start)
+        results.append((success, data[bytes_start + 32:bytes_start + 32 + length]))
+    return results
+
+
+def format_balance(balance_wei, token_decimals):
+    """
+    Converte um saldo em wei/menor unidade para o formato usado pelos agentes
+    """
+    balance_decimal = balance_wei / (10 ** token_decimals)
+    return {
+        "balance_wei": str(balance_wei),
+        "balance_decimal": balance_decimal,
+        "balance_formatted": f"{balance_decimal:.6f}".rstrip('0').rstrip('.')
+    }
+
+
+class PortfolioService:
+    def __init__(self, registry=None, chunk_size=None):
+        self.registry = registry or token_registry
+        self.chunk_size = max(2, chunk_size or MULTICALL_CHUNK_SIZE)
+
+    def _is_native(self, token, chain):
+        return (token.address or "").lower() == NATIVE_TOKEN_ADDRESS or \
+            token.symbol == NATIVE_TOKEN_SYMBOLS.get(chain.upper())
+
+    def _balance_call(self, wallet_address, token, chain):
+        if self._is_native(token, chain):
+            return (MULTICALL3_ADDRESS, True, GET_ETH_BALANCE_SELECTOR + _address_word(wallet_address))
+        return (token.address, True, BALANCE_OF_SELECTOR + _address_word(wallet_address))
+
+    async def _aggregate(self, chain, calls):
+        """Executa um bloco de chamadas (precedido de getBlockNumber) em um eth_call"""
+        calls = [(MULTICALL3_ADDRESS, True, GET_BLOCK_NUMBER_SELECTOR)] + calls
+        rpc_result = await rpc_request(chain, "eth_call", [{
+            "to": MULTICALL3_ADDRESS,
+            "data": encode_aggregate3(calls)
+        }, "latest"])
+        if "error" in rpc_result:
+            return rpc_result
+
+        try:
+            results = decode_aggregate3(rpc_result["result"] or "0x")
+        except Exception as e:
+            return {"error": f"Erro ao decodificar resposta do Multicall3: {str(e)}"}
+        if len(results) != len(calls):
+            return {"error": "Resposta do Multicall3 com número inesperado de resultados"}
+
+        block_success, block_data = results[0]
+        return {
+            "block_number": int.from_bytes(block_data, "big") if block_success else None,
+            "results": results[1:]
+        }
+
+    async def get_balances(self, wallet_address, chain, tokens=None, include_zero=True):
+        """
+        Consulta os saldos da carteira para vários tokens da rede.
+
+        Args:
+            wallet_address: Endereço da carteira
+            chain: Rede blockchain (ETH, BAS, POL)
+            tokens: Lista de TokenRecord (padrão: todos os tokens da rede)
+            include_zero: Se deve incluir tokens com saldo zero
+
+        Returns:
+            dict: {"wallet", "chain", "blockNumber", "balances": [...]} ou {"error": str}
+        """
+        # Endereço fora do formato viraria calldata de outra carteira (ou erro de hex)
+        if not isinstance(wallet_address, str) or not _WALLET_ADDRESS.fullmatch(wallet_address):
+            return {"error": "Endereço de carteira inválido (esperado 0x + 40 caracteres hexadecimais)"}
+
+        if tokens is None:
+            ensured = await self.registry.ensure(chain)
+            if "error" in ensured:
+                return ensured
+            tokens = list(self.registry.get(chain).by_symbol.values())
+
+        tokens = [token for token in tokens if token.address and token.decimals is not None]
+        calls = [self._balance_call(wallet_address, token, chain) for token in tokens]
+        # Cada bloco reserva uma chamada para getBlockNumber
+        step = self.chunk_size - 1
+        chunks = [calls[start:start + step] for start in range(0, len(calls), step)]
+
+        chunk_results = await asyncio.gather(*(self._aggregate(chain, chunk) for chunk in chunks))
+
+        balances = []
+        block_numbers = []
+        for chunk_index, chunk_result in enumerate(chunk_results):
+            chunk_tokens = tokens[chunk_index * step:(chunk_index + 1) * step]
+            if "error" in chunk_result:
+                return chunk_result
+            if chunk_result["block_number"] is not None:
+                block_numbers.append(chunk_result["block_number"])
+
+            for token, (success, return_data) in zip(chunk_tokens, chunk_result["results"]):
+                entry = {"symbol": token.symbol, "address": token.address, "decimals": token.decimals}
+                if not success or len(return_data) < 32:
+                    entry["error"] = "Falha ao consultar saldo do token"
+                    balances.append(entry)
+                    continue
+
+                balance_wei = int.from_bytes(return_data[:32], "big")
+                if balance_wei == 0 and not include_zero:
+                    continue
+                entry.update(format_balance(balance_wei, token.decimals))
+                balances.append(entry)
+
+        return {
+            "wallet": wallet_address,
+            "chain": chain.upper(),
+            # Blocos consultados em paralelo podem ver blocos diferentes: usa o mais antigo
+            "blockNumber": min(block_numbers) if block_numbers else None,
+            "balances": balances
+        }
+
+    async def get_token_balance(self, wallet_address, token, chain):
+        """
+        Consulta o saldo de um único token (com o número do bloco da leitura).
+
+        Returns:
+            dict: Mesmo formato de balance_validator.get_token_balance, com
+                "block_number", ou {"error": str}
+        """
+        cache_token = NATIVE_TOKEN_ADDRESS if self._is_native(token, chain) else token.address
+        return await balance_cache.get(
+            chain, wallet_address, cache_token,
+            lambda: self._fetch_token_balance(wallet_address, token, chain)
+        )
+
+    async def _fetch_token_balance(self, wallet_address, token, chain):
+        result = await self.get_balances(wallet_address, chain, tokens=[token])
+        if "error" in result:
+            return result
+        if not result["balances"] or "error" in result["balances"][0]:
+            return {"error": f"Falha ao consultar saldo de {token.symbol} via Multicall3"}
+
+        balance = result["balances"][0]
+        return {
+            "balance_wei": balance["balance_wei"],
+            "balance_decimal": balance["balance_decimal"],
+            "balance_formatted": balance["balance_formatted"],
+            "block_number": result["blockNumber"]
+        }
+
+
+# Instância global do serviço
+portfolio_service = PortfolioService()
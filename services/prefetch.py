@@ -0,0 +1,176 @@
+"""
+Pré-busca especulativa de dados da rede e da carteira.
+A rede e a carteira já são conhecidas antes de a intenção ser classificada,
+então o RouterAgent dispara o carregamento da lista de tokens, do gas price e
+do saldo nativo em paralelo com a classificação. Os agentes consomem esses
+resultados; o que não for usado pela intenção é cancelado.
+"""
+
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from services.lifi_service import fetch_and_store_tokens, get_gas_price
+from services.balance_validator import get_token_balance
+from services.price_index import NATIVE_TOKEN_ADDRESS
+
+load_dotenv()
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+
+NATIVE_TOKEN_DECIMALS = 18
+
+# Quais leituras cada intenção aproveita
+PREFETCH_USAGE = {
+    "cotacao": {"tokens"},
+    "swap": {"tokens", "native_balance"},
+    "transferencia": {"tokens", "gas_price", "native_balance"},
+}
+
+
+class PrefetchStats:
+    """Estatísticas agregadas da pré-busca (expostas em /admin/prefetch/stats)"""
+
+    def __init__(self):
+        self.requests = 0
+        self.started = {}
+        self.used = {}
+        self.cancelled = {}
+        self.overlap_seconds = {}
+        self.total_overlap_seconds = 0.0
+
+    def record(self, report):
+        self.requests += 1
+        for name, info in report["tasks"].items():
+            self.started[name] = self.started.get(name, 0) + 1
+            if info["used"]:
+                self.used[name] = self.used.get(name, 0) + 1
+                self.overlap_seconds[name] = self.overlap_seconds.get(name, 0.0) + info["overlap_ms"] / 1000
+            if info["cancelled"]:
+                self.cancelled[name] = self.cancelled.get(name, 0) + 1
+        self.total_overlap_seconds += report["overlap_ms"] / 1000
+
+    def stats(self):
+        return {
+            "enabled": PREFETCH_ENABLED,
+            "requests": self.requests,
+            "started": self.started,
+            "used": self.used,
+            "cancelled": self.cancelled,
+            "avg_overlap_ms": {
+                name: round(seconds * 1000 / self.used[name], 1)
+                for name, seconds in self.overlap_seconds.items()
+            },
+            "avg_request_overlap_ms": round(self.total_overlap_seconds * 1000 / self.requests, 1) if self.requests else 0.0,
+        }
+
+
+# Instância global das estatísticas
+prefetch_stats = PrefetchStats()
+
+
+class ChainPrefetch:
+    def __init__(self, chain, wallet_address):
+        self.chain = chain
+        self.wallet_address = wallet_address
+        self.tasks = {}
+        self._started_at = {}
+        self._finished_at = {}
+        self._used = set()
+        self._cancelled = set()
+        self.classified_at = None
+
+    def start(self):
+        """Dispara as leituras especulativas (não bloqueia)"""
+        if not PREFETCH_ENABLED or not self.chain:
+            return self
+
+        self._spawn("tokens", fetch_and_store_tokens(self.chain))
+        self._spawn("gas_price", get_gas_price(self.chain))
+        if self.wallet_address:
+            self._spawn("native_balance", get_token_balance(
+                self.wallet_address, NATIVE_TOKEN_ADDRESS, NATIVE_TOKEN_DECIMALS, self.chain, is_native=True
+            ))
+        return self
+
+    def _spawn(self, name, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks[name] = task
+        self._started_at[name] = time.perf_counter()
+        task.add_done_callback(lambda _, name=name: self._finished_at.setdefault(name, time.perf_counter()))
+
+    def keep_for_intent(self, intent):
+        """
+        Marca o fim da classificação e cancela as leituras que a intenção não usa.
+        Lista de tokens e gas price são aproveitados pelos caches dos serviços
+        (as chamadas dos agentes se juntam à carga já em andamento).
+        """
+        self.classified_at = time.perf_counter()
+        usage = PREFETCH_USAGE.get(intent, set())
+        for name, task in self.tasks.items():
+            if name in usage:
+                if name != "native_balance":
+                    self._used.add(name)
+            else:
+                self._cancel(name, task)
+
+    def _cancel(self, name, task):
+        if not task.done():
+            task.cancel()
+            self._cancelled.add(name)
+
+    async def native_balance(self, token_decimals):
+        """
+        Retorna o saldo nativo pré-buscado, ou None se não estiver disponível
+        (pré-busca desativada, cancelada ou com erro)
+        """
+        task = self.tasks.get("native_balance")
+        if task is None or task.cancelled() or token_decimals != NATIVE_TOKEN_DECIMALS:
+            return None
+
+        try:
+            result = await task
+        except (asyncio.CancelledError, Exception):
+            return None
+        if "error" in result:
+            return None
+
+        self._used.add("native_balance")
+        return result
+
+    async def close(self):
+        """
+        Cancela o que não foi consumido e registra a sobreposição obtida.
+
+        Returns:
+            dict: Tempo (ms) de cada leitura que rodou durante a classificação
+        """
+        for name, task in self.tasks.items():
+            if name not in self._used:
+                self._cancel(name, task)
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+        report = self.report()
+        if self.tasks:
+            prefetch_stats.record(report)
+        return report
+
+    def report(self):
+        classified_at = self.classified_at or time.perf_counter()
+        tasks = {}
+        for name in self.tasks:
+            started_at = self._started_at[name]
+            finished_at = self._finished_at.get(name, classified_at)
+            overlap = max(0.0, min(finished_at, classified_at) - started_at)
+            tasks[name] = {
+                "used": name in self._used,
+                "cancelled": name in self._cancelled,
+                "overlap_ms": round(overlap * 1000, 1),
+            }
+
+        used_overlaps = [info["overlap_ms"] for info in tasks.values() if info["used"]]
+        return {
+            "tasks": tasks,
+            # As leituras rodam em paralelo: o ganho é a maior sobreposição entre as usadas
+            "overlap_ms": max(used_overlaps) if used_overlaps else 0.0,
+        }
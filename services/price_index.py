@@ -0,0 +1,113 @@
+"""
+Índice local de preços em USD.
+Usa o priceUSD que já vem na lista de tokens da LI.FI (mantida pelo token_registry)
+e só recorre à CoinGecko, com cache, quando a lista não traz o preço.
+"""
+
+import logging
+import os
+from dotenv import load_dotenv
+from services.cache import AsyncTTLCache
+from services.http_client import http_clients
+from services.deadline import admitted, upstream_call
+from services.lifi_service import token_registry
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Endereço usado pela LI.FI para o token nativo das redes EVM
+NATIVE_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# Símbolo do token nativo de cada rede
+NATIVE_TOKEN_SYMBOLS = {
+    "ETH": "ETH",
+    "BAS": "ETH",   # Base usa ETH
+    "POL": "POL"
+}
+
+# URL base da API da CoinGecko (configurável para apontar para um ambiente local)
+COINGECKO_BASE_URL = os.getenv("COINGECKO_BASE_URL", "https://api.coingecko.com/api/v3").rstrip("/")
+
+# Mapeamento de chains para IDs do CoinGecko (fallback)
+COINGECKO_IDS = {
+    "ETH": "ethereum",
+    "BAS": "ethereum",
+    "POL": "matic-network"
+}
+
+
+class PriceIndex:
+    def __init__(self, registry=None, clients=None):
+        self.registry = registry or token_registry
+        self.http_clients = clients or http_clients
+        self._coingecko_cache = AsyncTTLCache(
+            "coingecko_price",
+            ttl=float(os.getenv("COINGECKO_PRICE_TTL", "300")),
+            stale_ttl=float(os.getenv("COINGECKO_PRICE_STALE_TTL", "3600")),
+        )
+        self.registry_hits = 0
+        self.fallbacks = 0
+
+    def get_price_usd(self, chain, token):
+        """
+        Retorna o preço em USD de um token (símbolo, endereço ou nome) a partir
+        da lista de tokens já carregada, ou None se não houver preço
+        """
+        record = self.registry.resolve(chain, token)
+        if record is None:
+            return None
+        price = record.price_usd
+        return price if price > 0 else None
+
+    async def get_native_price_usd(self, chain):
+        """
+        Retorna o preço do token nativo da rede em USD.
+        Não faz chamadas de rede quando a lista de tokens da rede já está carregada.
+        """
+        chain_upper = chain.upper()
+        native_symbol = NATIVE_TOKEN_SYMBOLS.get(chain_upper)
+        if not native_symbol:
+            return 0
+
+        # Revalida a lista em segundo plano se estiver vencida (não bloqueia)
+        await self.registry.ensure(chain)
+
+        price = self.get_price_usd(chain, NATIVE_TOKEN_ADDRESS) or self.get_price_usd(chain, native_symbol)
+        if price:
+            self.registry_hits += 1
+            return price
+
+        self.fallbacks += 1
+        coingecko_id = COINGECKO_IDS[chain_upper]
+        result = await self._coingecko_cache.get(coingecko_id, lambda: self._fetch_coingecko_price(coingecko_id))
+        return result.get("usd", 0)
+
+    async def _fetch_coingecko_price(self, coingecko_id):
+        url = (f"{COINGECKO_BASE_URL}/simple/price?"
+               f"ids={coingecko_id}&vs_currencies=usd")
+        try:
+            client = self.http_clients.client("coingecko")
+            async with admitted("coingecko"), upstream_call("coingecko") as timeout:
+                response = await client.get(url, timeout=timeout)
+            if response.status_code != 200:
+                return {"error": f"Erro na API CoinGecko (Status: {response.status_code})"}
+
+            price = response.json().get(coingecko_id, {}).get("usd")
+            if not price:
+                return {"error": "Preço não encontrado na resposta da CoinGecko"}
+            return {"usd": price}
+        except Exception as e:
+            logger.warning("Erro ao buscar preço na CoinGecko: %s", e)
+            return {"error": f"Erro ao buscar preço na CoinGecko: {str(e)}"}
+
+    def stats(self):
+        return {
+            "registry_hits": self.registry_hits,
+            "fallbacks": self.fallbacks,
+            "coingecko": self._coingecko_cache.stats(),
+        }
+
+
+# Instância global do serviço
+price_index = PriceIndex()
@@ -0,0 +1,29 @@
+"""
+Chamadas JSON-RPC às redes suportadas, compartilhadas pela consulta de saldos
+(balance_validator) e pelo portfólio via Multicall3 (portfolio_service).
+As requisições passam pelo pool de endpoints da rede (rpc_pool).
+"""
+
+from services.deadline import DeadlineExceeded
+from services.admission import UpstreamOverloaded
+from services.rpc_pool import rpc_pools
+
+
+def supports_chain(chain):
+    return rpc_pools.supports(chain)
+
+
+async def rpc_request(chain, method, params, timeout=None):
+    """
+    Executa uma chamada JSON-RPC na rede informada.
+
+    Returns:
+        dict: {"result": valor retornado} ou {"error": str}
+    """
+    if not supports_chain(chain):
+        return {"error": f"Chain {chain} não suportada para consultas RPC"}
+
+    try:
+        return await rpc_pools.get(chain).request(method, params, timeout=timeout)
+    except (DeadlineExceeded, UpstreamOverloaded) as e:
+        return {"error": str(e)}
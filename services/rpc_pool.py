@@ -0,0 +1,317 @@
+"""
+Pool de endpoints RPC por rede.
+Mantém a média móvel (EWMA) de latência e da taxa de erro de cada endpoint,
+envia as leituras para o mais rápido que estiver saudável, tenta outro
+endpoint quando um falha e, opcionalmente, dispara uma requisição duplicada
+(hedge) quando a primeira passa do p95 de latência do endpoint.
+
+Endpoints configuráveis por rede em RPC_URLS_<CHAIN> (separados por vírgula).
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import aiohttp
+from dotenv import load_dotenv
+from services.http_client import http_clients
+from services.deadline import adaptive_timeout, admitted, budget_timeout
+from services.metrics import record_upstream
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Endpoints padrão (usados quando RPC_URLS_<CHAIN> não está definida)
+DEFAULT_RPC_URLS = {
+    "ETH": ["https://eth.llamarpc.com"],
+    "BAS": ["https://mainnet.base.org"],
+    "POL": ["https://polygon-mainnet.g.alchemy.com/v2/YfUJiJEWCYnPD4__uGKAq68bUEB9-D4O"]
+}
+
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+RPC_MAX_ATTEMPTS = int(os.getenv("RPC_MAX_ATTEMPTS", "3"))
+RPC_EWMA_ALPHA = float(os.getenv("RPC_EWMA_ALPHA", "0.2"))
+# Falhas seguidas que tiram o endpoint de rotação por RPC_COOLDOWN segundos
+RPC_FAILURES_BEFORE_COOLDOWN = int(os.getenv("RPC_FAILURES_BEFORE_COOLDOWN", "3"))
+RPC_COOLDOWN = float(os.getenv("RPC_COOLDOWN", "30"))
+RPC_HEDGE = os.getenv("RPC_HEDGE", "false").lower() == "true"
+RPC_HEDGE_MIN_MS = float(os.getenv("RPC_HEDGE_MIN_MS", "50"))
+# Atraso do hedge enquanto o endpoint ainda não tem amostras suficientes para o p95
+RPC_HEDGE_DEFAULT_MS = float(os.getenv("RPC_HEDGE_DEFAULT_MS", "500"))
+
+# Erros JSON-RPC que indicam problema do provedor (limite de requisições),
+# e não da chamada em si: nesses casos vale tentar outro endpoint
+_RETRYABLE_RPC_CODES = {-32005, -32029, 429}
+
+
+def configured_urls(chain):
+    urls = os.getenv(f"RPC_URLS_{chain.upper()}")
+    if urls:
+        return [url.strip() for url in urls.split(",") if url.strip()]
+    return list(DEFAULT_RPC_URLS.get(chain.upper(), []))
+
+
+class RpcEndpoint:
+    def __init__(self, url, alpha=RPC_EWMA_ALPHA):
+        self.url = url
+        # Só o host aparece nas estatísticas (a URL pode conter chave de API)
+        self.label = urlsplit(url).netloc or url
+        self.alpha = alpha
+        self.latency_ewma = None
+        self.error_rate = 0.0
+        self.latencies = deque(maxlen=200)
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+
+    def record_success(self, seconds):
+        self.requests += 1
+        self.latencies.append(seconds)
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
+        else:
+            self.latency_ewma = self.alpha * seconds + (1 - self.alpha) * self.latency_ewma
+        self.error_rate = (1 - self.alpha) * self.error_rate
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.requests += 1
+        self.errors += 1
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= RPC_FAILURES_BEFORE_COOLDOWN:
+            self.down_until = time.monotonic() + RPC_COOLDOWN
+
+    def healthy(self):
+        return time.monotonic() >= self.down_until
+
+    def score(self):
+        # Endpoints ainda sem medição vão primeiro para serem avaliados
+        latency = self.latency_ewma if self.latency_ewma is not None else 0.0
+        return latency * (1 + 4 * self.error_rate)
+
+    def timeout(self, default):
+        """Timeout adaptativo a partir das latências observadas do endpoint"""
+        return adaptive_timeout(self.latencies, default)
+
+    def p95(self):
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def stats(self):
+        p95 = self.p95()
+        return {
+            "endpoint": self.label,
+            "healthy": self.healthy(),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class RpcPool:
+    def __init__(self, chain, urls, hedge=None, max_attempts=None):
+        self.chain = chain.upper()
+        self.endpoints = [RpcEndpoint(url) for url in urls]
+        self.hedge = RPC_HEDGE if hedge is None else hedge
+        self.max_attempts = max_attempts or RPC_MAX_ATTEMPTS
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def ordered(self):
+        """Endpoints saudáveis do mais rápido ao mais lento (ou todos, se nenhum estiver saudável)"""
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy()]
+        return sorted(healthy or self.endpoints, key=lambda endpoint: endpoint.score())
+
+    def hedge_delay(self, endpoint):
+        p95 = endpoint.p95()
+        delay_ms = p95 * 1000 if p95 is not None else RPC_HEDGE_DEFAULT_MS
+        return max(delay_ms, RPC_HEDGE_MIN_MS) / 1000
+
+    async def _attempt(self, endpoint, payload, timeout):
+        """
+        Returns:
+            tuple: (resposta {"result"} ou {"error"}, se vale tentar outro endpoint)
+        """
+        start_time = time.perf_counter()
+        outcome = "cancelled"
+        try:
+            response, retryable = await self._send(endpoint, payload, timeout, start_time)
+            outcome = "error" if retryable else "ok"
+            return response, retryable
+        finally:
+            record_upstream("rpc", time.perf_counter() - start_time, outcome)
+
+    async def _send(self, endpoint, payload, timeout, start_time):
+        try:
+            session = http_clients.session()
+            async with session.post(
+                endpoint.url,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status != 200:
+                    endpoint.record_failure()
+                    return {"error": f"Erro na API: {response.status}"}, True
+
+                data = await response.json()
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            endpoint.record_failure()
+            return {"error": f"Timeout na chamada RPC ({endpoint.label})"}, True
+        except Exception as e:
+            endpoint.record_failure()
+            return {"error": f"Erro na chamada RPC: {str(e)}"}, True
+
+        if "error" in data:
+            error = data["error"] or {}
+            if error.get("code") in _RETRYABLE_RPC_CODES:
+                endpoint.record_failure()
+                return {"error": f"Erro RPC: {error.get('message', 'Desconhecido')}"}, True
+            # Erro da própria chamada (ex.: execution reverted): o endpoint respondeu bem
+            endpoint.record_success(time.perf_counter() - start_time)
+            return {"error": f"Erro RPC: {error.get('message', 'Desconhecido')}"}, False
+
+        endpoint.record_success(time.perf_counter() - start_time)
+        return {"result": data.get("result")}, False
+
+    async def _hedged(self, primary, secondary, payload, timeout):
+        """
+        Dispara a requisição no endpoint principal e, se ela passar do p95,
+        uma cópia no segundo endpoint; vale a primeira resposta definitiva.
+
+        Returns:
+            tuple: ((resposta, retentável), se o segundo endpoint foi usado)
+        """
+        primary_task = asyncio.create_task(self._attempt(primary, payload, timeout))
+        tasks = {primary_task}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(primary))
+            if done:
+                return primary_task.result(), False
+
+            self.hedges += 1
+            secondary_task = asyncio.create_task(self._attempt(secondary, payload, timeout))
+            tasks.add(secondary_task)
+            pending = set(tasks)
+            last = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    response, retryable = task.result()
+                    if not retryable:
+                        if task is secondary_task:
+                            self.hedge_wins += 1
+                        return (response, False), True
+                    last = (response, retryable)
+            return last, True
+        finally:
+            # Cancela a requisição que perdeu (ou ambas, se o chamador foi cancelado)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def request(self, method, params, timeout=None):
+        """
+        Executa a chamada JSON-RPC no melhor endpoint, com failover.
+        Lança DeadlineExceeded se o prazo da requisição acabar entre tentativas
+        e UpstreamOverloaded se a fila de admissão do RPC estiver cheia.
+
+        Returns:
+            dict: {"result": valor retornado} ou {"error": str}
+        """
+        timeout = timeout or RPC_TIMEOUT
+        payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": 1
+        }
+
+        candidates = self.ordered()[:self.max_attempts]
+        if not candidates:
+            return {"error": f"Nenhum endpoint RPC configurado para a chain {self.chain}"}
+
+        # Uma vaga de RPC por chamada, incluindo failover e hedge
+        async with admitted("rpc"):
+            return await self._request(candidates, payload, timeout)
+
+    async def _request(self, candidates, payload, timeout):
+        last_response = None
+        index = 0
+        while index < len(candidates):
+            primary = candidates[index]
+            index += 1
+            # Cada tentativa usa só o que resta do prazo da requisição
+            attempt_timeout = budget_timeout(primary.timeout(timeout), "rpc")
+            if self.hedge and index < len(candidates):
+                (response, retryable), used_secondary = await self._hedged(
+                    primary, candidates[index], payload, attempt_timeout
+                )
+                if used_secondary:
+                    index += 1
+            else:
+                response, retryable = await self._attempt(primary, payload, attempt_timeout)
+
+            if not retryable:
+                return response
+            last_response = response
+            if index < len(candidates):
+                self.failovers += 1
+                logger.warning("Endpoint RPC %s (%s) falhou: %s. Tentando outro endpoint.",
+                               primary.label, self.chain, response["error"])
+
+        return last_response
+
+    def stats(self):
+        return {
+            "hedge": self.hedge,
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
+
+
+class RpcPoolRegistry:
+    def __init__(self):
+        self._pools = {}
+
+    def supports(self, chain):
+        return bool(chain) and (chain.upper() in self._pools or bool(configured_urls(chain)))
+
+    def get(self, chain):
+        chain = chain.upper()
+        pool = self._pools.get(chain)
+        if pool is None:
+            pool = RpcPool(chain, configured_urls(chain))
+            # Redes desconhecidas não ficam registradas
+            if pool.endpoints:
+                self._pools[chain] = pool
+        return pool
+
+    def configure(self, chain, urls, **kwargs):
+        """Substitui os endpoints de uma rede (usado por benchmarks)"""
+        pool = RpcPool(chain, urls, **kwargs)
+        self._pools[chain.upper()] = pool
+        return pool
+
+    def stats(self):
+        return {chain: pool.stats() for chain, pool in self._pools.items()}
+
+
+# Registro global dos pools de RPC
+rpc_pools = RpcPoolRegistry()
@@ -0,0 +1,216 @@
+"""
+Escrita do stream SSE do /process.
+
+- Texto sai no máximo uma vez a cada SSE_COALESCE_MS: chunks que chegam dentro
+  da janela vão juntos em um único evento (até SSE_COALESCE_BYTES), com menos
+  escritas no socket e menos serializações por resposta. Um chunk que chega
+  depois de uma janela sem envios (incluindo o primeiro) sai na hora
+- Serialização com orjson quando disponível
+- Comentário de heartbeat quando o stream fica ocioso por
+  SSE_HEARTBEAT_INTERVAL segundos, para proxies não segurarem o buffer
+  (clientes SSE ignoram linhas de comentário)
+- O texto da resposta é acumulado em lista e unido só no fim
+- Cliente que desconecta (http.disconnect) interrompe o stream: a leitura em
+  andamento (agente, LI.FI, Gemini) é cancelada
+"""
+
+import asyncio
+import collections
+import json
+import os
+from dotenv import load_dotenv
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+load_dotenv()
+
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "20"))
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "4096"))
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+
+DONE_EVENT = "data: [DONE]\n\n"
+HEARTBEAT_EVENT = ": ping\n\n"
+
+
+if ORJSON_AVAILABLE:
+    def encode_event(payload):
+        """Evento SSE "data:" com o payload em JSON"""
+        return "data: " + orjson.dumps(payload).decode() + "\n\n"
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def encode_event(payload):
+        """Evento SSE "data:" com o payload em JSON"""
+        return "data: " + _encoder.encode(payload) + "\n\n"
+
+
+class SSEWriter:
+    """
+    Converte o stream do RouterAgent (texto ou eventos dict) em eventos SSE,
+    agrupando o texto. Eventos dict (ex.: transaction) saem depois do texto
+    pendente, na mesma ordem em que chegaram.
+
+    Uma única tarefa por stream lê a origem e entrega os itens em uma fila;
+    a janela e o heartbeat são timers do loop (sem tarefa nova por chunk).
+    """
+
+    def __init__(self, source, coalesce_ms=None, coalesce_bytes=None, heartbeat_interval=None):
+        self.source = source
+        self.window = (SSE_COALESCE_MS if coalesce_ms is None else coalesce_ms) / 1000
+        self.max_bytes = SSE_COALESCE_BYTES if coalesce_bytes is None else coalesce_bytes
+        self.heartbeat_interval = SSE_HEARTBEAT_INTERVAL if heartbeat_interval is None else heartbeat_interval
+        self.parts = []
+        self.chunks = 0
+        self.frames = 0
+        self.heartbeats = 0
+        self.aborted = False
+        self._items = collections.deque()
+        self._pending = []
+        self._pending_bytes = 0
+        self._finished = False
+        self._error = None
+        self._waiter = None
+        self._heartbeat_timer = None
+        self._reader = None
+
+    def text(self):
+        """Texto completo enviado até agora"""
+        return "".join(self.parts)
+
+    def append_text(self, text):
+        """Registra texto enviado fora do writer (ex.: mensagem de erro)"""
+        self.parts.append(text)
+
+    def abort(self):
+        """Interrompe o stream: cancela a leitura em andamento e encerra events()"""
+        if self.aborted:
+            return
+        self.aborted = True
+        if self._reader is not None:
+            self._reader.cancel()
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _read(self):
+        try:
+            async for item in self.source:
+                self._items.append(item)
+                self._wake()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._finished = True
+            self._wake()
+
+    def _flush(self):
+        frame = encode_event({"content": "".join(self._pending)})
+        self._pending = []
+        self._pending_bytes = 0
+        self.frames += 1
+        return frame
+
+    def _on_heartbeat_timer(self):
+        self._heartbeat_timer = None
+        self._wake()
+
+    async def events(self):
+        loop = asyncio.get_running_loop()
+        self._reader = asyncio.ensure_future(self._read())
+        # Texto sai no máximo uma vez por janela: um chunk que chega depois de
+        # uma janela sem envios sai na hora; os seguintes esperam o fim da janela
+        last_flush = float("-inf")
+        window_ends = None
+        window_timer = None
+        last_write = loop.time()
+        try:
+            while not self.aborted:
+                if not self._items:
+                    now = loop.time()
+                    if self._pending and now >= window_ends:
+                        yield self._flush()
+                        last_flush = last_write = loop.time()
+                        continue
+                    if self._finished:
+                        break
+                    if self.heartbeat_interval > 0 and not self._pending:
+                        if now >= last_write + self.heartbeat_interval:
+                            self.heartbeats += 1
+                            yield HEARTBEAT_EVENT
+                            last_write = loop.time()
+                            continue
+                        # Um único timer de heartbeat: se disparar antes da hora
+                        # (houve escrita nesse meio tempo), é armado de novo
+                        if self._heartbeat_timer is None:
+                            self._heartbeat_timer = loop.call_at(
+                                last_write + self.heartbeat_interval, self._on_heartbeat_timer
+                            )
+                    # Espera o próximo item, o fim da janela ou o heartbeat
+                    self._waiter = loop.create_future()
+                    try:
+                        await self._waiter
+                    finally:
+                        self._waiter = None
+                    continue
+
+                item = self._items.popleft()
+                if isinstance(item, dict):
+                    if self._pending:
+                        window_timer.cancel()
+                        yield self._flush()
+                        last_flush = loop.time()
+                    self.frames += 1
+                    yield encode_event(item)
+                    last_write = loop.time()
+                    continue
+
+                self.chunks += 1
+                self.parts.append(item)
+                self._pending.append(item)
+                self._pending_bytes += len(item)
+                now = loop.time()
+                if now >= last_flush + self.window or self._pending_bytes >= self.max_bytes:
+                    if window_timer is not None:
+                        window_timer.cancel()
+                    yield self._flush()
+                    last_flush = last_write = loop.time()
+                elif len(self._pending) == 1:
+                    window_ends = last_flush + self.window
+                    window_timer = loop.call_at(window_ends, self._wake)
+
+            if self.aborted:
+                return
+            if self._pending:
+                yield self._flush()
+            if self._error is not None:
+                raise self._error
+        finally:
+            if window_timer is not None:
+                window_timer.cancel()
+            if self._heartbeat_timer is not None:
+                self._heartbeat_timer.cancel()
+                self._heartbeat_timer = None
+            await self.aclose()
+
+    async def aclose(self):
+        """Cancela a leitura em andamento e fecha o stream de origem"""
+        if self._reader is not None and not self._reader.done():
+            self._reader.cancel()
+            await asyncio.wait({self._reader})
+        close = getattr(self.source, "aclose", None)
+        if close is not None:
+            await close()
+
+
+async def wait_disconnect(receive):
+    """Retorna quando o cliente fecha a conexão (mensagem ASGI http.disconnect)"""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
@@ -1,22 +1,96 @@
 from supabase import create_client, Client
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# O cliente do Supabase é síncrono: as chamadas rodam em um pool de threads
+# limitado para não bloquear o event loop (e os outros streams SSE do worker)
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", "4"))
+
+# Campos da tabela messages que podem ser atualizados depois da inserção
+VALID_UPDATE_FIELDS = {
+    'response', 'action_clicked', 'action_successful', 'right_purpose',
+    'right_values', 'error_message', 'response_time'
+}
+
 class SupabaseService:
-    def __init__(self):
-        self.url = os.getenv('SUPABASE_URL')
-        self.key = os.getenv('SUPABASE_ANON_KEY')
+    def __init__(self, url=None, key=None, max_workers=None):
+        self.url = url or os.getenv('SUPABASE_URL')
+        self.key = key or os.getenv('SUPABASE_ANON_KEY')
         
         if not self.url or not self.key:
             raise ValueError("SUPABASE_URL e SUPABASE_ANON_KEY devem estar definidas no arquivo .env")
         
         self.client: Client = create_client(self.url, self.key)
+        self.max_workers = max_workers or SUPABASE_MAX_WORKERS
+        self._executor = None
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queue_seconds = 0.0
+        self.call_seconds = 0.0
     
     def get_client(self) -> Client:
         """Retorna o cliente do Supabase"""
         return self.client
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="supabase"
+            )
+        return self._executor
+
+    async def _run(self, query):
+        """
+        Executa query.execute() no pool de threads do Supabase.
+        Com todas as threads ocupadas, a chamada espera na fila do executor
+        sem segurar o event loop.
+        """
+        submitted_at = time.perf_counter()
+        started_at = None
+
+        def execute():
+            nonlocal started_at
+            started_at = time.perf_counter()
+            return query.execute()
+
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), execute)
+        finally:
+            self.in_flight -= 1
+            finished_at = time.perf_counter()
+            if started_at is not None:
+                self.queue_seconds += started_at - submitted_at
+                self.call_seconds += finished_at - started_at
+
+    def stats(self):
+        calls = self.calls or 1
+        return {
+            "max_workers": self.max_workers,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "avg_queue_ms": round(self.queue_seconds * 1000 / calls, 1),
+            "avg_call_ms": round(self.call_seconds * 1000 / calls, 1),
+        }
+
+    def close(self):
+        """Encerra o pool de threads (chamado no shutdown da aplicação)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
     
     async def insert_message(self, prompt: str, response: str, response_time: float = None, 
                            action_clicked: bool = None, action_successful: bool = None, 
@@ -61,7 +135,7 @@ class SupabaseService:
             if origin is not None:
                 data["origin"] = origin
             
-            result = self.client.table("messages").insert(data).execute()
+            result = await self._run(self.client.table("messages").insert(data))
             
             if result.data:
                 return result.data[0]
@@ -82,7 +156,41 @@ class SupabaseService:
             list: Lista de mensagens
         """
         try:
-            result = self.client.table("messages").select("*").order("created_at", desc=True).limit(limit).execute()
+            result = await self._run(
+                self.client.table("messages").select("*").order("created_at", desc=True).limit(limit)
+            )
+            return result.data
+        except Exception as e:
+            raise Exception(f"Erro ao buscar mensagens: {str(e)}")
+    
+    async def get_messages_page(self, after_id=None, limit: int = 1000, columns: str = "*",
+                                origin: str = None, since: str = None, until: str = None):
+        """
+        Busca uma página de mensagens em ordem de id (paginação por chave:
+        a próxima página começa depois do último id recebido)
+        
+        Args:
+            after_id: Último id da página anterior (None para a primeira página)
+            limit: Tamanho da página
+            columns: Colunas retornadas
+            origin: Filtra pela origem (local/production)
+            since: Só mensagens criadas a partir desta data (ISO 8601)
+            until: Só mensagens criadas antes desta data (ISO 8601)
+        
+        Returns:
+            list: Mensagens da página (vazia no fim da tabela)
+        """
+        try:
+            query = self.client.table("messages").select(columns)
+            if after_id is not None:
+                query = query.gt("id", after_id)
+            if origin is not None:
+                query = query.eq("origin", origin)
+            if since is not None:
+                query = query.gte("created_at", since)
+            if until is not None:
+                query = query.lt("created_at", until)
+            result = await self._run(query.order("id").limit(limit))
             return result.data
         except Exception as e:
             raise Exception(f"Erro ao buscar mensagens: {str(e)}")
@@ -97,15 +205,15 @@ class SupabaseService:
             )
             return result.get('id') if result else None
         except Exception as e:
-            print(f"⚠️ Erro ao inserir prompt no banco (não crítico): {e}")
+            logger.warning("Erro ao inserir prompt no banco (não crítico): %s", e)
             return None
     
     async def update_action_clicked(self, message_id: int, clicked: bool = True):
         """Atualiza o status de action_clicked de uma mensagem"""
         try:
-            result = self.client.table("messages").update({
+            result = await self._run(self.client.table("messages").update({
                 "action_clicked": clicked
-            }).eq("id", message_id).execute()
+            }).eq("id", message_id))
             
             if result.data:
                 return result.data[0]
@@ -119,20 +227,15 @@ class SupabaseService:
         """Atualiza qualquer propriedade de uma mensagem"""
         try:
             # Filtra apenas campos válidos da tabela
-            valid_fields = {
-                'response', 'action_clicked', 'action_successful', 'right_purpose', 
-                'right_values', 'error_message', 'response_time'
-            }
-            
             update_data = {}
             for key, value in kwargs.items():
-                if key in valid_fields:
+                if key in VALID_UPDATE_FIELDS:
                     update_data[key] = value
             
             if not update_data:
                 raise Exception("Nenhum campo válido fornecido para atualização")
             
-            result = self.client.table("messages").update(update_data).eq("id", message_id).execute()
+            result = await self._run(self.client.table("messages").update(update_data).eq("id", message_id))
             
             if result.data:
                 return result.data[0]
@@ -142,5 +245,37 @@ class SupabaseService:
         except Exception as e:
             raise Exception(f"Erro ao atualizar mensagem: {str(e)}")
 
+    async def insert_messages(self, rows):
+        """
+        Insere várias mensagens em uma única requisição, ignorando IDs que já
+        existem (a linha existente não é alterada).
+
+        Returns:
+            set: IDs efetivamente inseridos
+        """
+        try:
+            result = await self._run(self.client.table("messages").upsert(
+                rows, on_conflict="id", ignore_duplicates=True, default_to_null=False
+            ))
+            return {row["id"] for row in result.data or ()}
+        except Exception as e:
+            raise Exception(f"Erro ao inserir mensagens em lote: {str(e)}")
+
+    async def update_messages(self, rows):
+        """
+        Atualiza várias mensagens já existentes, com um UPDATE por id (nunca
+        cria linhas). Os UPDATEs dividem o pool de threads do Supabase.
+
+        Returns:
+            list: Para cada linha, True (atualizada), False (id inexistente)
+                ou a exceção da falha
+        """
+        async def update(row):
+            fields = {key: value for key, value in row.items() if key != "id"}
+            result = await self._run(self.client.table("messages").update(fields).eq("id", row["id"]))
+            return bool(result.data)
+
+        return await asyncio.gather(*(update(row) for row in rows), return_exceptions=True)
+
 # Instância global do serviço
 supabase_service = SupabaseService()
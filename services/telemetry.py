@@ -0,0 +1,346 @@
+"""
+Gravação assíncrona (write-behind) das mensagens na tabela messages.
+
+O ID de cada mensagem é gerado localmente, então /process não espera o
+Supabase antes de começar o stream. A inserção do prompt, a resposta final
+e as atualizações de /track entram em uma fila em memória, agrupadas por ID,
+e uma tarefa em segundo plano as grava em lote no Supabase.
+
+A criação da mensagem é um INSERT que ignora IDs já existentes: se o ID
+colidir com o de outro processo, a linha existente não é sobrescrita e as
+atualizações seguintes daquele ID são descartadas, assim como as de
+mensagens cuja criação falhou de vez. Atualizações são sempre UPDATEs: o
+/track e a fila só alteram mensagens existentes (nunca criam linha).
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from services.supabase_service import supabase_service, VALID_UPDATE_FIELDS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "1"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "100"))
+# Mensagens pendentes em memória; acima disso novas mensagens são descartadas
+TELEMETRY_MAX_PENDING = int(os.getenv("TELEMETRY_MAX_PENDING", "10000"))
+TELEMETRY_MAX_RETRIES = int(os.getenv("TELEMETRY_MAX_RETRIES", "3"))
+TELEMETRY_SHUTDOWN_TIMEOUT = float(os.getenv("TELEMETRY_SHUTDOWN_TIMEOUT", "10"))
+
+# IDs com 53 bits (cabem em um Number do JavaScript, usado pelo frontend em /track):
+# 38 bits de centésimos de segundo desde 2024-01-01 (~87 anos), 10 bits de nó
+# e 5 bits de sequência (32 IDs por centésimo de segundo em cada processo)
+_ID_EPOCH_MS = 1704067200000
+_ID_TICK_MS = 10
+_NODE_BITS = 10
+_SEQUENCE_BITS = 5
+
+# Motivos para um ID não aceitar mais atualizações
+DISCARD_COLLISION = "collision"
+DISCARD_FAILED = "failed"
+
+
+def node_id_from_env():
+    """
+    Nó do gerador de IDs: TELEMETRY_NODE_ID (único por processo, ex.: índice
+    do worker) ou, sem ela, um valor aleatório de _NODE_BITS bits
+    """
+    value = os.getenv("TELEMETRY_NODE_ID")
+    if value is None or value == "":
+        return secrets.randbits(_NODE_BITS)
+    node_id = int(value)
+    if not 0 <= node_id < (1 << _NODE_BITS):
+        raise ValueError(f"TELEMETRY_NODE_ID deve estar entre 0 e {(1 << _NODE_BITS) - 1}")
+    return node_id
+
+
+class MessageIdGenerator:
+    """IDs inteiros ordenados pelo tempo, sem consulta ao banco"""
+
+    def __init__(self, node_id=None):
+        if node_id is None:
+            node_id = node_id_from_env()
+        elif not 0 <= node_id < (1 << _NODE_BITS):
+            raise ValueError(f"node_id deve estar entre 0 e {(1 << _NODE_BITS) - 1}")
+        self.node_id = node_id
+        self._last_tick = -1
+        self._sequence = 0
+
+    def next_id(self):
+        now_tick = (int(time.time() * 1000) - _ID_EPOCH_MS) // _ID_TICK_MS
+        if now_tick < self._last_tick:
+            # Relógio voltou: continua a partir do último intervalo usado
+            now_tick = self._last_tick
+        if now_tick == self._last_tick:
+            self._sequence = (self._sequence + 1) % (1 << _SEQUENCE_BITS)
+            if self._sequence == 0:
+                # Sequência do intervalo esgotada: avança para o próximo
+                now_tick += 1
+        else:
+            self._sequence = 0
+        self._last_tick = now_tick
+        return (now_tick << (_NODE_BITS + _SEQUENCE_BITS)) | (self.node_id << _SEQUENCE_BITS) | self._sequence
+
+
+class TelemetryQueue:
+    def __init__(self, service=None, flush_interval=None, batch_size=None, max_pending=None):
+        self.service = service or supabase_service
+        self.flush_interval = flush_interval or TELEMETRY_FLUSH_INTERVAL
+        self.batch_size = batch_size or TELEMETRY_BATCH_SIZE
+        self.max_pending = max_pending or TELEMETRY_MAX_PENDING
+        self.ids = MessageIdGenerator()
+        # id -> colunas ainda não gravadas (inserção e atualizações mescladas)
+        self._pending = {}
+        # id -> linha sendo gravada agora (fora de _pending durante o flush)
+        self._in_flight = {}
+        self._retries = {}
+        # IDs que não podem mais ser atualizados por este processo -> motivo:
+        # a criação encontrou a linha de outro processo ou falhou de vez.
+        # Limitado aos mais recentes (o frontend só atualiza mensagens novas)
+        self._discarded = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._closing = False
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.collisions = 0
+        self.flushed_rows = 0
+        self.batches = 0
+        self.last_flush_ms = None
+
+    def _discard(self, message_id, reason):
+        """Marca o ID como não atualizável e descarta as atualizações pendentes dele"""
+        self._discarded[message_id] = reason
+        while len(self._discarded) > self.max_pending:
+            self._discarded.popitem(last=False)
+        if self._pending.pop(message_id, None) is not None:
+            self.dropped += 1
+
+    def _check_updatable(self, message_id):
+        reason = self._discarded.get(message_id)
+        if reason == DISCARD_COLLISION:
+            raise Exception("ID de mensagem em colisão com outra mensagem, atualização descartada")
+        if reason == DISCARD_FAILED:
+            raise Exception("Mensagem não encontrada (a criação não foi gravada)")
+
+    def _enqueue(self, message_id, fields):
+        if message_id in self._discarded:
+            # Linha de outra mensagem, ou inexistente: não pode ser alterada
+            self.dropped += 1
+            return False
+
+        row = self._pending.get(message_id)
+        if row is not None:
+            row.update(fields)
+            self.coalesced += 1
+            return True
+
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+
+        self._pending[message_id] = {"id": message_id, **fields}
+        self.enqueued += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def record_prompt(self, prompt, origin=None):
+        """
+        Registra um novo prompt e retorna o ID da mensagem (ou None se a fila
+        estiver cheia e a mensagem for descartada).
+        """
+        message_id = self.ids.next_id()
+        fields = {
+            "prompt": prompt,
+            "response": "",
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        if origin is not None:
+            fields["origin"] = origin
+        return message_id if self._enqueue(message_id, fields) else None
+
+    def update_message(self, message_id, **kwargs):
+        """
+        Enfileira a atualização de uma mensagem (mesmos campos de
+        SupabaseService.update_message).
+
+        Returns:
+            dict: Campos aceitos para atualização
+        """
+        update_data = {key: value for key, value in kwargs.items() if key in VALID_UPDATE_FIELDS}
+        if not update_data:
+            raise Exception("Nenhum campo válido fornecido para atualização")
+        self._check_updatable(message_id)
+        if not self._enqueue(message_id, update_data):
+            raise Exception("Fila de telemetria cheia, atualização descartada")
+        return update_data
+
+    async def track(self, message_id, **kwargs):
+        """
+        Atualização do /track. Mensagem ainda na fila (ou sendo gravada) deste
+        processo: a atualização entra na fila. Senão, é um UPDATE direto, que
+        falha com "Mensagem não encontrada" para IDs inexistentes.
+
+        Returns:
+            dict: Campos atualizados (ou a mensagem atualizada, no UPDATE direto)
+        """
+        update_data = {key: value for key, value in kwargs.items() if key in VALID_UPDATE_FIELDS}
+        if not update_data:
+            raise Exception("Nenhum campo válido fornecido para atualização")
+        self._check_updatable(message_id)
+        if message_id in self._pending or message_id in self._in_flight:
+            if not self._enqueue(message_id, update_data):
+                raise Exception("Fila de telemetria cheia, atualização descartada")
+            return update_data
+        return await self.service.update_message(message_id, **update_data)
+
+    def _batches(self, rows):
+        """Agrupa as linhas pelas colunas presentes (o INSERT em lote exige colunas iguais)"""
+        groups = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+        for group in groups.values():
+            for start in range(0, len(group), self.batch_size):
+                yield group[start:start + self.batch_size]
+
+    def _requeue(self, rows):
+        for row in rows:
+            message_id = row["id"]
+            attempts = self._retries.get(message_id, 0) + 1
+            if attempts > TELEMETRY_MAX_RETRIES:
+                self._retries.pop(message_id, None)
+                self.failed += 1
+                if "prompt" in row:
+                    # Sem a linha, as atualizações seguintes não teriam o que alterar
+                    self._discard(message_id, DISCARD_FAILED)
+                continue
+            self._retries[message_id] = attempts
+            # Atualizações que chegaram durante a gravação têm prioridade
+            newer = self._pending.get(message_id)
+            self._pending[message_id] = {**row, **newer} if newer else row
+
+    async def flush(self):
+        """Grava todas as mensagens pendentes no Supabase"""
+        if not self._pending:
+            return
+        self._in_flight, self._pending = self._pending, {}
+        rows = list(self._in_flight.values())
+        start_time = time.perf_counter()
+        try:
+            for batch in self._batches(rows):
+                if "prompt" not in batch[0]:
+                    await self._flush_updates(batch)
+                    continue
+                try:
+                    # Criação: INSERT que não sobrescreve linhas existentes
+                    inserted = await self.service.insert_messages(batch)
+                except Exception as e:
+                    logger.warning("Falha ao gravar mensagens (não crítico): %s", e, extra={"rows": len(batch)})
+                    self._requeue(batch)
+                    continue
+                self._check_collisions(batch, inserted)
+                self._written(batch)
+        finally:
+            self._in_flight = {}
+        self.last_flush_ms = round((time.perf_counter() - start_time) * 1000, 1)
+
+    async def _flush_updates(self, batch):
+        """Só atualizações (a criação já foi gravada): um UPDATE por mensagem"""
+        results = await self.service.update_messages(batch)
+        written, retry = [], []
+        for row, result in zip(batch, results):
+            if isinstance(result, Exception):
+                retry.append(row)
+            elif result:
+                written.append(row)
+            else:
+                # Nenhuma linha com esse ID: não adianta tentar de novo
+                self._retries.pop(row["id"], None)
+                self.failed += 1
+                self._discard(row["id"], DISCARD_FAILED)
+                logger.warning("Telemetria: atualização de mensagem inexistente descartada",
+                               extra={"message_id": row["id"]})
+        if retry:
+            error = next(result for result in results if isinstance(result, Exception))
+            logger.warning("Falha ao atualizar mensagens (não crítico): %s", error, extra={"rows": len(retry)})
+            self._requeue(retry)
+        if written:
+            self._written(written)
+
+    def _written(self, rows):
+        self.batches += 1
+        self.flushed_rows += len(rows)
+        for row in rows:
+            self._retries.pop(row["id"], None)
+
+    def _check_collisions(self, batch, inserted):
+        for row in batch:
+            message_id = row["id"]
+            # Numa nova tentativa, a linha pode ter sido criada pela tentativa anterior
+            if message_id in inserted or message_id in self._retries:
+                continue
+            self.collisions += 1
+            # Atualizações que chegaram durante a gravação também são descartadas
+            self._discard(message_id, DISCARD_COLLISION)
+            logger.error("Telemetria: ID de mensagem já existente (colisão entre processos)",
+                         extra={"message_id": message_id, "node_id": self.ids.node_id})
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Inicia a tarefa de gravação (chamado no lifespan da aplicação)"""
+        self._closing = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Grava o que ainda estiver na fila e encerra a tarefa de gravação"""
+        self._closing = True
+        self._wakeup.set()
+        try:
+            if self._task is not None:
+                await asyncio.wait_for(self._task, timeout=TELEMETRY_SHUTDOWN_TIMEOUT)
+            await asyncio.wait_for(self.flush(), timeout=TELEMETRY_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Telemetria: tempo esgotado ao gravar a fila no shutdown")
+        self._task = None
+        if self._pending:
+            logger.warning("Telemetria: mensagens descartadas no shutdown", extra={"rows": len(self._pending)})
+            self.dropped += len(self._pending)
+            self._pending = {}
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "collisions": self.collisions,
+            "node_id": self.ids.node_id,
+            "retrying": len(self._retries),
+            "flushed_rows": self.flushed_rows,
+            "batches": self.batches,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Fila global de telemetria
+telemetry = TelemetryQueue()
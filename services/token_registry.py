@@ -0,0 +1,209 @@
+"""
+Registro de tokens por rede, alimentado pela lista de tokens da LI.FI.
+Mantém cada rede em memória com TTL e revalidação em segundo plano, para que
+as requisições não precisem baixar a lista completa a cada chamada.
+"""
+
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+from services.cache import AsyncTTLCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_token_name(name):
+    """Normaliza o nome de um token para busca (minúsculo, espaços simples)"""
+    return " ".join(name.lower().split()) if name else ""
+
+
+def _parse_price(price):
+    # Tratamos None/vazio como 0 para evitar erros de comparação
+    try:
+        return float(price or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _parse_decimals(decimals):
+    # Mantém 0 (tokens sem casas decimais); só valores ausentes/inválidos viram None
+    try:
+        return int(decimals)
+    except (TypeError, ValueError):
+        return None
+
+
+def _address_key(address):
+    """
+    Chave do índice por endereço: o endereço como inteiro, o que torna a busca
+    indiferente a maiúsculas/minúsculas (checksum) e ocupa metade da memória
+    de uma cópia da string em minúsculo
+    """
+    try:
+        return int(address, 16)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenRecord:
+    """Dados de um token da LI.FI, sem o overhead de um dict por token"""
+
+    __slots__ = ("symbol", "address", "decimals", "name", "price")
+
+    def __init__(self, symbol, address, decimals, name, price):
+        self.symbol = symbol
+        self.address = address
+        self.decimals = decimals
+        self.name = name
+        # priceUSD como veio da API (string); convertido sob demanda
+        self.price = price
+
+    @property
+    def price_usd(self):
+        return _parse_price(self.price)
+
+    def __repr__(self):
+        return f"TokenRecord({self.symbol}, {self.address}, decimals={self.decimals})"
+
+
+class ChainTokens:
+    """
+    Tokens de uma rede com índices O(1) por símbolo, por endereço do contrato
+    (sem distinção de maiúsculas) e por nome normalizado.
+    """
+
+    __slots__ = ("by_symbol", "by_address", "by_name")
+
+    def __init__(self):
+        self.by_symbol = {}
+        self.by_address = {}
+        self.by_name = {}
+
+    @classmethod
+    def from_lifi(cls, tokens):
+        """
+        Monta os índices em uma única passada pela lista da LI.FI.
+        Para símbolos (e nomes) duplicados, mantém o token de maior priceUSD;
+        em caso de empate, fica o primeiro da lista.
+        """
+        chain_tokens = cls()
+        best_price_by_symbol = {}
+        best_price_by_name = {}
+
+        for token in tokens:
+            symbol = (token.get("symbol") or "").upper()
+            if not symbol:
+                continue
+
+            record = TokenRecord(
+                symbol, token.get("address"), _parse_decimals(token.get("decimals")),
+                token.get("name"), token.get("priceUSD")
+            )
+            price = _parse_price(record.price)
+
+            address_key = _address_key(record.address)
+            if address_key is not None and address_key not in chain_tokens.by_address:
+                chain_tokens.by_address[address_key] = record
+
+            if symbol not in best_price_by_symbol or price > best_price_by_symbol[symbol]:
+                best_price_by_symbol[symbol] = price
+                chain_tokens.by_symbol[symbol] = record
+
+            name = normalize_token_name(record.name)
+            if name and (name not in best_price_by_name or price > best_price_by_name[name]):
+                best_price_by_name[name] = price
+                chain_tokens.by_name[name] = record
+
+        return chain_tokens
+
+    def resolve(self, token):
+        """
+        Busca um token por endereço do contrato, símbolo ou nome.
+
+        Returns:
+            TokenRecord ou None se não encontrado
+        """
+        if not token:
+            return None
+
+        token = token.strip()
+        if len(token) == 42 and token[:2].lower() == "0x":
+            return self.by_address.get(_address_key(token))
+
+        return self.by_symbol.get(token.upper()) or self.by_name.get(normalize_token_name(token))
+
+    def __len__(self):
+        return len(self.by_symbol)
+
+
+class TokenRegistry:
+    def __init__(self, loader, ttl=None, stale_ttl=None):
+        """
+        Args:
+            loader: Coroutine que recebe o nome da rede e retorna um
+                ChainTokens ou {"error": ...}
+            ttl: Segundos em que a lista de uma rede é considerada fresca
+            stale_ttl: Segundos extras em que a lista vencida ainda é servida
+                enquanto é atualizada em segundo plano
+        """
+        self.loader = loader
+        # Dicionário {chain: ChainTokens}
+        self.tokens = {}
+        self._cache = AsyncTTLCache(
+            "tokens",
+            ttl=ttl if ttl is not None else float(os.getenv("TOKEN_LIST_TTL", "300")),
+            stale_ttl=stale_ttl if stale_ttl is not None else float(os.getenv("TOKEN_LIST_STALE_TTL", "3600")),
+        )
+
+    async def _refresh(self, chain_name):
+        tokens = await self.loader(chain_name)
+        if isinstance(tokens, dict):
+            return tokens
+
+        self.tokens[chain_name.upper()] = tokens
+        return {"success": True, "tokens_count": len(tokens)}
+
+    async def ensure(self, chain_name):
+        """
+        Garante que a lista de tokens da rede está disponível.
+        Requisições concorrentes compartilham o mesmo download.
+
+        Returns:
+            dict: {"success": True, "tokens_count": int} ou {"error": str}
+        """
+        if not chain_name or not isinstance(chain_name, str):
+            logger.error("chain_name inválido: %s", chain_name)
+            return {"error": "chain_name deve ser uma string válida"}
+
+        return await self._cache.get(chain_name.upper(), lambda: self._refresh(chain_name))
+
+    def get(self, chain_name):
+        """Retorna os tokens da rede já carregados (ou None)"""
+        return self.tokens.get(chain_name.upper()) if chain_name else None
+
+    def resolve(self, chain_name, token):
+        """
+        Busca um token da rede por símbolo, endereço do contrato ou nome.
+
+        Returns:
+            TokenRecord ou None se a rede ou o token não forem encontrados
+        """
+        chain_tokens = self.get(chain_name)
+        return chain_tokens.resolve(token) if chain_tokens else None
+
+    async def preload(self, chains):
+        """Carrega as redes informadas em paralelo (usado no startup)"""
+        results = await asyncio.gather(*(self.ensure(chain) for chain in chains), return_exceptions=True)
+        for chain, result in zip(chains, results):
+            if isinstance(result, Exception) or "error" in result:
+                logger.warning("Falha ao pré-carregar tokens da rede %s: %s", chain, result)
+        return dict(zip(chains, results))
+
+    def stats(self):
+        return {
+            "chains": {chain: len(tokens) for chain, tokens in self.tokens.items()},
+            **self._cache.stats(),
+        }